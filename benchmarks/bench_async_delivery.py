@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Blocking vs thread-wave vs asyncio (log_pipeline.aio) delivery to a slow Loki.
+
+A local HTTP/1.1 keep-alive server answers every push with 204 after
+``--latency-ms``; a fake S3 client serves gzip objects after ``--s3-latency-ms``.
+Each mode runs process_s3_event over the same objects into a LokiSink and
+reports events/s and the number of TCP connections the server accepted.
+
+    python benchmarks/bench_async_delivery.py --objects 20 --events 5000 --latency-ms 50
+"""
+import argparse
+import gzip
+import json
+import time
+
+from common import LocalS3, fake_data_messages, start_push_server
+
+from log_pipeline import ingest
+from log_pipeline.aio import AsyncEngine
+from log_pipeline.health import reset_health
+from log_pipeline.router import SinkRouter
+from log_pipeline.sinks.loki import LokiSink
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", type=int, default=20)
+    parser.add_argument("--events", type=int, default=5000, help="events per object")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--s3-latency-ms", type=float, default=100)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    body = "\n".join(json.dumps(m) for m in fake_data_messages(args.events)).encode("utf-8")
+    objects = {f"logs/object-{i:04d}.gz": gzip.compress(body) for i in range(args.objects)}
+    event = {
+        "Records": [
+            {
+                "eventName": "ObjectCreated:Put",
+                "s3": {"bucket": {"name": "bench"}, "object": {"key": key}},
+            }
+            for key in objects
+        ]
+    }
+    ingest.get_s3_client = lambda: LocalS3(objects, args.s3_latency_ms)
+    server, stats = start_push_server(args.latency_ms)
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+    total = args.objects * args.events
+
+    modes = [
+        ("blocking (1)", 1, False),
+        ("thread waves (8)", 8, False),
+        ("async (8)", 8, True),
+        ("async (32)", 32, True),
+    ]
+    baseline = None
+    for label, concurrency, use_async in modes:
+        reset_health()
+        engine = AsyncEngine(pool_size=concurrency) if use_async else None
+        sink = LokiSink(endpoint, batch_size=args.batch_size, max_concurrency=concurrency)
+        sink.engine = engine
+        router = SinkRouter([sink])
+        # SQS-style event: batches merge across objects and flush once at the end
+        sqs_event = {
+            "Records": [
+                {
+                    "messageId": str(i),
+                    "eventSource": "aws:sqs",
+                    "body": json.dumps({"Records": [record]}),
+                }
+                for i, record in enumerate(event["Records"])
+            ]
+        }
+        stats.update(requests=0, connections=0)
+        started = time.perf_counter()
+        ingest.process_s3_event(sqs_event, router, engine=engine)
+        elapsed = time.perf_counter() - started
+        if engine is not None:
+            engine.close()
+        assert sink.delivered == total, f"{label}: delivered {sink.delivered} of {total}"
+        baseline = baseline or elapsed
+        print(
+            f"{label:<18} {elapsed:7.2f} s  {total / elapsed:10,.0f} events/s  "
+            f"x{baseline / elapsed:5.2f}  requests={stats['requests']} "
+            f"connections={stats['connections']} limit={sink.health.limiter.limit}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
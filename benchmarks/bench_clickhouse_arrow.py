@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Row conversion (json.loads + LogRecord + columns_from_records) vs the Arrow path
+(pyarrow.json + compute casts) for ClickHouse batches.
+
+Checks that both give the same column values, then times the conversion of
+raw message lines into insertable columns. With ``--insert`` both forms are
+also sent to a scratch ClickHouse database (CLICKHOUSE_HOST/PORT/USER/PASSWORD),
+timing ``insert(column_oriented=True)`` against ``insert_arrow``.
+
+    python benchmarks/bench_clickhouse_arrow.py --events 500000 [--insert]
+"""
+import argparse
+import ipaddress
+import json
+import os
+import time
+import uuid
+
+from common import fake_log_events, timed
+
+from log_pipeline.events import normalize
+from log_pipeline.sinks.clickhouse import COLUMNS, columns_from_records
+from log_pipeline.sinks.clickhouse_arrow import arrow_table
+
+BATCH = 100_000
+
+
+def _batches(messages):
+    return [messages[i : i + BATCH] for i in range(0, len(messages), BATCH)]
+
+
+def _rows(messages):
+    return [
+        columns_from_records([normalize(json.loads(m)) for m in batch])
+        for batch in _batches(messages)
+    ]
+
+
+def _arrow(messages):
+    return [arrow_table(batch) for batch in _batches(messages)]
+
+
+def _insert_rows(client, database, messages):
+    for columns in _rows(messages):
+        client.insert(
+            "api_logs", columns, column_names=COLUMNS, database=database, column_oriented=True
+        )
+
+
+def _insert_arrow(client, database, messages):
+    for table in _arrow(messages):
+        client.insert_arrow("api_logs", table, database=database)
+
+
+def _check(rows, table) -> None:
+    for name, expected in zip(COLUMNS, rows):
+        values = table.column(name).to_pylist()
+        if name == "ip":
+            values = [ipaddress.IPv6Address(v) for v in values]
+        elif name in ("userId", "orgId"):
+            values = [uuid.UUID(v) for v in values]
+        elif name == "requestTime":
+            expected = [v.replace(microsecond=v.microsecond // 1000 * 1000) for v in expected]
+        assert values == expected, f"{name}: Arrow values differ from the row converters"
+
+
+def _insert(args, messages) -> None:
+    import clickhouse_connect
+    from log_pipeline.schema import schema_statements
+
+    client = clickhouse_connect.get_client(
+        host=os.getenv("CLICKHOUSE_HOST", "localhost"),
+        port=int(os.getenv("CLICKHOUSE_PORT", "8123")),
+        username=os.getenv("CLICKHOUSE_USER", "default"),
+        password=os.getenv("CLICKHOUSE_PASSWORD", ""),
+    )
+    client.command(f"DROP DATABASE IF EXISTS {args.database}")
+    for statement in schema_statements(args.database):
+        client.command(statement)
+    try:
+        for label, send in (("insert (rows)", _insert_rows), ("insert_arrow", _insert_arrow)):
+            client.command(f"TRUNCATE TABLE {args.database}.api_logs")
+            started = time.perf_counter()
+            send(client, args.database, messages)
+            elapsed = time.perf_counter() - started
+            count = client.command(f"SELECT count() FROM {args.database}.api_logs")
+            print(
+                f"{label:<16} {elapsed:8.3f} s  {len(messages) / elapsed:12,.0f} rows/s  "
+                f"rows={count}"
+            )
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {args.database}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--insert", action="store_true", help="also time inserts into ClickHouse")
+    parser.add_argument("--database", default="bench_arrow")
+    args = parser.parse_args()
+
+    messages = [event["message"] for event in fake_log_events(args.events)]
+    rows_s, rows = timed(lambda: _rows(messages), args.repeat)
+    arrow_s, tables = timed(lambda: _arrow(messages), args.repeat)
+    for batch_rows, table in zip(rows, tables):
+        _check(batch_rows, table)
+
+    print(f"{'row converters':<16} {rows_s:8.3f} s  {args.events / rows_s:12,.0f} rows/s")
+    print(
+        f"{'arrow':<16} {arrow_s:8.3f} s  {args.events / arrow_s:12,.0f} rows/s  "
+        f"x{rows_s / arrow_s:.2f}"
+    )
+
+    if args.insert:
+        _insert(args, messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Query latency of route/status/latency dashboards: raw api_logs vs the
+per-minute api_logs_route_1m rollup.
+
+Needs a ClickHouse server (CLICKHOUSE_HOST/PORT/USER/PASSWORD); loads
+generated logs into a scratch database that is dropped afterwards.
+
+    python benchmarks/bench_clickhouse_rollups.py --events 1000000
+"""
+import argparse
+import os
+from datetime import datetime, timezone
+
+from common import fake_log_events, timed
+
+import clickhouse_connect
+from log_pipeline.events import iter_log_events
+from log_pipeline.rollups import route_stats
+from log_pipeline.schema import schema_statements
+from log_pipeline.sinks.clickhouse import COLUMNS, columns_from_records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--database", default="bench_logs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = clickhouse_connect.get_client(
+        host=os.getenv("CLICKHOUSE_HOST", "localhost"),
+        port=int(os.getenv("CLICKHOUSE_PORT", "8123")),
+        username=os.getenv("CLICKHOUSE_USER", "default"),
+        password=os.getenv("CLICKHOUSE_PASSWORD", ""),
+    )
+    client.command(f"DROP DATABASE IF EXISTS {args.database}")
+    for statement in schema_statements(args.database):
+        client.command(statement)
+
+    try:
+        start_ms = 1_767_225_600_000  # 2026-01-01T00:00:00Z
+        events = fake_log_events(args.events, start_ms=start_ms)
+        messages = [{"messageType": "DATA_MESSAGE", "logEvents": events}]
+        records = list(iter_log_events(messages))
+        for i in range(0, len(records), 100_000):
+            client.insert(
+                "api_logs",
+                columns_from_records(records[i : i + 100_000]),
+                column_names=COLUMNS,
+                database=args.database,
+                column_oriented=True,
+            )
+        client.command(f"OPTIMIZE TABLE {args.database}.api_logs_route_1m FINAL")
+
+        raw_rows = client.command(f"SELECT count() FROM {args.database}.api_logs")
+        rollup_rows = client.command(f"SELECT count() FROM {args.database}.api_logs_route_1m")
+        start = datetime.fromtimestamp(start_ms / 1000, timezone.utc)
+        end = datetime.fromtimestamp((start_ms + 24 * 3600 * 1000) / 1000, timezone.utc)
+
+        print(f"raw rows: {raw_rows}, rollup rows: {rollup_rows}")
+        for label, use_rollup in (("raw", False), ("rollup", True)):
+            seconds, result = timed(
+                lambda: route_stats(
+                    client, start, end, database=args.database, use_rollup=use_rollup
+                ),
+                repeat=args.repeat,
+            )
+            print(f"{label:>7}: {seconds * 1000:8.1f} ms best of {args.repeat}, {len(result)} groups")
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {args.database}")
+
+
+if __name__ == "__main__":
+    main()
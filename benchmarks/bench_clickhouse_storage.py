@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+On-disk size of api_logs before/after the compact schema (IPv6, UUID,
+LowCardinality, Delta/T64 + ZSTD codecs), loaded with the same generated logs.
+
+Needs a ClickHouse server (CLICKHOUSE_HOST/PORT/USER/PASSWORD); uses a
+scratch database that is dropped afterwards.
+
+    python benchmarks/bench_clickhouse_storage.py --events 1000000
+"""
+import argparse
+import os
+import time
+
+from common import fake_log_events
+
+import clickhouse_connect
+from log_pipeline.events import iter_log_events
+from log_pipeline.schema import schema_statements
+from log_pipeline.sinks.clickhouse import COLUMNS, columns_from_records
+
+# api_logs as originally provisioned by ec2/click-house.sh (all plain String)
+LEGACY_DDL = """
+CREATE TABLE {database}.api_logs_legacy (
+    requestTime DateTime64(3, 'UTC'), requestId String,
+    httpMethod LowCardinality(String), path String, routeKey String,
+    status UInt16, bytes UInt32, responseLatency UInt32, integrationLatency UInt32,
+    functionResponseStatus UInt16, email String, userId String, orgId String,
+    idCompany String, ip String, host String, userAgent String,
+    dataSource LowCardinality(String), applicationVersion LowCardinality(String),
+    referer String
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(requestTime)
+ORDER BY (idCompany, requestTime, status)
+"""
+
+
+def _legacy_columns(records):
+    typed = columns_from_records(records)
+    columns = []
+    for name, values in zip(COLUMNS, typed):
+        if name in ("userId", "orgId", "ip"):
+            values = [record.get(name, "") for record in records]
+        columns.append(values)
+    return columns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--database", default="bench_storage")
+    args = parser.parse_args()
+
+    client = clickhouse_connect.get_client(
+        host=os.getenv("CLICKHOUSE_HOST", "localhost"),
+        port=int(os.getenv("CLICKHOUSE_PORT", "8123")),
+        username=os.getenv("CLICKHOUSE_USER", "default"),
+        password=os.getenv("CLICKHOUSE_PASSWORD", ""),
+    )
+    client.command(f"DROP DATABASE IF EXISTS {args.database}")
+    for statement in schema_statements(args.database):
+        client.command(statement)
+    client.command(LEGACY_DDL.format(database=args.database))
+
+    try:
+        messages = [{"messageType": "DATA_MESSAGE", "logEvents": fake_log_events(args.events)}]
+        records = list(iter_log_events(messages))
+
+        for table, build in (("api_logs_legacy", _legacy_columns), ("api_logs", columns_from_records)):
+            started = time.perf_counter()
+            for i in range(0, len(records), 100_000):
+                client.insert(
+                    table,
+                    build(records[i : i + 100_000]),
+                    column_names=COLUMNS,
+                    database=args.database,
+                    column_oriented=True,
+                )
+            elapsed = time.perf_counter() - started
+            client.command(f"OPTIMIZE TABLE {args.database}.{table} FINAL")
+            print(f"{table}: inserted {len(records)} rows in {elapsed:.2f}s")
+
+        result = client.query(
+            f"""
+            SELECT table, name,
+                   sum(data_compressed_bytes) AS compressed,
+                   sum(data_uncompressed_bytes) AS uncompressed
+            FROM system.columns
+            WHERE database = {{db:String}}
+              AND table IN ('api_logs_legacy', 'api_logs')
+            GROUP BY table, name
+            """,
+            parameters={"db": args.database},
+        )
+        sizes = {(row[0], row[1]): (row[2], row[3]) for row in result.result_rows}
+
+        print(f"\n{'column':<24}{'before':>12}{'after':>12}{'ratio':>8}")
+        totals = [0, 0]
+        for name in COLUMNS:
+            before = sizes.get(("api_logs_legacy", name), (0, 0))[0]
+            after = sizes.get(("api_logs", name), (0, 0))[0]
+            totals[0] += before
+            totals[1] += after
+            ratio = before / after if after else float("inf")
+            print(f"{name:<24}{before:>12,}{after:>12,}{ratio:>7.1f}x")
+        print(f"{'TOTAL (compressed)':<24}{totals[0]:>12,}{totals[1]:>12,}{totals[0] / max(1, totals[1]):>7.1f}x")
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {args.database}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost per Lambda function: handler import plus first invocation.
+
+Every run starts a fresh interpreter (as a new Lambda execution environment
+would), imports ``handler`` and invokes it once with a small sample event.
+S3 functions run with their sinks unconfigured, so the first invocation
+measures the lazy sink/client setup path without network calls.
+
+    python benchmarks/bench_cold_start.py --runs 10 [--function s3_ingest]
+"""
+import argparse
+import base64
+import gzip
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict
+
+from common import FUNCTIONS, LAMBDA_ROOT, fake_data_messages, function_env
+
+# Runs inside the child interpreter; prints one JSON line with timings (ms)
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import handler
+t1 = time.perf_counter()
+with open(sys.argv[1]) as fh:
+    event = json.load(fh)
+handler.handler(event, None)
+t2 = time.perf_counter()
+sys.stdout.flush()
+sys.__stderr__.write("@@" + json.dumps({"import": (t1 - t0) * 1e3, "invoke": (t2 - t1) * 1e3}))
+"""
+
+SINK_ENV = ("INGEST_SINKS", "CLICKHOUSE_HOST", "LOKI_ENDPOINT", "OPENSEARCH_ENDPOINT", "CHECKPOINT_STORE")
+
+
+def _gzip_b64(payload: Any) -> str:
+    return base64.b64encode(gzip.compress(json.dumps(payload).encode("utf-8"))).decode("ascii")
+
+
+def sample_event(function: str) -> Dict[str, Any]:
+    messages = fake_data_messages(100, events_per_message=50)
+    if function == "api_handler":
+        return {
+            "resource": "/user",
+            "path": "/user",
+            "httpMethod": "GET",
+            "headers": {"Host": "localhost"},
+            "multiValueHeaders": {"Host": ["localhost"]},
+            "queryStringParameters": None,
+            "multiValueQueryStringParameters": None,
+            "pathParameters": None,
+            "stageVariables": None,
+            "requestContext": {
+                "resourcePath": "/user",
+                "httpMethod": "GET",
+                "path": "/prod/user",
+                "stage": "prod",
+                "identity": {"sourceIp": "127.0.0.1"},
+            },
+            "body": None,
+            "isBase64Encoded": False,
+        }
+    if function == "kinesis_transformer":
+        return {
+            "records": [
+                {"recordId": str(i), "data": _gzip_b64(msg)} for i, msg in enumerate(messages)
+            ]
+        }
+    if function == "log_processor":
+        return {"awslogs": {"data": _gzip_b64(messages[0])}}
+    return {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "s3": {
+                    "bucket": {"name": "test-nf-tags"},
+                    "object": {"key": "2026/01/01/00/sample.gz", "eTag": "0"},
+                },
+            }
+        ]
+    }
+
+
+def run_once(function: str, event_path: str) -> Dict[str, float]:
+    env = function_env(function)
+    for name in SINK_ENV:
+        env.pop(name, None)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, event_path],
+        cwd=LAMBDA_ROOT / function,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stderr.rsplit("@@", 1)[1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--function", action="append", choices=FUNCTIONS)
+    args = parser.parse_args()
+
+    print(f"{'function':<26} {'import ms':>10} {'1st call ms':>12} {'total ms':>10}")
+    for function in args.function or FUNCTIONS:
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as fh:
+            json.dump(sample_event(function), fh)
+            fh.flush()
+            try:
+                runs = [run_once(function, fh.name) for _ in range(args.runs)]
+            except RuntimeError as exc:
+                print(f"{function:<26} skipped: {exc}")
+                continue
+        imp = statistics.median(r["import"] for r in runs)
+        inv = statistics.median(r["invoke"] for r in runs)
+        print(f"{function:<26} {imp:10.1f} {inv:12.1f} {imp + inv:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
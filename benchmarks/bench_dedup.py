@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+De-duplication stage: throughput, false-positive rate and memory footprint.
+
+Fills a Deduplicator with ``--capacity`` delivered event ids, then checks as
+many new ids (every positive is a false positive) and as many replayed ids
+(all must be duplicates). Memory is compared with a plain set of the same ids.
+
+    python benchmarks/bench_dedup.py --capacity 1000000 --fp-rate 0.0001
+"""
+import argparse
+import sys
+import time
+
+import common  # noqa: F401  (import paths)
+
+from log_pipeline.dedup import Deduplicator
+from log_pipeline.events import LogRecord
+
+
+def _events(start: int, count: int):
+    # CloudWatch event ids are 56-digit strings
+    return [LogRecord(None, f"{start + i:056d}", "", "", "", False) for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--capacity", type=int, default=1_000_000)
+    parser.add_argument("--fp-rate", type=float, default=1e-4)
+    parser.add_argument("--lru-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    dedup = Deduplicator(args.capacity, args.fp_rate, args.lru_size)
+    delivered = _events(0, args.capacity)
+    fresh = _events(args.capacity, args.capacity)
+
+    started = time.perf_counter()
+    for event in delivered:
+        dedup.is_duplicate(event)
+    dedup.commit()
+    fill_s = time.perf_counter() - started
+
+    dedup.start()
+    started = time.perf_counter()
+    false_positives = sum(dedup.is_duplicate(event) for event in fresh)
+    check_s = time.perf_counter() - started
+    dedup.discard()
+    missed = sum(not dedup.is_duplicate(event) for event in delivered)
+    dedup.discard()
+
+    ids = {event.event_id for event in delivered}
+    set_bytes = sys.getsizeof(ids) + sum(sys.getsizeof(i) for i in ids)
+    print(f"bloom: {dedup.bloom.size:,} bits, {dedup.bloom.hashes} hashes")
+    print(f"check + commit   {args.capacity / fill_s:12,.0f} ids/s")
+    print(f"check (new ids)  {args.capacity / check_s:12,.0f} ids/s")
+    print(
+        f"false positives  {false_positives / args.capacity:.6f} observed, "
+        f"{dedup.bloom.estimated_fp_rate():.6f} estimated, {args.fp_rate} configured"
+    )
+    print(f"missed replays   {missed}")
+    print(
+        f"memory           {dedup.memory_bytes() / 2**20:8.1f} MiB "
+        f"(set of ids: {set_bytes / 2**20:.1f} MiB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+log_pipeline.emf against AWS Lambda Powertools ``Metrics`` for log_processor.
+
+Cold start: a fresh interpreter imports the metrics module, creates the
+logger and runs one invocation (best of ``--runs``). Per invocation (warm):
+one RequestCount per event with Path/ClientIP dimensions, then a flush, for
+``--events`` events, each from its own client IP and then from a pool of
+``--clients`` IPs; documents and bytes written to stdout are reported.
+
+Powertools is measured two ways: as log_processor used it (dimensions
+overwritten on the shared ``Metrics`` object, so every count lands on the
+last Path/ClientIP) and with ``single_metric`` per event (one document per
+event, the correct per-dimension counts). Powertools is only needed for the
+comparison: ``pip install aws-lambda-powertools``.
+
+    python benchmarks/bench_emf.py --events 1000 --runs 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import warnings
+from typing import Callable, List, Tuple
+
+from common import LAYER_PATH, fake_log_events, timed
+
+os.environ.setdefault("POWERTOOLS_METRICS_NAMESPACE", "ApiMonitor")
+# Powertools warns on every overwritten dimension
+warnings.filterwarnings("ignore")
+
+COLD = {
+    "log_pipeline.emf": """
+from log_pipeline.emf import MetricsLogger
+metrics = MetricsLogger("ApiMonitor")
+for i in range(50):
+    metrics.put("RequestCount", 1, "Count", {"Path": "/p", "ClientIP": str(i)})
+metrics.flush()
+""",
+    "powertools Metrics": """
+from aws_lambda_powertools import Metrics
+from aws_lambda_powertools.metrics import MetricUnit
+metrics = Metrics(namespace="ApiMonitor")
+for i in range(50):
+    metrics.add_dimension(name="Path", value="/p")
+    metrics.add_dimension(name="ClientIP", value=str(i))
+    metrics.add_metric(name="RequestCount", unit=MetricUnit.Count, value=1)
+metrics.flush_metrics()
+""",
+}
+CHILD = """
+import sys, time
+t0 = time.perf_counter()
+exec(sys.argv[1])
+sys.__stderr__.write("@@%f" % ((time.perf_counter() - t0) * 1e3))
+"""
+
+
+def cold_start_ms(code: str, runs: int) -> float:
+    env = dict(os.environ, PYTHONPATH=str(LAYER_PATH), PYTHONDONTWRITEBYTECODE="1")
+    best = float("inf")
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", CHILD, code], env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr[-2000:])
+        best = min(best, float(proc.stderr.rsplit("@@", 1)[1]))
+    return best
+
+
+def captured(fn: Callable[[], None]) -> Callable[[], str]:
+    def run() -> str:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            fn()
+        return out.getvalue()
+
+    return run
+
+
+def emf_invocation(dims: List[Tuple[str, str]]) -> Callable[[], None]:
+    from log_pipeline.emf import MetricsLogger
+
+    metrics = MetricsLogger("ApiMonitor")
+
+    def invoke() -> None:
+        for path, ip in dims:
+            metrics.put("RequestCount", 1, "Count", {"Path": path, "ClientIP": ip})
+        metrics.flush()
+
+    return invoke
+
+
+def powertools_invocation(dims: List[Tuple[str, str]]) -> Callable[[], None]:
+    from aws_lambda_powertools import Metrics
+    from aws_lambda_powertools.metrics import MetricUnit
+
+    metrics = Metrics(namespace="ApiMonitor")
+
+    def invoke() -> None:
+        for path, ip in dims:
+            metrics.clear_default_dimensions()
+            metrics.add_dimension(name="Path", value=path)
+            metrics.add_dimension(name="ClientIP", value=ip)
+            metrics.add_metric(name="RequestCount", unit=MetricUnit.Count, value=1)
+        metrics.flush_metrics()
+
+    return invoke
+
+
+def powertools_single_invocation(dims: List[Tuple[str, str]]) -> Callable[[], None]:
+    from aws_lambda_powertools.metrics import MetricUnit, single_metric
+
+    def invoke() -> None:
+        for path, ip in dims:
+            with single_metric(
+                name="RequestCount", unit=MetricUnit.Count, value=1, namespace="ApiMonitor"
+            ) as metric:
+                metric.add_dimension(name="Path", value=path)
+                metric.add_dimension(name="ClientIP", value=ip)
+
+    return invoke
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        import aws_lambda_powertools  # noqa: F401
+
+        powertools = True
+    except ImportError:
+        powertools = False
+        print("aws_lambda_powertools not installed: measuring log_pipeline.emf only\n")
+
+    print("cold start (import + logger + 50-event invocation)")
+    for label, code in COLD.items():
+        if label.startswith("powertools") and not powertools:
+            continue
+        print(f"  {label:<26} {cold_start_ms(code, args.runs):8.1f} ms")
+
+    events = [json.loads(e["message"]) for e in fake_log_events(args.events)]
+    variants = {"log_pipeline.emf": emf_invocation}
+    if powertools:
+        variants["powertools (as before)"] = powertools_invocation
+        variants["powertools single_metric"] = powertools_single_invocation
+    pool = sorted({e["ip"] for e in events})[: args.clients]
+    for dims in (
+        [(e["path"], e["ip"]) for e in events],
+        [(e["path"], pool[n % len(pool)]) for n, e in enumerate(events)],
+    ):
+        print(f"\nper invocation ({args.events} events, {len(set(dims))} Path/ClientIP pairs)")
+        print(f"  {'':<26} {'us/event':>9} {'documents':>10} {'bytes':>10}")
+        for label, build in variants.items():
+            elapsed, output = timed(captured(build(dims)), args.repeat)
+            lines = output.splitlines()
+            counts = 0
+            for line in lines:
+                value = json.loads(line).get("RequestCount")
+                if isinstance(value, dict):
+                    counts += sum(value["Counts"])
+                else:
+                    counts += len(value) if isinstance(value, list) else 1
+            assert counts == args.events, (label, counts)
+            print(
+                f"  {label:<26} {elapsed / args.events * 1e6:>9.2f} {len(lines):>10} "
+                f"{len(output):>10,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
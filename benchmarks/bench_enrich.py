@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Per-event cost of the enrichment stage (log_pipeline.enrich).
+
+Writes a synthetic MaxMind DB (one /16 per country/ASN) to a temp file,
+rewrites generated access logs to draw their userAgent from a pool of real
+browser/client strings and their ip from ``--distinct-ips`` addresses, then
+times parsing alone against parsing plus enrichment, warm (cached) and with
+the LRUs disabled. Also checks a few known user-agent classifications.
+
+    python benchmarks/bench_enrich.py --events 200000 --distinct-ips 5000
+"""
+import argparse
+import json
+import random
+import struct
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from common import fake_log_events, timed
+
+from log_pipeline.enrich import Enricher, GeoIP, classify_user_agent
+from log_pipeline.mmdb import DATA_SEPARATOR, METADATA_MARKER
+from log_pipeline.projection import full_parse
+
+USER_AGENTS = {
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/143.0.0.0 Safari/537.36": ("Chrome", "Windows", "desktop"),
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.1 Safari/605.1.15": ("Safari", "macOS", "desktop"),
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1": ("Safari", "iOS", "mobile"),
+    "Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Mobile Safari/537.36": ("Chrome", "Android", "mobile"),
+    "Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36": ("Chrome", "Android", "tablet"),
+    "Mozilla/5.0 (iPad; CPU OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.1 Mobile/15E148 Safari/604.1": ("Safari", "iOS", "tablet"),
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0": ("Edge", "Windows", "desktop"),
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0": (
+        "Firefox",
+        "Linux",
+        "desktop",
+    ),
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)": (
+        "Other",
+        "Other",
+        "bot",
+    ),
+    "okhttp/4.12.0": ("okhttp", "Other", "client"),
+    "PostmanRuntime/7.36.0": ("Postman", "Other", "client"),
+    "python-requests/2.31.0": ("python-requests", "Other", "client"),
+    "-": ("", "", ""),
+}
+COUNTRIES = ["CO", "MX", "PE", "PA", "CR", "DO", "AR", "US", "ES", "CL"]
+
+
+# --- minimal MaxMind DB writer (stand-in for GeoLite2 files) ---------------
+
+
+def _ctrl(kind: int, size: int) -> bytes:
+    if size < 29:
+        head, extra = size, b""
+    elif size < 285:
+        head, extra = 29, bytes([size - 29])
+    elif size < 65821:
+        head, extra = 30, (size - 285).to_bytes(2, "big")
+    else:
+        head, extra = 31, (size - 65821).to_bytes(3, "big")
+    if kind < 8:
+        return bytes([(kind << 5) | head]) + extra
+    return bytes([head, kind - 7]) + extra
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bool):
+        return _ctrl(14, int(value))
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+        return _ctrl(2, len(data)) + data
+    if isinstance(value, int):
+        kind = 6 if value < 1 << 32 else 9
+        data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+        return _ctrl(kind, len(data)) + data
+    if isinstance(value, float):
+        return _ctrl(3, 8) + struct.pack(">d", value)
+    if isinstance(value, dict):
+        return _ctrl(7, len(value)) + b"".join(_encode(k) + _encode(v) for k, v in value.items())
+    if isinstance(value, list):
+        return _ctrl(11, len(value)) + b"".join(_encode(v) for v in value)
+    raise TypeError(type(value))
+
+
+def write_mmdb(path: str, networks: List[Tuple[str, int, Dict[str, Any]]]) -> None:
+    """IPv6 tree (24-bit records) holding IPv4 ``(address, prefix, record)`` networks."""
+    nodes: List[List[Any]] = [[None, None]]
+    data = bytearray()
+    for address, prefix, record in networks:
+        offset = len(data)
+        data += _encode(record)
+        value = int.from_bytes(bytes(int(octet) for octet in address.split(".")), "big")
+        bits = 96 + prefix
+        node = 0
+        for depth in range(bits):
+            bit = (value >> (127 - depth)) & 1 if depth >= 96 else 0
+            if depth == bits - 1:
+                nodes[node][bit] = ("data", offset)
+                break
+            child = nodes[node][bit]
+            if child is None:
+                nodes.append([None, None])
+                child = nodes[node][bit] = len(nodes) - 1
+            node = child
+    node_count = len(nodes)
+
+    def record(entry: Any) -> int:
+        if entry is None:
+            return node_count
+        if isinstance(entry, tuple):
+            return node_count + DATA_SEPARATOR + entry[1]
+        return entry
+
+    tree = b"".join(
+        record(left).to_bytes(3, "big") + record(right).to_bytes(3, "big") for left, right in nodes
+    )
+    metadata = {
+        "node_count": node_count,
+        "record_size": 24,
+        "ip_version": 6,
+        "database_type": "Bench-Country-ASN",
+        "languages": ["en"],
+        "binary_format_major_version": 2,
+        "binary_format_minor_version": 0,
+        "build_epoch": 1767225600,
+        "description": {"en": "bench_enrich.py stand-in"},
+    }
+    with open(path, "wb") as f:
+        f.write(tree + bytes(DATA_SEPARATOR) + bytes(data) + METADATA_MARKER + _encode(metadata))
+
+
+# ---------------------------------------------------------------------------
+
+
+def _messages(events: int, distinct_ips: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    ips = [f"{rng.randint(1, 200)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{i % 250 + 1}"
+           for i in range(distinct_ips)]
+    user_agents = list(USER_AGENTS)
+    messages = []
+    for event in fake_log_events(events):
+        fields = json.loads(event["message"])
+        fields["ip"] = rng.choice(ips)
+        fields["userAgent"] = rng.choice(user_agents)
+        messages.append(json.dumps(fields))
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--distinct-ips", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for user_agent, expected in USER_AGENTS.items():
+        got = classify_user_agent(user_agent)
+        assert got == expected, f"{user_agent!r}: {got} != {expected}"
+
+    with tempfile.NamedTemporaryFile(suffix=".mmdb") as db:
+        networks = [
+            (
+                f"{first}.{second}.0.0",
+                16,
+                {
+                    "country": {"iso_code": COUNTRIES[(first + second) % len(COUNTRIES)]},
+                    "autonomous_system_number": 64512 + first,
+                },
+            )
+            for first in range(1, 201)
+            for second in range(0, 256, 2)
+        ]
+        write_mmdb(db.name, networks)
+        geoip = GeoIP(db.name, db.name)
+        assert geoip.lookup("10.2.3.4") == (COUNTRIES[12 % len(COUNTRIES)], 64522)
+        assert geoip.lookup("10.3.3.4") == ("", 0)
+
+        messages = _messages(args.events, args.distinct_ips, seed=7)
+        n = len(messages)
+        base_s, _ = timed(lambda: [full_parse(m) for m in messages], args.repeat)
+        print(f"{'parse only':<28} {base_s * 1e6 / n:7.2f} us/event")
+        for label, enricher in (
+            ("parse + enrich (LRU)", Enricher(geoip)),
+            ("parse + enrich (no cache)", Enricher(geoip, ua_cache_size=0, ip_cache_size=0)),
+        ):
+            parse = enricher.wrap(full_parse)
+            elapsed, rows = timed(lambda: [parse(m) for m in messages], args.repeat)
+            print(
+                f"{label:<28} {elapsed * 1e6 / n:7.2f} us/event  "
+                f"+{(elapsed - base_s) * 1e6 / n:5.2f} us (+{(elapsed / base_s - 1) * 100:4.1f}%)  "
+                f"{json.dumps(enricher.stats())}"
+            )
+        devices: Dict[str, int] = {}
+        for row in rows:
+            devices[row["uaDevice"] or "unknown"] = devices.get(row["uaDevice"] or "unknown", 0) + 1
+        print(f"uaDevice counts: {devices}")
+        geoip.country.close()
+
+
+if __name__ == "__main__":
+    main()
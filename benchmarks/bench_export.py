@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Memory and throughput of the streaming log export (api_handler/export.py).
+
+ClickHouse is replaced by a JSONEachRow stream of fake access-log rows and
+S3 by an in-process multipart stand-in, so only the export path is measured:
+the peak memory it allocates (tracemalloc) and its throughput, for exports
+of growing size, when streamed (ASGI server), returned inline or staged
+through S3 (Mangum). The baseline is a buffered response: every row fetched
+as a dict and the whole JSON body built in memory.
+
+Needs the api_handler requirements (fastapi):
+
+    python benchmarks/bench_export.py --rows 10000 100000 500000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from common import LAMBDA_ROOT, fake_log_events
+
+sys.path.insert(0, str(LAMBDA_ROOT / "api_handler"))
+
+from starlette.requests import Request  # noqa: E402
+
+import export  # noqa: E402
+
+# One sample per row shape; rows cycle through them
+SAMPLES = [json.loads(e["message"]) for e in fake_log_events(1000)]
+LINES = [(json.dumps(sample) + "\n").encode() for sample in SAMPLES]
+
+
+class RowStream:
+    """File-like JSONEachRow body of ``rows`` rows, generated as it is read."""
+
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+        self.sent = 0
+        self.pending = b""
+
+    def read(self, size: int) -> bytes:
+        out = [self.pending]
+        length = len(self.pending)
+        while length < size and self.sent < self.rows:
+            line = LINES[self.sent % len(LINES)]
+            out.append(line)
+            length += len(line)
+            self.sent += 1
+        data = b"".join(out)
+        self.pending = data[size:]
+        return data[:size]
+
+    def close(self) -> None:
+        pass
+
+
+class MultipartSink:
+    """S3 multipart stand-in that only counts what it receives."""
+
+    def __init__(self) -> None:
+        self.parts = 0
+        self.bytes = 0
+
+    def create_multipart_upload(self, **kwargs: Any) -> Dict[str, str]:
+        return {"UploadId": "local"}
+
+    def upload_part(self, Body: bytes, **kwargs: Any) -> Dict[str, str]:
+        self.parts += 1
+        self.bytes += len(Body)
+        return {"ETag": f'"{self.parts}"'}
+
+    def complete_multipart_upload(self, **kwargs: Any) -> None:
+        pass
+
+    def abort_multipart_upload(self, **kwargs: Any) -> None:
+        pass
+
+    def generate_presigned_url(self, method: str, Params: Dict[str, str], ExpiresIn: int) -> str:
+        return f"https://example.invalid/{Params['Key']}"
+
+
+def request(mangum: bool) -> Request:
+    scope: Dict[str, Any] = {"type": "http", "method": "GET", "headers": [], "path": "/"}
+    if mangum:
+        scope["aws.event"] = {}
+    return Request(scope)
+
+
+async def streamed(rows: int) -> int:
+    response = await export.respond(
+        request(False), export.gzip_blocks(RowStream(rows).read), "x.ndjson"
+    )
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def via_mangum(rows: int) -> int:
+    s3 = MultipartSink()
+    export.BUCKET = "bench"
+    response = await export.respond(
+        request(True), export.gzip_blocks(RowStream(rows).read), "x.ndjson", lambda: s3
+    )
+    return s3.bytes if response.status_code == 303 else len(response.body)
+
+
+def buffered(rows: int) -> int:
+    result: List[Dict[str, Any]] = [dict(SAMPLES[n % len(SAMPLES)]) for n in range(rows)]
+    return len(json.dumps({"rows": result}).encode())
+
+
+def measure(fn) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    modes = {
+        "buffered JSON (baseline)": buffered,
+        "StreamingResponse": lambda rows: asyncio.run(streamed(rows)),
+        "Mangum inline / S3": lambda rows: asyncio.run(via_mangum(rows)),
+    }
+    print(f"{'rows':>8} {'mode':<26} {'body MB':>8} {'peak MB':>8} {'rows/s':>10}")
+    for rows in args.rows:
+        for label, fn in modes.items():
+            size, elapsed, peak = measure(lambda: fn(rows))
+            print(
+                f"{rows:>8} {label:<26} {size / 1e6:>8.2f} {peak / 1e6:>8.1f} "
+                f"{rows / elapsed:>10,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
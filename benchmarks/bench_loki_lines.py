@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Loki push size per line format (log_pipeline.lines) on generated access logs.
+
+Builds LokiSink push payloads for the same events with raw lines, minimal
+JSON and logfmt (placeholder values dropped, requestId/userId moved to
+structured metadata) and reports line bytes, push bytes, gzip bytes (a
+stand-in for Loki's chunk compression) and encode time against raw.
+
+    python benchmarks/bench_loki_lines.py --events 100000
+"""
+import argparse
+import gzip
+
+from common import fake_data_messages, timed
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.lines import LineEncoder
+from log_pipeline.sinks.loki import LokiSink
+
+ENCODERS = {
+    "raw": LineEncoder("raw"),
+    "json": LineEncoder("json"),
+    "logfmt": LineEncoder("logfmt"),
+    "logfmt, no metadata": LineEncoder("logfmt", metadata=()),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    events = list(iter_log_events(fake_data_messages(args.events)))
+    print(
+        f"{'format':<22} {'line B/ev':>10} {'push B/ev':>10} {'gzip B/ev':>10} "
+        f"{'ratio':>7} {'gzip ratio':>11} {'encode s':>9}"
+    )
+    baseline = None
+    for label, encoder in ENCODERS.items():
+        sink = LokiSink("http://loki", batch_size=args.batch_size, encoder=encoder)
+        elapsed, items = timed(lambda: [sink.convert(e) for e in events], args.repeat)
+        line_bytes = sum(len(value[1].encode("utf-8")) for _, value in items)
+        push_bytes = gzip_bytes = 0
+        for i in range(0, len(items), args.batch_size):
+            body = sink.request(items[i : i + args.batch_size]).body
+            push_bytes += len(body)
+            gzip_bytes += len(gzip.compress(body, compresslevel=6))
+        baseline = baseline or (push_bytes, gzip_bytes)
+        n = len(items)
+        print(
+            f"{label:<22} {line_bytes / n:10.0f} {push_bytes / n:10.0f} {gzip_bytes / n:10.1f} "
+            f"{baseline[0] / push_bytes:6.2f}x {baseline[1] / gzip_bytes:10.2f}x {elapsed:9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
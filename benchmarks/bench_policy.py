@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Routing policy (log_pipeline.policy): cost per event and volume per sink.
+
+Fake traffic is all successful and fast, so a share of the events is turned
+into errors (``--error-rate``, 4xx/5xx) and slow requests (``--slow-rate``,
+>= 1 s). With the policy below (that of cdk_deployment/lambda_stack.py plus a
+watched IP), reports the compiled route's time per event against evaluating
+the same rules in plain Python, and the events and message bytes each sink
+receives. Sinks with the same rate must get the same requests.
+
+    python benchmarks/bench_policy.py --events 200000 --error-rate 0.02
+"""
+import argparse
+import random
+from typing import Any, Dict, List
+
+from common import fake_data_messages, timed
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.policy import RoutingPolicy, sample_bucket
+
+SINKS = ["clickhouse", "loki", "opensearch"]
+WATCHED_IP = "190.99.139.120"
+POLICY = {
+    "rules": [
+        {"name": "errors", "when": {"status": ["4*", "5*"]}, "sinks": "*"},
+        {"name": "slow", "when": {"responseLatency": ">=1000"}, "sinks": "*"},
+        {"name": "watched", "when": [{"ip": [WATCHED_IP]}, {"routeKey": []}], "sinks": "*"},
+    ],
+    "default": {"clickhouse": 1, "loki": 0.05, "opensearch": 0.05},
+}
+
+
+def inject(messages: List[Dict[str, Any]], error_rate: float, slow_rate: float) -> None:
+    import json
+
+    rng = random.Random(11)
+    for message in messages:
+        for event in message["logEvents"]:
+            draw = rng.random()
+            if draw < error_rate or draw < error_rate + slow_rate or draw > 0.999:
+                fields = json.loads(event["message"])
+                if draw < error_rate:
+                    fields["status"] = rng.choice(["400", "404", "500", "502"])
+                elif draw > 0.999:
+                    fields["ip"] = WATCHED_IP
+                else:
+                    fields["responseLatency"] = str(rng.randint(1000, 5000))
+                event["message"] = json.dumps(fields)
+
+
+def interpreted(record: Any) -> tuple:
+    """The same policy as straightforward per-event Python."""
+    status = str(record.status or "")
+    try:
+        slow = float(record.responseLatency) >= 1000
+    except (TypeError, ValueError):
+        slow = False
+    if status[:1] in ("4", "5") or slow or record.ip == WATCHED_IP:
+        return (True, True, True)
+    sampled = sample_bucket(record) < 0.05 * 2**32
+    return (True, sampled, sampled)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--slow-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = fake_data_messages(args.events)
+    inject(messages, args.error_rate, args.slow_rate)
+    records = list(iter_log_events(messages))
+    policy = RoutingPolicy(POLICY["rules"], POLICY["default"])
+    route = policy.compile(SINKS)
+
+    compiled_s, routes = timed(lambda: [route(r) for r in records], args.repeat)
+    plain_s, expected = timed(lambda: [interpreted(r) for r in records], args.repeat)
+    assert routes == expected
+    n = len(records)
+    print(f"{n} events, policy reads {', '.join(policy.fields)}")
+    print(f"  compiled route     {compiled_s / n * 1e6:6.3f} us/event")
+    print(f"  hand-written rules {plain_s / n * 1e6:6.3f} us/event\n")
+
+    total_bytes = sum(len(r.message) for r in records)
+    print(f"  {'sink':<12} {'events':>9} {'share':>7} {'MB':>8} {'saved':>7}")
+    kept: Dict[str, set] = {}
+    for position, sink in enumerate(SINKS):
+        chosen = [r for r, wanted in zip(records, routes) if wanted[position]]
+        size = sum(len(r.message) for r in chosen)
+        kept[sink] = {r.requestId for r in chosen}
+        print(
+            f"  {sink:<12} {len(chosen):>9} {len(chosen) / n:>6.1%} {size / 1e6:>8.2f} "
+            f"{1 - size / total_bytes:>6.1%}"
+        )
+    assert kept["loki"] == kept["opensearch"]
+    print("\nloki and opensearch keep the same requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Field projection vs full json.loads on generated access-log messages.
+
+Checks that the projector returns exactly the keys a full parse would, then
+times both for the field sets the pipeline uses. ``make_parser`` only
+projects up to MAX_PROJECTED_FIELDS; larger sets use the full parse.
+
+    python benchmarks/bench_projection.py --events 200000
+"""
+import argparse
+import json
+
+from common import fake_log_events, timed
+
+from log_pipeline.projection import FieldProjector
+from log_pipeline.sinks.clickhouse import COLUMNS
+from log_pipeline.sinks.loki import LokiSink
+from log_pipeline.sinks.opensearch import OpenSearchSink
+
+FIELD_SETS = {
+    "loki": LokiSink.fields,
+    "log_processor": ("ip", "resourcePath"),
+    "opensearch": OpenSearchSink.fields,
+    "clickhouse": tuple(COLUMNS),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    messages = [event["message"] for event in fake_log_events(args.events)]
+    full_s, parsed = timed(lambda: [json.loads(m) for m in messages], args.repeat)
+    print(f"{'json.loads (all fields)':<28} {full_s:8.3f} s  {args.events / full_s:12,.0f} msg/s")
+
+    for label, fields in FIELD_SETS.items():
+        project = FieldProjector(fields)
+        elapsed, projected = timed(lambda: [project(m) for m in messages], args.repeat)
+        expected = [{k: p[k] for k in project.fields if k in p} for p in parsed]
+        assert projected == expected, f"{label}: projection differs from json.loads"
+        print(
+            f"{label + f' ({len(project.fields)} fields)':<28} {elapsed:8.3f} s  "
+            f"{args.events / elapsed:12,.0f} msg/s  x{full_s / elapsed:.2f}  "
+            f"fallbacks={project.fallbacks}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Shared LogRecord (log_pipeline.events) against the former per-sink items.
+
+Before, every event carried its parsed message dict and each sink built its
+own item from it: ClickHouse buffered the ~30-key dict, OpenSearch a new
+20-key document dict, Loki ``[ts, line]`` pairs. Now one tuple-backed record
+is normalized per event and every sink buffers that same object, writing its
+payload straight from it.
+
+Reports, for a ClickHouse + OpenSearch + Loki fan-out of ``--events``:
+normalization + convert time, the memory the buffered items retain
+(tracemalloc, message strings excluded as both keep them), and serialization
+time (ClickHouse columns, OpenSearch bulk body, logfmt Loki lines).
+
+    python benchmarks/bench_records.py --events 100000
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from common import fake_data_messages, timed
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.lines import LineEncoder
+from log_pipeline.projection import full_parse
+from log_pipeline.sinks.clickhouse import (
+    COLUMN_CONVERTERS,
+    ClickHouseSink,
+    columns_from_records,
+)
+from log_pipeline.sinks.loki import LokiSink
+from log_pipeline.sinks.opensearch import OpenSearchSink
+
+
+# --- former representation ---------------------------------------------------
+
+
+class LogEvent(NamedTuple):
+    timestamp: Optional[int]
+    event_id: Optional[str]
+    log_group: str
+    log_stream: str
+    message: str
+    fields: Dict[str, Any]
+
+
+def legacy_events(messages: List[Dict[str, Any]]) -> List[LogEvent]:
+    return [
+        LogEvent(e["timestamp"], e["id"], m["logGroup"], m["logStream"], e["message"], fields)
+        for m in messages
+        for e in m["logEvents"]
+        for fields in (full_parse(e["message"]),)
+    ]
+
+
+def legacy_opensearch_doc(event: LogEvent) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {
+        "timestamp": event.timestamp,
+        "id": event.event_id,
+        "logGroup": event.log_group,
+        "logStream": event.log_stream,
+    }
+    for name in OpenSearchSink.fields:
+        doc[name] = event.fields.get(name)
+    doc["message"] = event.message
+    return doc
+
+
+def legacy_items(events: List[LogEvent]) -> Tuple[List[Any], List[Any], List[Any]]:
+    clickhouse = [event.fields for event in events if event.fields]
+    opensearch = [legacy_opensearch_doc(event) for event in events]
+    loki = [
+        ((event.log_group, event.log_stream), [str(event.timestamp * 1_000_000), event.message])
+        for event in events
+    ]
+    return clickhouse, opensearch, loki
+
+
+def legacy_columns(messages: List[Dict[str, Any]]) -> List[List[Any]]:
+    return [
+        list(map(convert, [msg.get(name, "") for msg in messages]))
+        for name, convert in COLUMN_CONVERTERS
+    ]
+
+
+def legacy_bulk(docs: List[Dict[str, Any]]) -> bytes:
+    action = json.dumps({"index": {"_index": "apigw-logs"}})
+    lines = []
+    for doc in docs:
+        lines.append(action)
+        lines.append(json.dumps(doc))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# --- shared record -------------------------------------------------------------
+
+
+def record_items(messages, sinks) -> Tuple[List[Any], ...]:
+    buffers: Tuple[List[Any], ...] = tuple([] for _ in sinks)
+    for record in iter_log_events(messages):
+        for sink, buffer in zip(sinks, buffers):
+            item = sink.convert(record)
+            if item is not None:
+                buffer.append(item)
+    return buffers
+
+
+def retained(build: Callable[[], Any]) -> Tuple[int, Any]:
+    """Bytes still allocated after ``build`` returns (its result is kept)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    messages = fake_data_messages(args.events)
+    n = args.events
+    sinks = [
+        ClickHouseSink("localhost", 8123, "", "", False, 10),
+        OpenSearchSink("http://localhost:9200"),
+        LokiSink("http://localhost:3100"),
+    ]
+    encoder = LineEncoder("logfmt")
+
+    print(f"{'':<34} {'per-sink dicts':>15} {'LogRecord':>12} {'speedup':>8}")
+
+    totals = [0.0, 0.0]
+
+    def row(label: str, before: float, after: float, unit: str, scale: float) -> None:
+        if unit == "us":
+            totals[0] += before
+            totals[1] += after
+        print(
+            f"{label:<34} {before * scale:>12.2f} {unit:<2} {after * scale:>9.2f} {unit:<2} "
+            f"x{before / after:>6.2f}"
+        )
+
+    legacy_s, (events, legacy) = timed(
+        lambda: (lambda ev: (ev, legacy_items(ev)))(legacy_events(messages)), args.repeat
+    )
+    record_s, shared = timed(lambda: record_items(messages, sinks), args.repeat)
+    row("parse + normalize + convert", legacy_s / n, record_s / n, "us", 1e6)
+
+    # Messages are referenced by both forms; only what the items add counts
+    legacy_bytes, _ = retained(lambda: legacy_items(legacy_events(messages)))
+    record_bytes, _ = retained(lambda: record_items(messages, sinks))
+    row("retained by buffered items", legacy_bytes / n, record_bytes / n, "B", 1)
+
+    clickhouse, opensearch, _ = shared
+    before_s, expected = timed(lambda: legacy_columns(legacy[0]), args.repeat)
+    after_s, columns = timed(lambda: columns_from_records(clickhouse), args.repeat)
+    assert columns == expected
+    row("ClickHouse columns / event", before_s / n, after_s / n, "us", 1e6)
+
+    before_s, _ = timed(lambda: legacy_bulk(legacy[1]), args.repeat)
+    after_s, _ = timed(lambda: sinks[1].request(opensearch).body, args.repeat)
+    row("OpenSearch bulk body / event", before_s / n, after_s / n, "us", 1e6)
+
+    before_s, expected = timed(
+        lambda: [encoder.encode(event.message, event.fields) for event in events], args.repeat
+    )
+    records = list(iter_log_events(messages))
+    after_s, lines = timed(lambda: [encoder.encode_record(r) for r in records], args.repeat)
+    assert lines == expected
+    row("logfmt Loki line / event", before_s / n, after_s / n, "us", 1e6)
+    row("total", totals[0], totals[1], "us", 1e6)
+    print(f"LogRecord: {len(records[0])} slots, one per event shared by {len(sinks)} sink buffers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Spill encoding: length-prefixed columnar zstd chunks vs gzipped JSON lines.
+
+Spills generated ClickHouse and Loki batches both ways and reports size,
+encode time and replay (decode) time.
+
+    python benchmarks/bench_spill.py --events 100000 --batch 10000
+"""
+import argparse
+import gzip
+import json
+
+from common import fake_data_messages, timed
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.sinks.clickhouse import ClickHouseSink
+from log_pipeline.sinks.loki import LokiSink
+from log_pipeline.spill import decode_rows, encode_chunk, encode_rows, iter_chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    events = list(iter_log_events(fake_data_messages(args.events)))
+    sinks = [
+        ClickHouseSink("localhost", 8123, "", "", False, 10),
+        LokiSink("http://localhost:3100"),
+    ]
+    for sink in sinks:
+        items = [item for item in map(sink.convert, events) if item is not None]
+        batches = [items[i : i + args.batch] for i in range(0, len(items), args.batch)]
+
+        def spill_chunks() -> bytes:
+            return b"".join(
+                encode_chunk(encode_rows(sink.spill_schema, [sink.spill_row(i) for i in batch]))
+                for batch in batches
+            )
+
+        def spill_json() -> bytes:
+            return b"".join(
+                gzip.compress("".join(json.dumps(i) + "\n" for i in batch).encode("utf-8"))
+                for batch in batches
+            )
+
+        def replay_chunks(data: bytes) -> int:
+            count = 0
+            for payload in iter_chunks(data):
+                schema, rows = decode_rows(payload)
+                count += len([sink.restore(dict(zip(schema, row))) for row in rows])
+            return count
+
+        def replay_json(data: bytes) -> int:
+            # Single gzip members per batch concatenate into one gzip stream
+            return len([json.loads(line) for line in gzip.decompress(data).splitlines()])
+
+        enc_c, chunks = timed(spill_chunks, args.repeat)
+        enc_j, blob = timed(spill_json, args.repeat)
+        dec_c, n_c = timed(lambda: replay_chunks(chunks), args.repeat)
+        dec_j, n_j = timed(lambda: replay_json(blob), args.repeat)
+        assert n_c == n_j == len(items)
+        print(f"{sink.name}: {len(items)} items in {len(batches)} batches")
+        print(f"  {'format':<18} {'bytes':>12} {'encode s':>9} {'replay s':>9}")
+        print(f"  {'lps (zstd)':<18} {len(chunks):12,} {enc_c:9.3f} {dec_c:9.3f}")
+        print(f"  {'json lines (gzip)':<18} {len(blob):12,} {enc_j:9.3f} {dec_j:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Hourly summaries (log_pipeline.summaries): cost, size, accuracy, concurrency.
+
+``--writers`` threads play concurrent S3 processor invocations: each feeds
+its share of the fake events (spread over ``--hours``) through a
+``SummarySink`` in batches of ``--batch`` and merges into the same hourly
+objects of a local S3 stand-in with conditional puts (``--s3-latency-ms``
+per call, so merges overlap and conflict). Reports the wall time, the
+conflicts, the size of the summaries, that no count was lost, the latency
+quantiles' error against exact ones, and reading the whole range from the
+summaries against aggregating the raw events.
+
+    python benchmarks/bench_summaries.py --events 200000 --writers 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from common import LocalS3, fake_data_messages
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.sinks.summary import SummarySink
+from log_pipeline.summaries import S3SummaryStore, combine, read_summaries
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def exact_quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def ingest(records: List[Any], writers: int, batch: int, s3: LocalS3) -> List[SummarySink]:
+    sinks = [SummarySink(S3SummaryStore(s3, "bench"), batch_size=batch) for _ in range(writers)]
+
+    def run(n: int) -> None:
+        sink = sinks[n]
+        for record in records[n::writers]:
+            sink.add(record)
+        sink.flush()
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sinks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--s3-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    messages = fake_data_messages(args.events, span_ms=args.hours * 3600 * 1000)
+    records = list(iter_log_events(messages))
+    s3 = LocalS3({}, args.s3_latency_ms)
+
+    # The sink prints a line per batch; only the totals matter here
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        sinks = ingest(records, args.writers, args.batch, s3)
+        elapsed = time.perf_counter() - started
+
+    delivered = sum(sink.delivered for sink in sinks)
+    conflicts = sum(sink.conflicts for sink in sinks)
+    sizes = [len(body) for body in s3.objects.values()]
+    print(f"{len(records)} events, {args.writers} writers, batches of {args.batch}")
+    print(f"  delivered            {delivered} (failed {sum(s.failed for s in sinks)})")
+    print(f"  wall time            {elapsed:.2f} s ({args.s3_latency_ms} ms per S3 call)")
+    print(f"  S3 gets / puts       {s3.stats['get']} / {s3.stats['put']}")
+    print(f"  conflicts retried    {conflicts} ({s3.stats['precondition_failed']} 412s)")
+    print(
+        f"  summary objects      {len(sizes)}, {sum(sizes) / len(sizes) / 1024:.1f} KB avg, "
+        f"{max(sizes) / 1024:.1f} KB max"
+    )
+
+    # Nothing lost: the stored counts equal the exact ones
+    start = datetime.fromtimestamp(records[0].timestamp / 1000, timezone.utc)
+    end = datetime.fromtimestamp(records[-1].timestamp / 1000 + 3600, timezone.utc)
+    store = S3SummaryStore(s3, "bench")
+    read_started = time.perf_counter()
+    total = combine(read_summaries(store, start, end))
+    read_s = time.perf_counter() - read_started
+
+    exact_counts = Counter((r.path, r.status, r.applicationVersion) for r in records)
+    assert total.events == len(records), (total.events, len(records))
+    assert {k: v[0] for k, v in total.counts.items()} == dict(exact_counts)
+    exact_ips = Counter(r.ip for r in records)
+    listed = dict(total.ips.top(10))
+    assert total.ips.floor or all(listed[ip] == exact_ips[ip] for ip in listed)
+    print("  counts               exact (per path/status/applicationVersion)")
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    for r in records:
+        latencies[r.path].append(float(r.responseLatency))
+    worst = 0.0
+    for path, values in latencies.items():
+        for q, estimate in zip(QUANTILES, total.quantiles(path, QUANTILES)):
+            exact = exact_quantile(values, q)
+            worst = max(worst, abs(estimate - exact) / exact)
+    print(
+        f"  latency quantiles    worst relative error {worst:.2%} "
+        f"(p50/p90/p99 over {len(latencies)} paths)"
+    )
+
+    raw_started = time.perf_counter()
+    raw_counts = Counter(
+        (m["path"], m["status"]) for m in (json.loads(r.message) for r in records)
+    )
+    raw_s = time.perf_counter() - raw_started
+    assert sum(raw_counts.values()) == len(records)
+    print(
+        f"\n  read {len(sizes)} summaries  {read_s * 1e3:8.1f} ms "
+        f"({sum(sizes) / 1024:.0f} KB, incl. {args.s3_latency_ms} ms per get)"
+    )
+    print(
+        f"  aggregate raw rows   {raw_s * 1e3:8.1f} ms "
+        f"({sum(len(r.message) for r in records) / 1e6:.0f} MB already in memory)"
+    )
+
+
+if __name__ == "__main__":
+    main()
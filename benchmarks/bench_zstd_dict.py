@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+gzip vs zstd vs zstd with a trained dictionary (log_pipeline.zdict) for
+access-log objects: compression ratio and decode speed through
+log_pipeline.decode.
+
+The dictionary is trained on one generated corpus (``--train-events``) and
+measured on another (different seed), as Firehose objects of increasing
+size: one data message holding 1, 10 or 50 events, and a whole object of
+``--events`` events in 50-event messages.
+
+    python benchmarks/bench_zstd_dict.py --events 100000 --train-events 20000
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+
+from common import fake_data_messages, timed
+
+from log_pipeline import zdict
+from log_pipeline.decode import decompress
+
+
+def _object(messages) -> bytes:
+    # Firehose concatenates the records without separators
+    return "".join(json.dumps(m) for m in messages).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--train-events", type=int, default=20_000)
+    parser.add_argument("--dict-size", type=int, default=zdict.DEFAULT_DICT_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = [json.dumps(m).encode("utf-8") for m in fake_data_messages(args.train_events, seed=1)]
+    corpus += [
+        json.dumps(m).encode("utf-8")
+        for m in fake_data_messages(args.train_events // 10, events_per_message=1, seed=3)
+    ]
+    dictionary = zdict.train(corpus, args.dict_size)
+    with tempfile.TemporaryDirectory() as directory:
+        # Decoding looks the dictionary up by id, as the Lambda functions do
+        path = os.path.join(directory, f"api-logs{zdict.DICT_SUFFIX}")
+        with open(path, "wb") as f:
+            f.write(dictionary.as_bytes())
+        os.environ["ZSTD_DICTIONARIES"] = directory
+        zdict.dictionaries.cache_clear()
+        print(
+            f"dictionary {dictionary.dict_id()}: {len(dictionary.as_bytes())} bytes "
+            f"from {len(corpus)} samples\n"
+        )
+
+        codecs = {
+            "gzip -6": lambda data: gzip.compress(data, 6),
+            "zstd -3": lambda data: zdict.compress(data, level=3),
+            "zstd -19": lambda data: zdict.compress(data, level=19),
+            "zstd -3 + dict": lambda data: zdict.compress(data, dictionary, 3),
+            "zstd -19 + dict": lambda data: zdict.compress(data, dictionary, 19),
+        }
+        payloads = {
+            f"1 message, {n} events": _object(
+                fake_data_messages(n, events_per_message=n, seed=2)
+            )
+            for n in (1, 10, 50)
+        }
+        payloads[f"object, {args.events} events"] = _object(
+            fake_data_messages(args.events, seed=2)
+        )
+
+        for label, data in payloads.items():
+            print(f"{label} ({len(data):,} bytes)")
+            print(f"  {'codec':<16} {'bytes':>11} {'ratio':>7} {'decode MB/s':>12} {'vs gzip':>8}")
+            gzip_s = None
+            # Many copies of small payloads so the timings are measurable
+            copies = max(1, 2_000_000 // len(data))
+            for name, encode in codecs.items():
+                body = encode(data)
+                assert decompress(body) == data
+                elapsed, _ = timed(lambda: [decompress(body) for _ in range(copies)], args.repeat)
+                gzip_s = gzip_s or elapsed
+                print(
+                    f"  {name:<16} {len(body):>11,} {len(data) / len(body):>6.1f}x "
+                    f"{len(data) * copies / elapsed / 1e6:>12.0f} {gzip_s / elapsed:>7.1f}x"
+                )
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Fail when a Lambda handler's import time exceeds its budget.
+
+Runs ``python -X importtime -c "import handler"`` in a fresh interpreter per
+function (best of --repeat runs) and compares the cumulative time of the
+``handler`` module with BUDGETS_MS. Functions whose dependencies are not
+installed (e.g. layer-only packages) are reported as skipped.
+
+    python benchmarks/check_import_time.py [--repeat 5] [--scale 1.0]
+"""
+import argparse
+import subprocess
+import sys
+from typing import Optional
+
+from common import FUNCTIONS, LAMBDA_ROOT, function_env
+
+# Import of handler.py only; clients and heavy modules must load lazily.
+BUDGETS_MS = {
+    "api_handler": 30,
+    "kinesis_transformer": 60,
+    "log_processor": 60,
+    "s3_ingest": 150,
+    "s3_clickhouse": 150,
+    "s3_processor_loki": 150,
+    "s3_processor_opensearch": 150,
+}
+
+
+def import_time_ms(function: str) -> Optional[float]:
+    """Cumulative import time of ``handler``; None if it cannot be imported."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import handler"],
+        cwd=LAMBDA_ROOT / function,
+        env=function_env(function),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        if "ModuleNotFoundError" in proc.stderr:
+            return None
+        raise RuntimeError(f"{function}: import failed\n{proc.stderr[-2000:]}")
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "handler":
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"{function}: no importtime entry for handler")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    args = parser.parse_args()
+
+    failures = 0
+    for function in FUNCTIONS:
+        budget = BUDGETS_MS[function] * args.scale
+        samples = [import_time_ms(function) for _ in range(args.repeat)]
+        if any(sample is None for sample in samples):
+            print(f"SKIP {function:<26} dependencies not installed")
+            continue
+        best = min(samples)
+        status = "OK  " if best <= budget else "FAIL"
+        failures += best > budget
+        print(f"{status} {function:<26} {best:8.1f} ms (budget {budget:.0f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Shared helpers for the benchmark scripts: import paths and a synthetic corpus
+built with generate_fake_logs.py.
+"""
+import hashlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+LAMBDA_ROOT = ROOT / "src" / "lambda"
+LAYER_PATH = LAMBDA_ROOT / "layers" / "log_pipeline" / "python"
+
+# Lambda function directories (handler.handler) deployed by the CDK stacks
+FUNCTIONS = [
+    "api_handler",
+    "kinesis_transformer",
+    "log_processor",
+    "s3_ingest",
+    "s3_clickhouse",
+    "s3_processor_loki",
+    "s3_processor_opensearch",
+]
+
+for path in (ROOT, LAYER_PATH):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import generate_fake_logs  # noqa: E402
+
+
+def fake_log_events(
+    count: int, start_ms: int = 1_767_225_600_000, span_ms: int = 24 * 3600 * 1000, seed: int = 7
+) -> List[Dict[str, Any]]:
+    """``count`` CloudWatch log events spread evenly over ``span_ms``."""
+    random.seed(seed)
+    step = max(1, span_ms // max(1, count))
+    return [
+        generate_fake_logs.generate_fake_log_event(start_ms + i * step) for i in range(count)
+    ]
+
+
+def fake_data_messages(count: int, events_per_message: int = 50, **kwargs) -> List[Dict[str, Any]]:
+    """Wrap ``count`` fake events into CloudWatch DATA_MESSAGE envelopes."""
+    events = fake_log_events(count, **kwargs)
+    messages = []
+    for i in range(0, len(events), events_per_message):
+        messages.append(
+            {
+                "messageType": "DATA_MESSAGE",
+                "owner": "436951894705",
+                "logGroup": "/aws/apigateway/LambdaStack-fastapi",
+                "logStream": f"{i // events_per_message:032x}",
+                "subscriptionFilters": ["KinesisS3Log"],
+                "logEvents": events[i : i + events_per_message],
+            }
+        )
+    return messages
+
+
+def timed(fn: Callable[[], Any], repeat: int = 5) -> Tuple[float, Any]:
+    """Best wall time over ``repeat`` runs (seconds) and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def function_env(function: str) -> Dict[str, str]:
+    """Environment for running a handler in a subprocess, as Lambda would."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(LAMBDA_ROOT / function), str(LAYER_PATH)])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def start_push_server(latency_ms: float = 0) -> Tuple[ThreadingHTTPServer, Dict[str, int]]:
+    """
+    Local HTTP/1.1 keep-alive stand-in for Loki/OpenSearch: every POST gets
+    204 after ``latency_ms``. Returns the server and its request/connection
+    counters.
+    """
+    stats = {"requests": 0, "connections": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            stats["connections"] += 1
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_ms / 1000)
+            stats["requests"] += 1
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+class LocalS3Error(Exception):
+    """botocore ``ClientError`` look-alike (``response["Error"]["Code"]``)."""
+
+    def __init__(self, code: str) -> None:
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class LocalS3:
+    """
+    S3 client stand-in serving ``objects`` (key -> bytes) after ``latency_ms``.
+
+    ``get_object`` / ``put_object`` return and honour ETags (``IfMatch``,
+    ``IfNoneMatch="*"``) atomically, like S3 conditional writes.
+    """
+
+    def __init__(self, objects: Dict[str, bytes], latency_ms: float = 0) -> None:
+        self.objects = objects
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.stats = {"get": 0, "put": 0, "precondition_failed": 0}
+
+    def download_file(self, bucket: str, key: str, path: str) -> None:
+        time.sleep(self.latency_ms / 1000)
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        return '"%s"' % hashlib.md5(body).hexdigest()
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> Dict[str, Any]:
+        time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            self.stats["get"] += 1
+            if Key not in self.objects:
+                raise LocalS3Error("NoSuchKey")
+            body = self.objects[Key]
+        return {"Body": io.BytesIO(body), "ETag": self.etag(body), "ContentLength": len(body)}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs: Any) -> Dict[str, Any]:
+        time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            self.stats["put"] += 1
+            current = self.objects.get(Key)
+            if_match = kwargs.get("IfMatch")
+            if (kwargs.get("IfNoneMatch") == "*" and current is not None) or (
+                if_match is not None and (current is None or self.etag(current) != if_match)
+            ):
+                self.stats["precondition_failed"] += 1
+                raise LocalS3Error("PreconditionFailed")
+            self.objects[Key] = Body
+        return {"ETag": self.etag(Body)}
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Local power tuning: duration, peak memory and cost per Lambda memory size.
+
+Lambda gives a function CPU in proportion to its memory (1769 MB = 1 vCPU).
+For every memory size each handler runs in a fresh interpreter that is
+throttled to that share: below one vCPU by stopping and resuming it
+(SIGSTOP/SIGCONT) on a short duty cycle, above it by pinning it to that many
+cores (capped at the cores this host has). After a warm-up call the mean of
+``--invocations`` warm calls (which averages out the duty cycle) is priced at
+the arm64 or x86_64 GB-second rate of the function's profile
+(cdk_deployment/profiles.py). Sizes whose peak RSS plus ``--headroom`` does
+not fit are rejected.
+
+s3_ingest reads a local gzip object (no AWS calls) and pushes to a local
+Loki stand-in. The result is printed as a ``profiles`` context override for
+``cdk deploy -c profiles=...``. Architecture speed is not emulated (the
+handler runs on this host's CPU), only its price; functions whose
+dependencies are not installed are skipped.
+
+    python benchmarks/power_tuning.py [--function s3_ingest] [--strategy balanced]
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bench_cold_start import sample_event
+from common import LAMBDA_ROOT, ROOT, fake_data_messages, function_env, start_push_server
+
+from cdk_deployment.profiles import ARM_64, PROFILES, profile_for
+
+MEMORY_SIZES = [128, 256, 512, 1024, 1769, 3008]
+MB_PER_VCPU = 1769
+# USD, us-east-1
+GB_SECOND_PRICE = {ARM_64: 0.0000133334, "x86_64": 0.0000166667}
+REQUEST_PRICE = 0.20 / 1_000_000
+# Duty-cycle period for fractional vCPUs
+THROTTLE_PERIOD_S = 0.02
+
+# Runs inside the throttled child; prints one JSON line with timings (ms)
+CHILD = """
+import json, os, resource, sys, time
+import handler
+with open(sys.argv[1]) as fh:
+    event = json.load(fh)
+if os.environ.get("POWER_TUNING_OBJECT"):
+    from common import LocalS3
+    from log_pipeline import ingest
+    with open(os.environ["POWER_TUNING_OBJECT"], "rb") as fh:
+        s3 = LocalS3({event["Records"][0]["s3"]["object"]["key"]: fh.read()})
+    ingest.get_s3_client = lambda: s3
+durations = []
+for _ in range(int(sys.argv[2]) + 1):
+    started = time.perf_counter()
+    handler.handler(event, None)
+    durations.append((time.perf_counter() - started) * 1e3)
+sys.stdout.flush()
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+sys.__stderr__.write("@@" + json.dumps({"durations": durations[1:], "rss_mb": rss_mb}))
+"""
+
+# Sink, checkpoint and dedup settings are replaced with local-only ones
+CLEARED_ENV = (
+    "INGEST_SINKS",
+    "CLICKHOUSE_HOST",
+    "LOKI_ENDPOINT",
+    "OPENSEARCH_ENDPOINT",
+    "CHECKPOINT_STORE",
+    "SPILL_URL",
+    "DEDUP_ENABLED",
+    "ASYNC_DELIVERY",
+    "INGEST_QUEUE_URL",
+)
+
+
+def _throttle(proc: subprocess.Popen, vcpus: float) -> None:
+    """Keep ``proc`` running ``vcpus`` of the time (fractional vCPU)."""
+    running = THROTTLE_PERIOD_S * vcpus
+    try:
+        while proc.poll() is None:
+            time.sleep(running)
+            os.kill(proc.pid, signal.SIGSTOP)
+            time.sleep(THROTTLE_PERIOD_S - running)
+            os.kill(proc.pid, signal.SIGCONT)
+    except ProcessLookupError:
+        pass
+
+
+def run_at(
+    function: str, memory_mb: int, event_path: str, invocations: int, env: Dict[str, str]
+) -> Dict[str, Any]:
+    vcpus = memory_mb / MB_PER_VCPU
+    proc = subprocess.Popen(
+        [sys.executable, "-c", CHILD, event_path, str(invocations)],
+        cwd=LAMBDA_ROOT / function,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if vcpus < 1:
+        threading.Thread(target=_throttle, args=(proc, vcpus), daemon=True).start()
+    elif hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(proc.pid, cores[: max(1, math.ceil(vcpus))])
+    _, stderr = proc.communicate()
+    if proc.returncode != 0 or "@@" not in stderr:
+        lines = stderr.strip().splitlines() or ["no output"]
+        raise RuntimeError(lines[-1])
+    result = json.loads(stderr.rsplit("@@", 1)[1])
+    return {
+        "memory_mb": memory_mb,
+        "duration_ms": statistics.mean(result["durations"]),
+        "rss_mb": result["rss_mb"],
+    }
+
+
+def cost_per_million(memory_mb: int, duration_ms: float, architecture: str) -> float:
+    gb_seconds = memory_mb / 1024 * duration_ms / 1000
+    return (gb_seconds * GB_SECOND_PRICE[architecture] + REQUEST_PRICE) * 1_000_000
+
+
+def choose(results: List[Dict[str, Any]], strategy: str, weight: float) -> Dict[str, Any]:
+    """Cheapest, fastest, or the best ``weight``-blend of normalised cost and speed."""
+    if strategy == "cost":
+        return min(results, key=lambda r: (r["cost"], r["duration_ms"]))
+    if strategy == "speed":
+        return min(results, key=lambda r: (r["duration_ms"], r["cost"]))
+    max_cost = max(r["cost"] for r in results)
+    max_duration = max(r["duration_ms"] for r in results)
+    return min(
+        results,
+        key=lambda r: (
+            weight * r["cost"] / max_cost + (1 - weight) * r["duration_ms"] / max_duration
+        ),
+    )
+
+
+def tune(function: str, args: argparse.Namespace, tmp: Path) -> Optional[Dict[str, Any]]:
+    architecture = profile_for(function).architecture
+    env = function_env(function)
+    for name in CLEARED_ENV:
+        env.pop(name, None)
+    env["PYTHONPATH"] = os.pathsep.join([env["PYTHONPATH"], str(ROOT / "benchmarks")])
+    event = sample_event(function)
+    if function == "s3_ingest":
+        body = "\n".join(json.dumps(m) for m in fake_data_messages(args.events))
+        obj = tmp / "object.gz"
+        obj.write_bytes(gzip.compress(body.encode("utf-8")))
+        server, _ = start_push_server()
+        env.update(
+            POWER_TUNING_OBJECT=str(obj),
+            INGEST_SINKS="loki",
+            LOKI_ENDPOINT=f"http://127.0.0.1:{server.server_port}",
+        )
+    event_path = tmp / f"{function}.json"
+    event_path.write_text(json.dumps(event))
+
+    print(f"\n{function} ({architecture})")
+    print(f"{'memory MB':>10} {'vCPU':>6} {'mean ms':>10} {'RSS MB':>8} {'$/1M calls':>11}")
+    results = []
+    for memory_mb in args.memory:
+        try:
+            result = run_at(function, memory_mb, str(event_path), args.invocations, env)
+        except RuntimeError as exc:
+            print(f"  skipped: {exc}")
+            return None
+        result["cost"] = cost_per_million(memory_mb, result["duration_ms"], architecture)
+        fits = result["rss_mb"] * (1 + args.headroom) <= memory_mb
+        print(
+            f"{memory_mb:10d} {memory_mb / MB_PER_VCPU:6.2f} {result['duration_ms']:10.1f} "
+            f"{result['rss_mb']:8.0f} {result['cost']:11.4f}{'' if fits else '  (out of memory)'}"
+        )
+        if fits:
+            results.append(result)
+    if not results:
+        print("  no memory size fits")
+        return None
+    best = choose(results, args.strategy, args.weight)
+    print(f"  {args.strategy}: {best['memory_mb']} MB")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--function", action="append", choices=sorted(PROFILES))
+    parser.add_argument("--memory", type=int, nargs="+", default=MEMORY_SIZES)
+    parser.add_argument("--invocations", type=int, default=10, help="warm calls per size")
+    parser.add_argument("--events", type=int, default=20000, help="events in the s3_ingest object")
+    parser.add_argument("--strategy", choices=("cost", "speed", "balanced"), default="balanced")
+    parser.add_argument("--weight", type=float, default=0.5, help="cost weight for balanced")
+    parser.add_argument("--headroom", type=float, default=0.2, help="memory margin over peak RSS")
+    args = parser.parse_args()
+
+    overrides = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for function in args.function or sorted(PROFILES):
+            best = tune(function, args, Path(tmp))
+            if best is not None and best["memory_mb"] != profile_for(function).memory_mb:
+                overrides[function] = {"memory_mb": best["memory_mb"]}
+    print("\nprofiles override (cdk deploy -c profiles=...):")
+    print(json.dumps(overrides))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,57 @@ from aws_cdk import (
     aws_iam as iam,
     aws_s3 as s3,
     aws_s3_notifications as s3n,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
     Duration,
+    Size,
     Tags,
     RemovalPolicy,
 )
 from constructs import Construct
+import json
 import os
 
+from profiles import ARM_64, FunctionProfile, profile_for
+
+# Errors, slow requests and watched clients go to every sink; the remaining
+# (mostly 200) traffic goes whole to ClickHouse and as a deterministic 5%
+# sample (by requestId) to Loki and OpenSearch. See log_pipeline/policy.py
+ROUTING_POLICY = {
+    "rules": [
+        {"name": "errors", "when": {"status": ["4*", "5*"]}, "sinks": "*"},
+        {"name": "slow", "when": {"responseLatency": ">=1000"}, "sinks": "*"},
+        # Per-client / per-route overrides: IPs or CIDR blocks, route globs
+        {"name": "watched", "when": [{"ip": []}, {"routeKey": []}], "sinks": "*"},
+    ],
+    # Hourly summaries must see every event
+    "default": {"clickhouse": 1, "loki": 0.05, "opensearch": 0.05, "summary": 1},
+}
+
+
+def _profile_props(profile: FunctionProfile) -> dict:
+    """Function props for a performance profile (see profiles.py)."""
+    return {
+        "architecture": (
+            _lambda.Architecture.ARM_64
+            if profile.architecture == ARM_64
+            else _lambda.Architecture.X86_64
+        ),
+        "memory_size": profile.memory_mb,
+        "ephemeral_storage_size": Size.mebibytes(profile.ephemeral_storage_mb),
+        "timeout": Duration.seconds(profile.timeout_seconds),
+        "reserved_concurrent_executions": profile.reserved_concurrency,
+    }
+
+
+def _live_target(function: _lambda.Function, profile: FunctionProfile) -> _lambda.IFunction:
+    """A "live" alias with provisioned concurrency when the profile asks for it."""
+    if not profile.provisioned_concurrency:
+        return function
+    return function.add_alias(
+        "live", provisioned_concurrent_executions=profile.provisioned_concurrency
+    )
+
 
 class LambdaStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -32,6 +76,30 @@ class LambdaStack(Stack):
         )  # Required by SCP for resource creation
         Tags.of(self).add("Repository", "cloud-deployments")
 
+        # Architecture, memory/CPU, /tmp, timeout and concurrency per function;
+        # override with -c profiles='{"s3_ingest": {"memory_mb": 3008}}'
+        profiles_context = self.node.try_get_context("profiles")
+        api_profile = profile_for("api_handler", profiles_context)
+        log_processor_profile = profile_for("log_processor", profiles_context)
+        transformer_profile = profile_for("kinesis_transformer", profiles_context)
+        s3_ingest_profile = profile_for("s3_ingest", profiles_context)
+
+        # Shared ingestion code (parsing + sink router) used by the S3 processors,
+        # the log processor (field projection, EMF metrics) and the API
+        # (ClickHouse rollup queries)
+        log_pipeline_layer = _lambda.LayerVersion(
+            self,
+            "LogPipelineLayer",
+            code=_lambda.Code.from_asset("../src/lambda/layers/log_pipeline"),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_11],
+            # Pure Python: usable from both arm64 and x86_64 functions
+            compatible_architectures=[
+                _lambda.Architecture.ARM_64,
+                _lambda.Architecture.X86_64,
+            ],
+            description="log_pipeline: S3 access-log parsing and sink fan-out",
+        )
+
         # API Lambda function (FastAPI)
         api_lambda_function = _lambda.Function(
             self,
@@ -39,28 +107,37 @@ class LambdaStack(Stack):
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="handler.handler",
             code=_lambda.Code.from_asset("../src/lambda/api_handler"),
-            timeout=Duration.seconds(30),
-            memory_size=256,
-        )
-
-        # AWS Lambda Powertools Layer (public layer from AWS)
-        # ARN format: arn:aws:lambda:{region}:017000801446:layer:AWSLambdaPowertoolsPythonV2:{version}
-        powertools_layer = _lambda.LayerVersion.from_layer_version_arn(
-            self,
-            "PowertoolsLayer",
-            layer_version_arn=f"arn:aws:lambda:{self.region}:017000801446:layer:AWSLambdaPowertoolsPythonV2:2",
+            **_profile_props(api_profile),
+            layers=[log_pipeline_layer],
+            environment={
+                # ClickHouse placeholder connection config (analytics endpoints)
+                "CLICKHOUSE_HOST": "",
+                "CLICKHOUSE_PORT": "8443",
+                "CLICKHOUSE_USER": "",
+                "CLICKHOUSE_PASSWORD": "",
+                "CLICKHOUSE_SECURE": "true",
+                "CLICKHOUSE_POOL_SIZE": "8",
+                "ANALYTICS_CACHE_TTL": "30",
+                "ANALYTICS_HISTORICAL_CACHE_TTL": "600",
+                # /logs/export: gzip NDJSON, larger exports staged in S3
+                "EXPORT_BUCKET": "test-nf-tags",
+                "EXPORT_PREFIX": "exports/",
+                "EXPORT_INLINE_BYTES": str(4 << 20),
+                "EXPORT_URL_TTL": "900",
+            },
         )
 
         # Log Processor Lambda function
+        # RequestCount metrics are EMF documents written by log_pipeline.emf
+        # (no Powertools layer)
         log_processor_function = _lambda.Function(
             self,
             "LogProcessorLambda",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="handler.handler",
             code=_lambda.Code.from_asset("../src/lambda/log_processor"),
-            timeout=Duration.seconds(60),
-            memory_size=256,
-            layers=[powertools_layer],
+            **_profile_props(log_processor_profile),
+            layers=[log_pipeline_layer],
         )
 
         # Kinesis Transformer Lambda function (for Firehose to Loki)
@@ -70,34 +147,96 @@ class LambdaStack(Stack):
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="handler.handler",
             code=_lambda.Code.from_asset("../src/lambda/kinesis_transformer"),
-            timeout=Duration.seconds(60),
-            memory_size=256,
-        )
-
-        # S3 Processor Lambda function (triggered by S3 uploads)
-        s3_processor_function = _lambda.Function(
-            self,
-            "S3ProcessorLambda",
-            runtime=_lambda.Runtime.PYTHON_3_11,
-            handler="handler.handler",
-            code=_lambda.Code.from_asset("../src/lambda/s3_processor_loki"),
-            timeout=Duration.seconds(60),
-            memory_size=256,
+            **_profile_props(transformer_profile),
+            # TimeBudget: records left near the timeout go back as ProcessingFailed.
+            # Records also carry metadata.partitionKeys; enable dynamic
+            # partitioning on the (manually managed) Firehose stream with the
+            # S3 prefix documented in log_pipeline/partitions.py
+            layers=[log_pipeline_layer],
             environment={
-                "LOKI_ENDPOINT": "https://test-nlb-loki.alegra.com",
+                "DEADLINE_RESERVE_MS": "3000",
+                # Compact lines; requestId/userId as Loki structured metadata
+                "LOKI_LINE_FORMAT": "logfmt",
+                "LOKI_STRUCTURED_METADATA": "requestId,userId",
+                # Same policy as S3IngestLambda, so both keep the same requests
+                "ROUTING_POLICY": json.dumps(ROUTING_POLICY),
             },
         )
 
-        # S3 Processor for ClickHouse (placeholder connection config)
-        s3_clickhouse_function = _lambda.Function(
+        # S3 Ingest Lambda function (triggered by S3 uploads)
+        # Parses each object once and delivers it to Loki and ClickHouse
+        # (and OpenSearch when OPENSEARCH_ENDPOINT is set); replaces the
+        # separate S3ProcessorLambda / S3ClickhouseLambda functions.
+        s3_ingest_function = _lambda.Function(
             self,
-            "S3ClickhouseLambda",
+            "S3IngestLambda",
             runtime=_lambda.Runtime.PYTHON_3_11,
             handler="handler.handler",
-            code=_lambda.Code.from_asset("../src/lambda/s3_clickhouse"),
-            timeout=Duration.seconds(60),
-            memory_size=256,
+            code=_lambda.Code.from_asset("../src/lambda/s3_ingest"),
+            **_profile_props(s3_ingest_profile),
+            layers=[log_pipeline_layer],
             environment={
+                "INGEST_SINKS": "clickhouse,loki,opensearch,summary",
+                # Per-sink routing and sampling rules (ROUTING_POLICY above)
+                "ROUTING_POLICY": json.dumps(ROUTING_POLICY),
+                # Per-object/per-sink resume markers (outside the logs/ prefix)
+                "CHECKPOINT_STORE": "s3://test-nf-tags/checkpoints/",
+                "CHECKPOINT_SLICE_EVENTS": "50000",
+                # Stop this long before the timeout, flush and re-enqueue the rest
+                "DEADLINE_RESERVE_MS": "5000",
+                # Undeliverable batches (sink down or circuit open) for later replay;
+                # like checkpoints/, kept outside the notified logs/ prefix
+                "SPILL_URL": "s3://test-nf-tags/spill/",
+                # Comma-separated partition prefixes/segments to read or skip,
+                # e.g. "applicationVersion=mixed" (see log_pipeline.partitions)
+                "PARTITION_INCLUDE": "",
+                "PARTITION_EXCLUDE": "",
+                # Skip events already delivered (Firehose retries, duplicate
+                # notifications); the Bloom filter is shared through S3
+                "DEDUP_ENABLED": "true",
+                "DEDUP_CAPACITY": "1000000",
+                "DEDUP_FP_RATE": "0.0001",
+                "DEDUP_STORE": "s3://test-nf-tags/dedup/api-logs.bloom",
+                # Hourly summaries (counts, latency sketches, top IPs) merged
+                # into one JSON object per hour (see log_pipeline.summaries)
+                "SUMMARY_STORE": "s3://test-nf-tags/summaries/",
+                "SUMMARY_TOP_IPS": "100",
+                "SUMMARY_MAX_PATHS": "500",
+                "CIRCUIT_FAILURE_THRESHOLD": "3",
+                "CIRCUIT_RESET_SECONDS": "30",
+                "LOKI_MAX_CONCURRENCY": "4",
+                # Loki/OpenSearch pushes go through the asyncio engine (aiohttp
+                # keep-alive pool) and overlap with S3 reads and parsing
+                "ASYNC_DELIVERY": "true",
+                # Target rows per ClickHouse insert when draining IngestQueue
+                "CLICKHOUSE_BATCH_SIZE": "200000",
+                # Arrow insert path; needs pyarrow in a layer (e.g. AWS SDK for pandas)
+                "CLICKHOUSE_ARROW": "false",
+                "LOKI_ENDPOINT": "https://test-nlb-loki.alegra.com",
+                # logfmt lines without "-" fields; requestId/userId go to
+                # structured metadata (Loki 2.9+, see log_pipeline.lines)
+                "LOKI_LINE_FORMAT": "logfmt",
+                "LOKI_STRUCTURED_METADATA": "requestId,userId",
+                # Per-tenant pushes (X-Scope-OrgID) by a message field, e.g.
+                # applicationVersion, or by idCompany through LOKI_TENANT_MAP
+                # (JSON); needs auth_enabled on Loki. Empty: single tenant
+                "LOKI_TENANT_FIELD": "",
+                "LOKI_TENANT_MAP": "",
+                # Enriched fields as extra Loki stream labels: every value
+                # multiplies the stream count, so only uaDevice (a handful of
+                # values). geoCountry (~250 values) stays in the line; add it
+                # only if country selectors matter more than stream count
+                "LOKI_LABEL_FIELDS": "uaDevice",
+                # uaBrowser/uaOS/uaDevice and geoCountry/geoAsn per event (see
+                # log_pipeline.enrich). The GeoLite2 files come from a layer
+                # under /opt; a missing file leaves its columns empty
+                "ENRICH_ENABLED": "true",
+                "GEOIP_COUNTRY_DB": "/opt/geoip/GeoLite2-Country.mmdb",
+                "GEOIP_ASN_DB": "/opt/geoip/GeoLite2-ASN.mmdb",
+                # Trained zstd dictionaries (*.zdict) for objects re-compressed with
+                # python -m log_pipeline.zdict; ship them in the layer's zstd/ folder
+                "ZSTD_DICTIONARIES": "/opt/zstd",
+                # ClickHouse placeholder connection config
                 "CLICKHOUSE_HOST": "",
                 "CLICKHOUSE_PORT": "8443",
                 "CLICKHOUSE_USER": "",
@@ -115,7 +254,7 @@ class LambdaStack(Stack):
         # 2. Create notification:
         #    - Event types: All object create events
         #    - Prefix: logs/
-        #    - Destination: Lambda function → S3ProcessorLambda
+        #    - Destination: Lambda function → S3IngestLambda
 
         s3_bucket = s3.Bucket.from_bucket_name(
             self, "ExistingS3Bucket", bucket_name="test-nf-tags"
@@ -123,7 +262,7 @@ class LambdaStack(Stack):
 
         # Grant the lambda permission to be invoked by S3
         # S3 needs permission to invoke the lambda
-        s3_processor_function.add_permission(
+        s3_ingest_function.add_permission(
             "AllowS3Invoke",
             principal=iam.ServicePrincipal("s3.amazonaws.com"),
             source_arn=f"{s3_bucket.bucket_arn}/*",
@@ -132,19 +271,59 @@ class LambdaStack(Stack):
 
         # Grant the lambda permission to read from the S3 bucket
         # This grants: s3:GetObject and s3:GetObjectVersion
-        s3_bucket.grant_read(s3_processor_function)
+        s3_bucket.grant_read(s3_ingest_function)
+        # Checkpoint markers let retried events resume instead of re-ingesting
+        s3_bucket.grant_read_write(s3_ingest_function, "checkpoints/*")
+        s3_bucket.grant_read_write(s3_ingest_function, "spill/*")
+        s3_bucket.grant_read_write(s3_ingest_function, "dedup/*")
+        s3_bucket.grant_read_write(s3_ingest_function, "summaries/*")
+        # Log exports too large to return inline; expire them with a lifecycle
+        # rule on exports/ (the bucket is not managed by this stack)
+        s3_bucket.grant_read_write(api_lambda_function, "exports/*")
 
-        # Allow S3 to invoke and read for ClickHouse processor (configure notification manually)
-        s3_clickhouse_function.add_permission(
-            "AllowS3InvokeClickhouse",
-            principal=iam.ServicePrincipal("s3.amazonaws.com"),
-            source_arn=f"{s3_bucket.bucket_arn}/*",
-            source_account=self.account,
+        # SQS buffer between S3 notifications and S3IngestLambda
+        # Draining many objects per invocation merges them into few large
+        # sink writes (fewer ClickHouse parts). To use it, point the manual S3
+        # notification at IngestQueue instead of the Lambda function.
+        ingest_dlq = sqs.Queue(
+            self,
+            "IngestDeadLetterQueue",
+            retention_period=Duration.days(14),
+        )
+        ingest_queue = sqs.Queue(
+            self,
+            "IngestQueue",
+            # At least 6x the function timeout, as recommended for SQS sources
+            visibility_timeout=Duration.seconds(6 * s3_ingest_profile.timeout_seconds),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=ingest_dlq),
+        )
+        ingest_queue.add_to_resource_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                principals=[iam.ServicePrincipal("s3.amazonaws.com")],
+                actions=["sqs:SendMessage"],
+                resources=[ingest_queue.queue_arn],
+                conditions={
+                    "ArnLike": {"aws:SourceArn": s3_bucket.bucket_arn},
+                    "StringEquals": {"aws:SourceAccount": self.account},
+                },
+            )
+        )
+        # Objects deferred near the timeout are re-enqueued here and resume
+        # from their checkpoints in a later invocation
+        s3_ingest_function.add_environment("INGEST_QUEUE_URL", ingest_queue.queue_url)
+        ingest_queue.grant_send_messages(s3_ingest_function)
+        s3_ingest_function.add_event_source(
+            lambda_event_sources.SqsEventSource(
+                ingest_queue,
+                batch_size=100,
+                max_batching_window=Duration.seconds(30),
+                report_batch_item_failures=True,
+            )
         )
-        s3_bucket.grant_read(s3_clickhouse_function)
 
         # Alternative: Explicit permissions if needed
-        # s3_processor_function.add_to_role_policy(
+        # s3_ingest_function.add_to_role_policy(
         #     iam.PolicyStatement(
         #         effect=iam.Effect.ALLOW,
         #         actions=["s3:GetObject", "s3:GetObjectVersion"],
@@ -168,6 +347,8 @@ class LambdaStack(Stack):
             rest_api_name="FastAPI Lambda API",
             description="API Gateway for FastAPI Lambda function",
             cloud_watch_role=True,  # CDK will create a role automatically
+            # Pass binary (gzip) bodies through: Mangum base64-encodes them
+            binary_media_types=["*/*"],
             deploy_options=apigateway.StageOptions(
                 stage_name="prod",
                 logging_level=apigateway.MethodLoggingLevel.INFO,
@@ -189,8 +370,9 @@ class LambdaStack(Stack):
         )
 
         # Integrate Lambda with API Gateway
+        # (through the "live" alias when provisioned concurrency is configured)
         lambda_integration = apigateway.LambdaIntegration(
-            api_lambda_function,
+            _live_target(api_lambda_function, api_profile),
             request_templates={"application/json": '{"statusCode": "200"}'},
         )
 
@@ -198,6 +380,14 @@ class LambdaStack(Stack):
         user_resource = api.root.add_resource("user")
         user_resource.add_method("GET", lambda_integration)
 
+        # Log analytics routes: /analytics/{company_id}/{top-routes|error-rates|latency|top-ips}
+        analytics_resource = api.root.add_resource("analytics")
+        analytics_resource.add_resource("{proxy+}").add_method("GET", lambda_integration)
+
+        # Log export: /logs/export?company_id=...&start=...&end=... (gzip NDJSON)
+        logs_resource = api.root.add_resource("logs")
+        logs_resource.add_resource("export").add_method("GET", lambda_integration)
+
         # Create subscription filter to send logs to Lambda
         log_group.add_subscription_filter(
             "LogProcessorSubscriptionFilter",
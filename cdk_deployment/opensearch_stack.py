@@ -64,7 +64,9 @@ class OpenSearchDomainStack(Stack):
         # )
 
         # S3 Processor for OpenSearch is commented out while domain is disabled.
-        # Uncomment together with the domain if needed.
+        # Uncomment together with the domain if needed. The handler imports the
+        # log_pipeline layer (see LambdaStack); alternatively pass the endpoint as
+        # OPENSEARCH_ENDPOINT to S3IngestLambda to index from the fan-out function.
         # s3_processor_opensearch_function = _lambda.Function(
         #     self,
         #     "S3ProcessorOpenSearchLambda",
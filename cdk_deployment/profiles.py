@@ -0,0 +1,99 @@
+"""
+Per-function performance profiles for LambdaStack.
+
+Each function gets its own architecture, memory (which also sets its CPU
+share: 1769 MB = 1 vCPU), ephemeral /tmp storage, timeout and concurrency.
+Defaults live in PROFILES; override any field without editing code through
+the ``profiles`` CDK context, e.g. in cdk.json or on the command line::
+
+    cdk deploy -c profiles='{"s3_ingest": {"memory_mb": 3008}}'
+
+``benchmarks/power_tuning.py`` measures the handlers at several memory sizes
+and prints overrides in this format.
+
+Kept free of aws_cdk imports so the deploy workflow and the benchmarks can
+read it (``python cdk_deployment/profiles.py --platform s3_ingest``).
+"""
+import argparse
+import json
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+ARM_64 = "arm64"
+X86_64 = "x86_64"
+
+# pip --platform tag for the wheels a function is packaged with
+PIP_PLATFORMS = {ARM_64: "manylinux2014_aarch64", X86_64: "manylinux2014_x86_64"}
+
+
+@dataclass(frozen=True)
+class FunctionProfile:
+    architecture: str = ARM_64
+    memory_mb: int = 256
+    ephemeral_storage_mb: int = 512
+    timeout_seconds: int = 30
+    # None leaves the function in the account's unreserved pool
+    reserved_concurrency: Optional[int] = None
+    # > 0 publishes a "live" alias with that many warm environments (API Gateway
+    # invokes api_handler through it)
+    provisioned_concurrency: int = 0
+
+
+PROFILES: Dict[str, FunctionProfile] = {
+    # /user and cached analytics queries: light, latency-sensitive
+    "api_handler": FunctionProfile(memory_mb=256, timeout_seconds=30),
+    # Pure Python (log_pipeline layer only): Graviton
+    "log_processor": FunctionProfile(memory_mb=256, timeout_seconds=60),
+    # gzip + JSON per Firehose record: CPU-bound
+    "kinesis_transformer": FunctionProfile(memory_mb=512, timeout_seconds=60),
+    # Parses whole objects and fans out to every sink: one full vCPU, room in
+    # /tmp for downloads and spill staging, and a cap on parallel ClickHouse inserts
+    "s3_ingest": FunctionProfile(
+        memory_mb=1769,
+        ephemeral_storage_mb=2048,
+        timeout_seconds=60,
+        reserved_concurrency=10,
+    ),
+}
+
+
+def _coerce(context: Any) -> Dict[str, Dict[str, Any]]:
+    if not context:
+        return {}
+    if isinstance(context, str):
+        context = json.loads(context)
+    return dict(context)
+
+
+def profile_for(name: str, context: Any = None) -> FunctionProfile:
+    """Profile of function ``name`` with overrides from the ``profiles`` context."""
+    profile = PROFILES.get(name, FunctionProfile())
+    overrides = _coerce(context).get(name) or {}
+    known = {f.name for f in fields(FunctionProfile)}
+    unknown = set(overrides) - known
+    if unknown:
+        raise ValueError(f"Unknown profile fields for {name}: {', '.join(sorted(unknown))}")
+    profile = replace(profile, **overrides)
+    if profile.architecture not in PIP_PLATFORMS:
+        raise ValueError(f"{name}: architecture must be {ARM_64} or {X86_64}")
+    return profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show Lambda performance profiles.")
+    parser.add_argument("--platform", metavar="FUNCTION", help="print the pip platform tag")
+    parser.add_argument("--context", help="profiles context JSON (default: cdk.json)")
+    args = parser.parse_args()
+    context = args.context
+    if context is None:
+        cdk_json = json.loads((Path(__file__).parent / "cdk.json").read_text())
+        context = cdk_json.get("context", {}).get("profiles")
+    if args.platform:
+        print(PIP_PLATFORMS[profile_for(args.platform, context).architecture])
+        return
+    print(json.dumps({n: asdict(profile_for(n, context)) for n in PROFILES}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -60,30 +60,81 @@ for i in {1..15}; do
 done
 
 # 7. Crear Base de Datos y Tabla de Logs
+# Tipos compactos: IPs en IPv6 (IPv4 mapeadas), IDs en UUID, strings repetitivos
+# en LowCardinality y codecs Delta/T64 + ZSTD en tiempo y latencias.
 clickhouse-client -q "CREATE DATABASE IF NOT EXISTS sistema_logs;"
 
 clickhouse-client -q "
 CREATE TABLE IF NOT EXISTS sistema_logs.api_logs (
-    requestTime DateTime64(3, 'UTC'), 
-    requestId String, 
+    requestTime DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)), 
+    requestId String CODEC(ZSTD(1)), 
     httpMethod LowCardinality(String), 
-    path String, 
-    routeKey String, 
+    path LowCardinality(String), 
+    routeKey LowCardinality(String), 
     status UInt16, 
-    bytes UInt32, 
-    responseLatency UInt32, 
-    integrationLatency UInt32, 
+    bytes UInt32 CODEC(T64, ZSTD(1)), 
+    responseLatency UInt32 CODEC(T64, ZSTD(1)), 
+    integrationLatency UInt32 CODEC(T64, ZSTD(1)), 
     functionResponseStatus UInt16, 
-    email String, 
-    userId String, 
-    orgId String, 
+    email String CODEC(ZSTD(1)), 
+    userId UUID, 
+    orgId UUID, 
     idCompany String, 
-    ip String, 
-    host String, 
-    userAgent String, 
+    ip IPv6, 
+    host LowCardinality(String), 
+    userAgent LowCardinality(String), 
     dataSource LowCardinality(String), 
     applicationVersion LowCardinality(String), 
-    referer String
+    referer String CODEC(ZSTD(1)),
+    uaBrowser LowCardinality(String),
+    uaOS LowCardinality(String),
+    uaDevice LowCardinality(String),
+    geoCountry LowCardinality(String),
+    geoAsn UInt32 CODEC(T64, ZSTD(1))
 ) ENGINE = MergeTree() 
 PARTITION BY toYYYYMM(requestTime) 
-ORDER BY (idCompany, requestTime, status);"
\ No newline at end of file
+ORDER BY (idCompany, requestTime, status);"
+
+# Columnas de enriquecimiento (user-agent y GeoIP, ver log_pipeline/enrich.py)
+# para tablas creadas antes de agregarlas
+clickhouse-client -q "
+ALTER TABLE sistema_logs.api_logs
+    ADD COLUMN IF NOT EXISTS uaBrowser LowCardinality(String),
+    ADD COLUMN IF NOT EXISTS uaOS LowCardinality(String),
+    ADD COLUMN IF NOT EXISTS uaDevice LowCardinality(String),
+    ADD COLUMN IF NOT EXISTS geoCountry LowCardinality(String),
+    ADD COLUMN IF NOT EXISTS geoAsn UInt32 CODEC(T64, ZSTD(1));"
+
+# 8. Rollups por minuto para dashboards (empresa/ruta/status/applicationVersion)
+# AggregatingMergeTree alimentada por una materialized view sobre api_logs;
+# mantener sincronizado con src/lambda/layers/log_pipeline/python/log_pipeline/schema.py
+clickhouse-client -q "
+CREATE TABLE IF NOT EXISTS sistema_logs.api_logs_route_1m (
+    idCompany String,
+    minute DateTime('UTC') CODEC(Delta, ZSTD(1)),
+    applicationVersion LowCardinality(String),
+    path LowCardinality(String),
+    status UInt16,
+    requests AggregateFunction(count),
+    bytes SimpleAggregateFunction(sum, UInt64),
+    responseLatency AggregateFunction(quantiles(0.5, 0.9, 0.99), UInt32),
+    integrationLatency AggregateFunction(quantiles(0.5, 0.9, 0.99), UInt32)
+) ENGINE = AggregatingMergeTree()
+PARTITION BY toYYYYMM(minute)
+ORDER BY (idCompany, minute, applicationVersion, path, status);"
+
+clickhouse-client -q "
+CREATE MATERIALIZED VIEW IF NOT EXISTS sistema_logs.api_logs_route_1m_mv
+TO sistema_logs.api_logs_route_1m AS
+SELECT
+    idCompany,
+    toStartOfMinute(requestTime) AS minute,
+    applicationVersion,
+    path,
+    status,
+    countState() AS requests,
+    sum(toUInt64(bytes)) AS bytes,
+    quantilesState(0.5, 0.9, 0.99)(responseLatency) AS responseLatency,
+    quantilesState(0.5, 0.9, 0.99)(integrationLatency) AS integrationLatency
+FROM sistema_logs.api_logs
+GROUP BY idCompany, minute, applicationVersion, path, status;"
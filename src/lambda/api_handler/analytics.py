@@ -0,0 +1,193 @@
+"""
+Log analytics endpoints over the ClickHouse ``api_logs`` table.
+
+Time ranges are aligned to buckets (coarser for longer ranges) before they
+become part of the cache key, so dashboards refreshing every few seconds hit
+the cache instead of ClickHouse. Aligned ranges fall on whole minutes, so the
+per-path endpoints (top-routes, latency) read the per-minute rollup
+(``log_pipeline.rollups``) instead of scanning the raw rows.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from cache import QueryCache
+from log_pipeline.rollups import can_use_rollup, route_stats_query
+from log_pipeline.schema import RAW_TABLE
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+DATABASE = os.getenv("CLICKHOUSE_DATABASE") or "sistema_logs"
+TABLE = os.getenv("CLICKHOUSE_TABLE") or "api_logs"
+MAX_RANGE = timedelta(days=31)
+# (max range length, bucket seconds); ranges are widened to whole buckets
+BUCKETS = (
+    (timedelta(hours=1), 60),
+    (timedelta(days=1), 300),
+    (timedelta(days=7), 3600),
+    (MAX_RANGE, 86400),
+)
+LIVE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+HISTORICAL_TTL = float(os.getenv("ANALYTICS_HISTORICAL_CACHE_TTL", "600"))
+
+cache = QueryCache(maxsize=int(os.getenv("ANALYTICS_CACHE_SIZE", "256")), ttl=LIVE_TTL)
+_client = None
+_client_lock = asyncio.Lock()
+
+
+async def get_client():
+    """Shared async ClickHouse client (HTTP connection pool) for the container."""
+    global _client
+    if _client is None:
+        # Concurrent first requests must not each open a pool
+        async with _client_lock:
+            if _client is None:
+                _client = await _connect()
+    return _client
+
+
+async def _connect():
+    import clickhouse_connect
+    from clickhouse_connect.driver import httputil
+
+    # The stack sets unconfigured values to "", so empty means the default too
+    return await clickhouse_connect.get_async_client(
+        host=os.getenv("CLICKHOUSE_HOST") or "localhost",
+        port=int(os.getenv("CLICKHOUSE_PORT") or "8123"),
+        username=os.getenv("CLICKHOUSE_USER") or "default",
+        password=os.getenv("CLICKHOUSE_PASSWORD") or "",
+        secure=(os.getenv("CLICKHOUSE_SECURE") or "false").lower() == "true",
+        connect_timeout=float(os.getenv("CLICKHOUSE_TIMEOUT") or "10"),
+        pool_mgr=httputil.get_pool_manager(
+            maxsize=int(os.getenv("CLICKHOUSE_POOL_SIZE") or "8")
+        ),
+    )
+
+
+def align_range(
+    start: Optional[datetime], end: Optional[datetime], now: Optional[datetime] = None
+) -> Tuple[datetime, datetime, int]:
+    """Default to the last hour and widen ``[start, end)`` to whole buckets."""
+    now = now or datetime.now(timezone.utc)
+    end = end or now
+    start = start or end - timedelta(hours=1)
+    start, end = (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc) for ts in (start, end))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"range exceeds {MAX_RANGE.days} days")
+
+    bucket = next(seconds for limit, seconds in BUCKETS if end - start <= limit)
+    start_ts = int(start.timestamp()) // bucket * bucket
+    end_ts = -(-int(end.timestamp()) // bucket) * bucket
+    return (
+        datetime.fromtimestamp(start_ts, timezone.utc),
+        datetime.fromtimestamp(end_ts, timezone.utc),
+        bucket,
+    )
+
+
+QUERIES = {
+    "top-routes": """
+        SELECT path, count() AS requests, countIf(status >= 400) AS errors
+        FROM {source} WHERE {where}
+        GROUP BY path ORDER BY requests DESC LIMIT {{limit:UInt32}}
+    """,
+    "error-rates": """
+        SELECT path, count() AS requests,
+               countIf(status >= 400 AND status < 500) AS clientErrors,
+               countIf(status >= 500) AS serverErrors,
+               round((clientErrors + serverErrors) / requests, 4) AS errorRate
+        FROM {source} WHERE {where}
+        GROUP BY path ORDER BY errorRate DESC, requests DESC LIMIT {{limit:UInt32}}
+    """,
+    "latency": """
+        SELECT path, count() AS requests,
+               quantiles(0.5, 0.9, 0.99)(responseLatency) AS responseLatency,
+               quantiles(0.5, 0.9, 0.99)(integrationLatency) AS integrationLatency
+        FROM {source} WHERE {where}
+        GROUP BY path ORDER BY requests DESC LIMIT {{limit:UInt32}}
+    """,
+    "top-ips": """
+        SELECT replaceRegexpOne(IPv6NumToString(ip), '^::ffff:', '') AS ip,
+               count() AS requests, countIf(status >= 400) AS errors
+        FROM {source} WHERE {where}
+        GROUP BY ip ORDER BY requests DESC LIMIT {{limit:UInt32}}
+    """,
+}
+# Endpoints the rollup can answer, with the route_stats columns they return
+ROLLUP_COLUMNS = {
+    "top-routes": ("path", "requests", "errors"),
+    "latency": ("path", "requests", "responseLatency", "integrationLatency"),
+}
+_WHERE = (
+    "idCompany = {company_id:String} "
+    "AND requestTime >= {start:DateTime64(3)} AND requestTime < {end:DateTime64(3)}"
+)
+
+
+async def run_query(
+    client: Any,
+    name: str,
+    company_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int,
+) -> Dict[str, Any]:
+    start, end, bucket = align_range(start, end)
+    key = (name, company_id, start, end, limit)
+    # Closed ranges no longer change, so they can stay cached much longer
+    historical = end <= datetime.now(timezone.utc) - timedelta(seconds=bucket)
+
+    async def load() -> List[Dict[str, Any]]:
+        # The rollup is fed from api_logs only
+        if name in ROLLUP_COLUMNS and TABLE == RAW_TABLE and can_use_rollup(start, end):
+            sql, params = route_stats_query(
+                start,
+                end,
+                database=DATABASE,
+                use_rollup=True,
+                company_id=company_id,
+                group_by=("path",),
+                limit=limit,
+            )
+            result = await client.query(sql, parameters=params)
+            columns = ROLLUP_COLUMNS[name]
+            return [{col: row[col] for col in columns} for row in result.named_results()]
+
+        sql = QUERIES[name].format(source=f"{DATABASE}.{TABLE}", where=_WHERE)
+        result = await client.query(
+            sql,
+            parameters={"company_id": company_id, "start": start, "end": end, "limit": limit},
+        )
+        return list(result.named_results())
+
+    rows = await cache.get_or_load(key, load, ttl=HISTORICAL_TTL if historical else None)
+    return {
+        "companyId": company_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "bucketSeconds": bucket,
+        "rows": rows,
+    }
+
+
+def _endpoint(name: str):
+    async def endpoint(
+        company_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = Query(10, ge=1, le=1000),
+        client: Any = Depends(get_client),
+    ) -> Dict[str, Any]:
+        return await run_query(client, name, company_id, start, end, limit)
+
+    endpoint.__name__ = name.replace("-", "_")
+    return endpoint
+
+
+for _name in QUERIES:
+    router.add_api_route(f"/{{company_id}}/{_name}", _endpoint(_name), methods=["GET"])
@@ -0,0 +1,13 @@
+from fastapi import FastAPI
+
+from analytics import router as analytics_router
+from export import router as export_router
+
+app = FastAPI()
+app.include_router(analytics_router)
+app.include_router(export_router)
+
+
+@app.get("/user")
+def get_user():
+    return {"status": "ok"}
@@ -0,0 +1,241 @@
+"""
+Streaming log export: ``GET /logs/export`` as gzip-compressed NDJSON.
+
+ClickHouse renders the rows as JSONEachRow over its streaming HTTP API; the
+body is read in EXPORT_CHUNK_BYTES blocks and compressed on the fly, so
+memory stays flat whatever the result size.
+
+Behind an ASGI server that streams (uvicorn, or the Lambda Web Adapter in
+response-stream mode) the compressed blocks go straight out through a
+``StreamingResponse``. Mangum (API Gateway + Lambda) buffers responses and
+Lambda caps them at 6 MB (base64 for binary bodies), so there exports up to
+EXPORT_INLINE_BYTES compressed are returned inline and larger ones continue
+into an S3 multipart upload under EXPORT_BUCKET/EXPORT_PREFIX; the response
+is then a 303 to a presigned URL of the object.
+"""
+import asyncio
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from analytics import DATABASE, MAX_RANGE, TABLE, get_client
+
+router = APIRouter(prefix="/logs", tags=["logs"])
+
+MEDIA_TYPE = "application/x-ndjson"
+CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(1 << 20)))
+GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+# Below Lambda's 6 MB response limit once base64-encoded by Mangum
+INLINE_BYTES = int(os.getenv("EXPORT_INLINE_BYTES", str(4 << 20)))
+# S3 multipart parts (every part but the last must be >= 5 MiB)
+PART_BYTES = max(5 << 20, int(os.getenv("EXPORT_PART_BYTES", str(8 << 20))))
+BUCKET = os.getenv("EXPORT_BUCKET", "")
+PREFIX = os.getenv("EXPORT_PREFIX", "exports/")
+URL_TTL = int(os.getenv("EXPORT_URL_TTL", "900"))
+
+EXPORT_SQL = """
+    SELECT * EXCEPT ip, replaceRegexpOne(IPv6NumToString(ip), '^::ffff:', '') AS ip
+    FROM {source}
+    WHERE idCompany = {{company_id:String}}
+      AND requestTime >= {{start:DateTime64(3)}} AND requestTime < {{end:DateTime64(3)}}
+    ORDER BY requestTime
+"""
+# Rows as JSON numbers where they fit, read in blocks as ClickHouse sends them
+SETTINGS = {"output_format_json_quote_64bit_integers": 0}
+
+_s3 = None
+
+
+def get_s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+
+        _s3 = boto3.client("s3")
+    return _s3
+
+
+def export_range(
+    start: Optional[datetime], end: Optional[datetime], now: Optional[datetime] = None
+) -> Tuple[datetime, datetime]:
+    """Default to the last hour; reject empty or over-long ranges."""
+    end = end or now or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    start, end = (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc) for ts in (start, end))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > MAX_RANGE:
+        raise HTTPException(status_code=400, detail=f"range exceeds {MAX_RANGE.days} days")
+    return start, end
+
+
+async def gzip_blocks(
+    read: Callable[[int], bytes],
+    close: Optional[Callable[[], None]] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    level: int = GZIP_LEVEL,
+) -> AsyncIterator[bytes]:
+    """
+    gzip of a blocking byte stream, read ``chunk_bytes`` at a time in the
+    default executor; only one block is held in memory at a time.
+    """
+    loop = asyncio.get_running_loop()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    try:
+        while True:
+            block = await loop.run_in_executor(None, read, chunk_bytes)
+            if not block:
+                break
+            data = compressor.compress(block)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if close is not None:
+            close()
+
+
+async def upload_multipart(
+    s3: Any,
+    bucket: str,
+    key: str,
+    head: List[bytes],
+    rest: AsyncIterator[bytes],
+    part_bytes: int = PART_BYTES,
+) -> int:
+    """
+    Upload ``head`` then ``rest`` as one S3 object in ``part_bytes`` parts,
+    holding at most one part in memory; returns the object size.
+    """
+    loop = asyncio.get_running_loop()
+
+    def call(method: Callable[..., Any], **kwargs: Any) -> "asyncio.Future[Any]":
+        return loop.run_in_executor(None, lambda: method(**kwargs))
+
+    upload = await call(
+        s3.create_multipart_upload,
+        Bucket=bucket,
+        Key=key,
+        ContentType=MEDIA_TYPE,
+        ContentEncoding="gzip",
+    )
+    upload_id = upload["UploadId"]
+    parts: List[Dict[str, Any]] = []
+    buffer = bytearray()
+    size = 0
+
+    async def send(body: bytes) -> None:
+        number = len(parts) + 1
+        result = await call(
+            s3.upload_part,
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        parts.append({"PartNumber": number, "ETag": result["ETag"]})
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for chunk in head:
+            yield chunk
+        head.clear()
+        async for chunk in rest:
+            yield chunk
+
+    try:
+        async for chunk in chunks():
+            buffer += chunk
+            size += len(chunk)
+            if len(buffer) >= part_bytes:
+                body = bytes(buffer)
+                buffer.clear()
+                await send(body)
+        if buffer or not parts:
+            await send(bytes(buffer))
+        await call(
+            s3.complete_multipart_upload,
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException:
+        await call(s3.abort_multipart_upload, Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return size
+
+
+def _filename(company_id: str, start: datetime, end: datetime) -> str:
+    safe = "".join(c if c.isalnum() or c in "-_" else "-" for c in company_id)
+    return f"logs-{safe}-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.ndjson"
+
+
+async def respond(
+    request: Request,
+    chunks: AsyncIterator[bytes],
+    filename: str,
+    s3_factory: Callable[[], Any] = get_s3_client,
+) -> Response:
+    """Stream ``chunks``, or (under Mangum) return them inline or via S3."""
+    headers = {
+        "Content-Encoding": "gzip",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if "aws.event" not in request.scope:
+        return StreamingResponse(chunks, media_type=MEDIA_TYPE, headers=headers)
+
+    # Buffered by Mangum: inline while the body fits, else S3
+    head: List[bytes] = []
+    size = 0
+    async for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > INLINE_BYTES:
+            break
+    else:
+        return Response(b"".join(head), media_type=MEDIA_TYPE, headers=headers)
+
+    if not BUCKET:
+        await chunks.aclose()
+        raise HTTPException(
+            status_code=413,
+            detail=f"export exceeds {INLINE_BYTES} bytes; narrow the range or set EXPORT_BUCKET",
+        )
+    s3 = s3_factory()
+    stamp = datetime.now(timezone.utc).strftime("%Y/%m/%d/%H%M%S")
+    key = f"{PREFIX}{stamp}-{os.urandom(4).hex()}/{filename}"
+    size = await upload_multipart(s3, BUCKET, key, head, chunks)
+    url = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=URL_TTL
+    )
+    print(f"Export of {size} bytes staged at s3://{BUCKET}/{key}")
+    return JSONResponse(
+        {"url": url, "bytes": size, "expiresIn": URL_TTL},
+        status_code=303,
+        headers={"Location": url},
+    )
+
+
+@router.get("/export")
+async def export_logs(
+    request: Request,
+    company_id: str = Query(..., min_length=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    client: Any = Depends(get_client),
+) -> Response:
+    start, end = export_range(start, end)
+    stream = await client.raw_stream(
+        EXPORT_SQL.format(source=f"{DATABASE}.{TABLE}"),
+        parameters={"company_id": company_id, "start": start, "end": end},
+        settings=SETTINGS,
+        fmt="JSONEachRow",
+    )
+    return await respond(
+        request, gzip_blocks(stream.read, stream.close), _filename(company_id, start, end)
+    )
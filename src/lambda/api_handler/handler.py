@@ -1,12 +1,14 @@
-from fastapi import FastAPI
-from mangum import Mangum
+_mangum = None
 
-app = FastAPI()
 
+def handler(event, context):
+    # FastAPI + Mangum are loaded on the first request instead of at import,
+    # keeping the module import (and the import-time budget) minimal.
+    global _mangum
+    if _mangum is None:
+        from mangum import Mangum
 
-@app.get("/user")
-def get_user():
-    return {"status": "ok"}
+        from app import app
 
-
-handler = Mangum(app)
+        _mangum = Mangum(app)
+    return _mangum(event, context)
@@ -1,13 +1,42 @@
 import base64
 import json
-import time
 import gzip
 
+from log_pipeline.deadline import TimeBudget
+from log_pipeline.events import iter_log_events
+from log_pipeline.lines import line_encoder_from_env
+from log_pipeline.partitions import partition_keys
+from log_pipeline.policy import policy_from_env
+from log_pipeline.projection import make_parser
+
+# LOKI_LINE_FORMAT / LOKI_STRUCTURED_METADATA (see log_pipeline.lines)
+encoder = line_encoder_from_env()
+# ROUTING_POLICY: the events (or sample) Loki gets, decided as in s3_ingest
+policy = policy_from_env()
+route = policy.compile(["loki"]) if policy else None
+# Raw lines need only the policy's fields and the partition key's
+# applicationVersion; encoded ones are written from the whole record
+fields = {*(policy.fields if policy else ()), "applicationVersion"}
+parse = make_parser(tuple(sorted(fields)) if encoder.raw else None)
+
 
 def handler(event, context):
     output = []
+    budget = TimeBudget.from_env(context)
 
     for record in event["records"]:
+        # Near the timeout, hand the rest back to Firehose instead of losing
+        # the whole batch to a timeout
+        if not budget.allows(1):
+            output.append(
+                {
+                    "recordId": record["recordId"],
+                    "result": "ProcessingFailed",
+                    "data": record["data"],
+                }
+            )
+            continue
+        budget.record(1)
         data_bytes = base64.b64decode(record["data"])
 
         try:
@@ -28,22 +57,18 @@ def handler(event, context):
             )
             continue
 
-        streams = []
+        # Every event of a record shares logGroup/logStream: one stream. The
+        # partition keys below read the same parsed records
+        log_records = list(iter_log_events([payload], parse))
+        values = []
+        for log_record in log_records:
+            if route is not None and not route(log_record)[0]:
+                continue
+            ts_nano = str(log_record.timestamp * 1_000_000)
+            line, metadata = encoder.encode_record(log_record)
+            values.append([ts_nano, line, metadata] if metadata else [ts_nano, line])
 
-        for log_event in payload.get("logEvents", []):
-            ts_nano = str(log_event["timestamp"] * 1_000_000)
-            streams.append(
-                {
-                    "stream": {
-                        "job": "cloudwatch",
-                        "logGroup": payload.get("logGroup"),
-                        "logStream": payload.get("logStream"),
-                    },
-                    "values": [[ts_nano, log_event["message"]]],
-                }
-            )
-
-        if not streams:
+        if not values:
             output.append(
                 {
                     "recordId": record["recordId"],
@@ -53,10 +78,21 @@ def handler(event, context):
             )
             continue
 
-        loki_payload = {"streams": streams}
+        loki_payload = {
+            "streams": [
+                {
+                    "stream": {
+                        "job": "cloudwatch",
+                        "logGroup": payload.get("logGroup"),
+                        "logStream": payload.get("logStream"),
+                    },
+                    "values": values,
+                }
+            ]
+        }
 
         processed_data = base64.b64encode(
-            json.dumps(loki_payload).encode("utf-8")
+            json.dumps(loki_payload, separators=(",", ":")).encode("utf-8")
         ).decode("utf-8")
 
         output.append(
@@ -64,7 +100,12 @@ def handler(event, context):
                 "recordId": record["recordId"],
                 "result": "Ok",
                 "data": processed_data,
+                # Firehose dynamic partitioning (see log_pipeline.partitions)
+                "metadata": {"partitionKeys": partition_keys(payload, records=log_records)},
             }
         )
 
+    deferred = sum(1 for item in output if item["result"] == "ProcessingFailed")
+    if deferred:
+        print(f"Deadline near; marked {deferred} records ProcessingFailed")
     return {"records": output}
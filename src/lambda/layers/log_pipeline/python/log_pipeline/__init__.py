@@ -0,0 +1,6 @@
+"""
+Shared ingestion pipeline for API Gateway access logs delivered to S3.
+
+Packaged as a Lambda layer (``python/log_pipeline``) so every S3 processor
+parses an object once and fans the events out to the configured sinks.
+"""
@@ -0,0 +1,121 @@
+"""
+Asyncio delivery engine for the HTTP sinks (Loki, OpenSearch).
+
+An event loop runs in a background thread for the life of the container and
+owns one ``aiohttp`` session, so its HTTP/1.1 keep-alive pool is reused across
+batches and warm invocations. Handlers stay synchronous: sinks hand prepared
+requests to ``AsyncEngine.send`` and get ``concurrent.futures`` back, keeping at
+most their concurrency limit in flight (see ``Sink._submit_pending``), while
+the handler thread goes on parsing and a reader thread prefetches the next S3
+object. Enabled with ``ASYNC_DELIVERY=true`` when ``aiohttp`` is installed.
+"""
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from log_pipeline.sinks import HttpRequest
+
+# (status, body text) or the exception raised, plus elapsed milliseconds
+Delivery = Tuple[Any, float]
+
+
+class AsyncEngine:
+    """Background event loop with a shared keep-alive HTTP pool."""
+
+    def __init__(self, pool_size: int = 32, keepalive_timeout: float = 30.0) -> None:
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Any = None
+        self._reader: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="log-pipeline-aio", daemon=True
+                ).start()
+                self._loop = loop
+        return self._loop
+
+    async def _get_session(self) -> Any:
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size, keepalive_timeout=self.keepalive_timeout
+                )
+            )
+        return self._session
+
+    async def _send(self, request: HttpRequest) -> Delivery:
+        import aiohttp
+
+        started = time.monotonic()
+        try:
+            session = await self._get_session()
+            async with session.request(
+                request.method,
+                request.url,
+                data=request.body,
+                headers=request.headers,
+                timeout=aiohttp.ClientTimeout(total=request.timeout),
+            ) as response:
+                result: Any = (response.status, await response.text())
+        except Exception as exc:
+            result = exc
+        return result, (time.monotonic() - started) * 1000
+
+    def send(self, request: HttpRequest) -> "Future[Delivery]":
+        """Send ``request`` on the loop; the future never raises."""
+        return asyncio.run_coroutine_threadsafe(self._send(request), self.loop)
+
+    def run(self, coro: Any, timeout: Optional[float] = None) -> Any:
+        """Sync wrapper: run ``coro`` on the engine loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def read(self, fn: Callable[..., Any], *args: Any) -> "Future[Any]":
+        """Run blocking ``fn`` (an S3 read) on the single reader thread."""
+        if self._reader is None:
+            self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-pipeline-read")
+        return self._reader.submit(fn, *args)
+
+    def close(self) -> None:
+        """Close the HTTP pool and stop the loop (local runs and benchmarks)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        if self._session is not None:
+            self.run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        if self._reader is not None:
+            self._reader.shutdown(wait=False)
+            self._reader = None
+
+
+_engine: Optional[AsyncEngine] = None
+
+
+def engine_from_env() -> Optional[AsyncEngine]:
+    """
+    The container's engine when ``ASYNC_DELIVERY=true`` and ``aiohttp`` is
+    installed; ``ASYNC_POOL_SIZE`` caps open connections (default 32).
+    """
+    global _engine
+    if os.getenv("ASYNC_DELIVERY", "false").lower() != "true":
+        return None
+    if importlib.util.find_spec("aiohttp") is None:
+        print("ASYNC_DELIVERY is set but aiohttp is not installed; using blocking delivery")
+        return None
+    if _engine is None:
+        _engine = AsyncEngine(pool_size=int(os.getenv("ASYNC_POOL_SIZE", "32")))
+    return _engine
@@ -0,0 +1,108 @@
+"""
+Re-ingest selected partitions of the Firehose bucket.
+
+    python -m log_pipeline.backfill s3://test-nf-tags/logs/ \\
+        --include year=2026/month=01/day=08/ --exclude applicationVersion=mixed [--dry-run]
+
+Objects under the URL are listed (only under the include prefixes when they
+start at a partition boundary, see ``PartitionFilter.list_prefixes``), filtered
+by ``--include`` / ``--exclude`` and sent to the ingest queue
+(``--queue-url`` or ``INGEST_QUEUE_URL``) as S3 notifications, so
+S3IngestLambda processes them like new objects. Checkpoints of objects that
+were already ingested are keyed by ETag; delete them to force a re-ingest.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from log_pipeline.partitions import PartitionFilter
+from log_pipeline.sqs import send_continuations
+
+
+def iter_objects(
+    s3_client: Any, bucket: str, root: str, partitions: PartitionFilter
+) -> Iterator[Dict[str, Any]]:
+    """Listed objects under ``root`` (``Key``, ``Size``, ``ETag``) with a ``selected`` flag."""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for prefix in partitions.list_prefixes(root):
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield dict(obj, selected=partitions(obj["Key"]))
+
+
+def s3_record(bucket: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """S3 ``ObjectCreated`` notification record for a listed object."""
+    return {
+        "eventSource": "aws:s3",
+        "eventName": "ObjectCreated:Put",
+        "s3": {
+            "bucket": {"name": bucket},
+            "object": {
+                "key": obj["Key"],
+                "size": obj.get("Size", 0),
+                "eTag": obj.get("ETag", "").strip('"'),
+            },
+        },
+    }
+
+
+def backfill(
+    url: str,
+    partitions: PartitionFilter,
+    queue_url: str = "",
+    dry_run: bool = False,
+    s3_client: Any = None,
+    sqs_client: Any = None,
+) -> Dict[str, int]:
+    """Enqueue the selected objects under ``url``; return object/byte counts."""
+    parsed = urlparse(url)
+    if parsed.scheme != "s3":
+        raise ValueError(f"Unsupported location '{url}'")
+    if s3_client is None:
+        import boto3
+
+        s3_client = boto3.client("s3")
+    bucket = parsed.netloc
+    root = parsed.path.lstrip("/")
+
+    stats = {"selected": 0, "selected_bytes": 0, "skipped": 0, "skipped_bytes": 0}
+    records: List[Dict[str, Any]] = []
+    for obj in iter_objects(s3_client, bucket, root, partitions):
+        kind = "selected" if obj["selected"] else "skipped"
+        stats[kind] += 1
+        stats[f"{kind}_bytes"] += obj.get("Size", 0)
+        if obj["selected"]:
+            records.append(s3_record(bucket, obj))
+
+    if not dry_run and records:
+        if not queue_url:
+            raise ValueError("No ingest queue: pass --queue-url or set INGEST_QUEUE_URL")
+        if sqs_client is None:
+            import boto3
+
+            sqs_client = boto3.client("sqs")
+        send_continuations(sqs_client, queue_url, records)
+        print(f"Enqueued {len(records)} objects on {queue_url}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-ingest selected log partitions.")
+    parser.add_argument("url", help="partitioned location, e.g. s3://test-nf-tags/logs/")
+    parser.add_argument("--include", action="append", default=[], help="partition prefix/segment")
+    parser.add_argument("--exclude", action="append", default=[], help="partition prefix/segment")
+    parser.add_argument("--queue-url", default=os.getenv("INGEST_QUEUE_URL", ""))
+    parser.add_argument("--dry-run", action="store_true", help="list and count only")
+    args = parser.parse_args(argv)
+
+    partitions = PartitionFilter(args.include, args.exclude)
+    stats = backfill(args.url, partitions, args.queue_url, dry_run=args.dry_run)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Per-object ingestion checkpoints so a retried S3 event resumes where it stopped.
+
+A checkpoint records, for every sink, how many events of the object it has
+durably delivered (the message index to resume from) and whether the whole
+object is complete. Keys include the object ETag, so a rewritten object is
+processed from scratch.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+
+def checkpoint_key(bucket: str, key: str, etag: str = "") -> str:
+    return f"{bucket}/{key}@{etag}" if etag else f"{bucket}/{key}"
+
+
+class CheckpointStore:
+    """Minimal key/value interface for checkpoint state."""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, key: str, state: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """In-process store; useful locally and to resume within a warm container."""
+
+    def __init__(self) -> None:
+        self._items: Dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._items.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key: str, state: Dict[str, Any]) -> None:
+        self._items[key] = json.dumps(state)
+
+
+def _is_not_found(exc: Exception) -> bool:
+    code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+    return code in ("NoSuchKey", "404", "NotFound")
+
+
+class S3CheckpointStore(CheckpointStore):
+    """Stores each checkpoint as a small JSON marker object under ``prefix``."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = "checkpoints/") -> None:
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _marker_key(self, key: str) -> str:
+        return f"{self.prefix}{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self._marker_key(key))
+        except Exception as exc:
+            if _is_not_found(exc):
+                return None
+            raise
+        return json.loads(obj["Body"].read())
+
+    def put(self, key: str, state: Dict[str, Any]) -> None:
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._marker_key(key),
+            Body=json.dumps(state).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+class DynamoDBCheckpointStore(CheckpointStore):
+    """
+    Stores checkpoints in a DynamoDB table keyed by ``pk`` (string).
+
+    ``table`` is anything exposing the boto3 ``Table`` get_item/put_item API.
+    Items carry an ``expiresAt`` attribute for the table's TTL setting.
+    """
+
+    def __init__(self, table: Any, ttl_seconds: int = 7 * 24 * 3600) -> None:
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key={"pk": key}).get("Item")
+        return json.loads(item["state"]) if item else None
+
+    def put(self, key: str, state: Dict[str, Any]) -> None:
+        self.table.put_item(
+            Item={
+                "pk": key,
+                "state": json.dumps(state),
+                "expiresAt": int(time.time()) + self.ttl_seconds,
+            }
+        )
+
+
+_memory_store = MemoryCheckpointStore()
+
+
+def store_from_url(
+    url: str, s3_client_factory: Optional[Callable[[], Any]] = None
+) -> Optional[CheckpointStore]:
+    """
+    Build a store from ``CHECKPOINT_STORE``-style URLs:
+    ``s3://bucket/prefix/``, ``dynamodb://table`` or ``memory://``.
+
+    ``s3_client_factory`` is only called for S3 stores.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        if s3_client_factory is None:
+            import boto3
+
+            s3_client_factory = lambda: boto3.client("s3")  # noqa: E731
+        return S3CheckpointStore(s3_client_factory(), parsed.netloc, parsed.path.lstrip("/"))
+    if parsed.scheme == "dynamodb":
+        import boto3
+
+        return DynamoDBCheckpointStore(boto3.resource("dynamodb").Table(parsed.netloc))
+    if parsed.scheme == "memory":
+        return _memory_store
+    raise ValueError(f"Unsupported checkpoint store '{url}'")
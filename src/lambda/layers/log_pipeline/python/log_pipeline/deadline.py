@@ -0,0 +1,89 @@
+"""
+Time budget for a Lambda invocation.
+
+Handlers ask the budget before each unit of work whether it still fits before
+the function timeout. The cost of a unit is estimated from the throughput
+observed so far in the invocation, and the slowest flush seen is kept in
+reserve so pending batches can still be delivered once work stops. Without a
+Lambda context (local runs) the budget is unlimited.
+"""
+import os
+import time
+from typing import Any, Callable, Optional
+
+DEFAULT_RESERVE_MS = 3000
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work was deferred and no continuation target is configured."""
+
+
+class TimeBudget:
+    """
+    Remaining-time tracker built from ``context.get_remaining_time_in_millis``.
+
+    ``record(items)`` counts processed items and ``record_flush(ms)`` the time
+    spent delivering them; ``allows(items)`` says whether ``items`` more can be
+    processed and still leave ``reserve_ms`` plus a flush before the deadline.
+    """
+
+    def __init__(
+        self,
+        context: Any = None,
+        reserve_ms: float = DEFAULT_RESERVE_MS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.reserve_ms = reserve_ms
+        self._clock = clock
+        self._started = clock()
+        self._deadline: Optional[float] = None
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        if remaining is not None:
+            self._deadline = self._started + remaining() / 1000
+        self.items = 0
+        self.flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @classmethod
+    def from_env(cls, context: Any = None) -> "TimeBudget":
+        return cls(context, float(os.getenv("DEADLINE_RESERVE_MS", str(DEFAULT_RESERVE_MS))))
+
+    @property
+    def limited(self) -> bool:
+        return self._deadline is not None
+
+    def elapsed_ms(self) -> float:
+        return (self._clock() - self._started) * 1000
+
+    def remaining_ms(self) -> float:
+        if self._deadline is None:
+            return float("inf")
+        return (self._deadline - self._clock()) * 1000
+
+    @property
+    def per_item_ms(self) -> float:
+        """Observed processing cost per item, excluding flushes."""
+        if not self.items:
+            return 0.0
+        return max(0.0, self.elapsed_ms() - self.flush_ms) / self.items
+
+    def record(self, items: int = 1) -> None:
+        self.items += items
+
+    def record_flush(self, elapsed_ms: float) -> None:
+        self.flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def timed_flush(self, flush: Callable[[], Any]) -> Any:
+        """Run ``flush`` and record how long it took."""
+        started = self._clock()
+        try:
+            return flush()
+        finally:
+            self.record_flush((self._clock() - started) * 1000)
+
+    def allows(self, items: int = 1) -> bool:
+        if self._deadline is None:
+            return True
+        needed = items * self.per_item_ms + self.max_flush_ms + self.reserve_ms
+        return self.remaining_ms() > needed
@@ -0,0 +1,77 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+
+
+def load_object(s3_client: Any, bucket: str, key: str) -> bytes:
+    """Download an S3 object through a temporary file and return its bytes."""
+    # A unique name: keys sharing a basename may be downloaded at the same time
+    with tempfile.NamedTemporaryFile(suffix=f"-{Path(key).name}", delete=False) as tmp:
+        local_path = tmp.name
+    try:
+        s3_client.download_file(bucket, key, local_path)
+        with open(local_path, "rb") as f:
+            return f.read()
+    finally:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+
+
+def decompress(raw: bytes) -> bytes:
+    """
+    Decompress gzip and zstd payloads (detected by magic bytes); pass others
+    through. zstd objects may use a trained dictionary (``log_pipeline.zdict``);
+    one missing from ``ZSTD_DICTIONARIES`` raises ValueError.
+    """
+    if raw[:2] == b"\x1f\x8b":
+        try:
+            return gzip.decompress(raw)
+        except OSError:
+            print("Warning: could not decompress gzip payload, using raw bytes")
+    elif raw[:4] == ZSTD_MAGIC:
+        from log_pipeline import zdict
+
+        try:
+            return zdict.decompress(raw)
+        except ImportError:
+            raise ValueError("zstd payload but zstandard is not installed")
+    return raw
+
+
+def iter_concatenated_json(text: str) -> Iterable[Dict[str, Any]]:
+    """Yield JSON objects from NDJSON or concatenated JSON without delimiters."""
+    idx = _whitespace.match(text, 0).end()
+    end = len(text)
+    while idx < end:
+        try:
+            obj, idx = _decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            print("Skipping malformed JSON chunk")
+            # Resume at the next object boundary (new line or "}{").
+            candidates = [
+                pos
+                for pos in (text.find("\n", idx + 1), text.find("}{", idx + 1) + 1)
+                if pos > idx
+            ]
+            if not candidates:
+                break
+            idx = min(candidates)
+        else:
+            if isinstance(obj, dict):
+                yield obj
+        idx = _whitespace.match(text, idx).end()
+
+
+def parse_messages(raw: bytes) -> List[Dict[str, Any]]:
+    """Decode a Firehose object into its CloudWatch data messages."""
+    text = decompress(raw).decode("utf-8", errors="replace")
+    return list(iter_concatenated_json(text))
@@ -0,0 +1,376 @@
+"""
+Skip events that were already delivered (Firehose retries, duplicate S3 notifications).
+
+Each event is keyed by its CloudWatch ``logEvents.id`` (``requestId`` for bare
+records). A key is a duplicate when it is in the exact LRU of recent keys or
+in a Bloom filter that remembers far more keys in little memory, at the cost
+of a small, configured false-positive rate (a new event taken for a duplicate
+and skipped).
+
+Keys seen in an invocation stay pending and only enter the filter once the
+sinks took them (``commit``), so a failed invocation is retried in full. The
+deduplicator lives in a module global and keeps its memory across warm
+invocations. With a shared store, every commit also merges the filter into a
+shared copy (bitwise OR), and containers load it, so coverage spans containers.
+
+That shared copy is the whole filter, ``capacity * log2(1/fp_rate) / ln 2``
+bits: about 2.4 MB at the 1e6 / 1e-4 defaults, read and written back (GET +
+PUT) on every commit. Filters over ``MAX_SHARED_BYTES`` are refused for a store.
+"""
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from log_pipeline.emf import MetricsLogger, function_dimensions
+from log_pipeline.events import LogRecord
+
+_HEADER = b"LPB1"
+# Largest filter copied to and from a shared store on every commit
+MAX_SHARED_BYTES = 16 * 1024 * 1024
+
+
+class BloomFilter:
+    """Bloom filter of ``capacity`` keys at ``fp_rate``, double hashing over blake2b."""
+
+    def __init__(self, capacity: int = 1_000_000, fp_rate: float = 1e-4) -> None:
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.size = max(8, int(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.size += -self.size % 8
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def fill_ratio(self) -> float:
+        return int.from_bytes(self.bits, "little").bit_count() / self.size
+
+    def estimated_count(self) -> int:
+        """Keys held, estimated from the set bits (exact count is lost by merges)."""
+        fill = self.fill_ratio()
+        if fill >= 1.0:
+            return self.capacity * 10
+        return int(-self.size / self.hashes * math.log(1.0 - fill))
+
+    def estimated_fp_rate(self) -> float:
+        """Probability that a new key tests positive at the current fill."""
+        return self.fill_ratio() ** self.hashes
+
+    def merge(self, other: "BloomFilter") -> None:
+        if (other.size, other.hashes) != (self.size, self.hashes):
+            raise ValueError("Bloom filters differ in size or hash count")
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+        self.count = self.estimated_count()
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps(
+            {"capacity": self.capacity, "fp_rate": self.fp_rate, "count": self.count}
+        ).encode("utf-8")
+        return _HEADER + len(header).to_bytes(4, "little") + header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        if data[:4] != _HEADER:
+            raise ValueError("Not a serialized Bloom filter")
+        size = int.from_bytes(data[4:8], "little")
+        header = json.loads(data[8 : 8 + size])
+        bloom = cls(header["capacity"], header["fp_rate"])
+        bits = data[8 + size :]
+        if len(bits) != len(bloom.bits):
+            raise ValueError("Serialized Bloom filter has the wrong size")
+        bloom.bits = bytearray(bits)
+        bloom.count = header.get("count", 0)
+        return bloom
+
+
+class DedupStore:
+    """Shared copy of the Bloom filter: versioned get and conditional put."""
+
+    def get(self) -> Tuple[Optional[bytes], Optional[str]]:
+        """Serialized filter and its version (``None, None`` when absent)."""
+        raise NotImplementedError
+
+    def put(self, data: bytes, version: Optional[str]) -> bool:
+        """Write ``data`` if the stored version is still ``version``; False on conflict."""
+        raise NotImplementedError
+
+
+class MemoryDedupStore(DedupStore):
+    """In-process stand-in for a shared store (local runs, several deduplicators)."""
+
+    def __init__(self) -> None:
+        self._data: Optional[bytes] = None
+        self._version = 0
+
+    def get(self) -> Tuple[Optional[bytes], Optional[str]]:
+        if self._data is None:
+            return None, None
+        return self._data, str(self._version)
+
+    def put(self, data: bytes, version: Optional[str]) -> bool:
+        current = str(self._version) if self._data is not None else None
+        if version != current:
+            return False
+        self._data = data
+        self._version += 1
+        return True
+
+
+class S3DedupStore(DedupStore):
+    """One S3 object, replaced with ``If-Match`` / ``If-None-Match`` conditional puts."""
+
+    def __init__(self, s3_client: Any, bucket: str, key: str) -> None:
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def get(self) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except Exception as exc:
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in ("NoSuchKey", "404", "NotFound"):
+                return None, None
+            raise
+        return obj["Body"].read(), obj["ETag"]
+
+    def put(self, data: bytes, version: Optional[str]) -> bool:
+        condition = {"IfMatch": version} if version else {"IfNoneMatch": "*"}
+        try:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=data, **condition)
+        except Exception as exc:
+            code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+            if code in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                return False
+            raise
+        return True
+
+
+_memory_store = MemoryDedupStore()
+
+
+def dedup_store_from_url(
+    url: str, s3_client_factory: Optional[Callable[[], Any]] = None
+) -> Optional[DedupStore]:
+    """``DEDUP_STORE``-style URLs: ``s3://bucket/key`` or ``memory://``."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        if s3_client_factory is None:
+            import boto3
+
+            s3_client_factory = lambda: boto3.client("s3")  # noqa: E731
+        return S3DedupStore(s3_client_factory(), parsed.netloc, parsed.path.lstrip("/"))
+    if parsed.scheme == "memory":
+        return _memory_store
+    raise ValueError(f"Unsupported dedup store '{url}'")
+
+
+def event_key(event: LogRecord) -> Optional[str]:
+    if event.event_id:
+        return event.event_id
+    request_id = event.requestId
+    return f"req:{request_id}" if request_id and request_id != "-" else None
+
+
+class Deduplicator:
+    """
+    Bloom filter + LRU of delivered event keys.
+
+    When the filter holds ``capacity`` keys it is replaced by an empty one
+    (the LRU still covers the most recent keys), which keeps the
+    false-positive rate near ``fp_rate``.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        fp_rate: float = 1e-4,
+        lru_size: int = 50_000,
+        store: Optional[DedupStore] = None,
+        sync_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.lru_size = lru_size
+        self.store = store
+        self.sync_seconds = sync_seconds
+        self._clock = clock
+        self.bloom = BloomFilter(capacity, fp_rate)
+        if store is not None and self.bloom.nbytes > MAX_SHARED_BYTES:
+            raise ValueError(
+                f"A {capacity} key filter at fp_rate {fp_rate} takes {self.bloom.nbytes} bytes, "
+                f"over the {MAX_SHARED_BYTES} shared per commit; lower the capacity"
+            )
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._key_bytes = 0
+        # Insertion-ordered, so the LRU receives keys in event order
+        self._pending: Dict[str, None] = {}
+        self._synced_at: Optional[float] = None
+        self.stats = {"checked": 0, "duplicates": 0, "bloom_only": 0, "rotations": 0}
+
+    def start(self) -> None:
+        """Begin an invocation: reset its counters and refresh the shared filter."""
+        self.stats = {"checked": 0, "duplicates": 0, "bloom_only": 0, "rotations": 0}
+        self.sync()
+
+    def sync(self, force: bool = False) -> None:
+        """Merge the shared filter in (at most every ``sync_seconds``)."""
+        if self.store is None:
+            return
+        now = self._clock()
+        recent = self._synced_at is not None and now - self._synced_at < self.sync_seconds
+        if recent and not force:
+            return
+        self._synced_at = now
+        try:
+            data, _ = self.store.get()
+            if data is not None:
+                self.bloom.merge(BloomFilter.from_bytes(data))
+        except Exception as exc:
+            print(f"Warning: could not load the shared dedup filter: {exc}")
+
+    def is_duplicate(self, event: LogRecord) -> bool:
+        """True if ``event`` was delivered before; otherwise remember it as pending."""
+        key = event_key(event)
+        if key is None:
+            return False
+        self.stats["checked"] += 1
+        if key in self._pending or key in self._recent:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+            self.stats["duplicates"] += 1
+            return True
+        if key in self.bloom:
+            # Older duplicate or a false positive; the LRU cannot tell which
+            self.stats["duplicates"] += 1
+            self.stats["bloom_only"] += 1
+            return True
+        self._pending[key] = None
+        return False
+
+    def commit(self) -> None:
+        """Record the pending keys as delivered."""
+        if not self._pending:
+            return
+        if self.bloom.count + len(self._pending) > self.capacity:
+            self.bloom = BloomFilter(self.capacity, self.fp_rate)
+            self.stats["rotations"] += 1
+        for key in self._pending:
+            self.bloom.add(key)
+            self._remember(key)
+        self._pending = {}
+        if self.store is not None:
+            self._publish()
+
+    def discard(self) -> None:
+        """Forget pending keys (their delivery failed and will be retried)."""
+        self._pending = {}
+
+    def _remember(self, key: str) -> None:
+        self._recent[key] = None
+        self._key_bytes += sys.getsizeof(key)
+        while len(self._recent) > self.lru_size:
+            old, _ = self._recent.popitem(last=False)
+            self._key_bytes -= sys.getsizeof(old)
+
+    def _publish(self, attempts: int = 3) -> None:
+        """OR the local filter into the shared one (optimistic concurrency)."""
+        for _ in range(attempts):
+            try:
+                data, version = self.store.get()
+                shared = BloomFilter.from_bytes(data) if data is not None else None
+                if (
+                    shared is None
+                    or (shared.size, shared.hashes) != (self.bloom.size, self.bloom.hashes)
+                    or shared.estimated_count() > self.capacity
+                ):
+                    # Missing, resized or full: start the shared filter over
+                    shared = BloomFilter(self.capacity, self.fp_rate)
+                shared.merge(self.bloom)
+                if self.store.put(shared.to_bytes(), version):
+                    return
+            except Exception as exc:
+                print(f"Warning: could not update the shared dedup filter: {exc}")
+                return
+        print("Warning: shared dedup filter kept changing; skipped this update")
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint: filter bits plus LRU keys and entries."""
+        return self.bloom.nbytes + sys.getsizeof(self._recent) + self._key_bytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        checked = self.stats["checked"]
+        return {
+            **self.stats,
+            "bloom_keys": self.bloom.count,
+            "lru_keys": len(self._recent),
+            "fp_rate_estimate": round(self.bloom.estimated_fp_rate(), 8),
+            # Upper bound: bloom-only hits are false positives or old duplicates
+            "fp_rate_observed_max": round(self.stats["bloom_only"] / checked, 8)
+            if checked
+            else 0.0,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+    def emit_metrics(self, namespace: str = "ApiMonitor") -> None:
+        """Print the snapshot as a CloudWatch embedded-metric-format document."""
+        snapshot = self.snapshot()
+        metrics = MetricsLogger(namespace, function_dimensions())
+        metrics.put("DedupChecked", snapshot["checked"], "Count")
+        metrics.put("DedupDuplicates", snapshot["duplicates"], "Count")
+        metrics.put("DedupFalsePositiveRate", snapshot["fp_rate_estimate"], "None")
+        metrics.put("DedupMemoryBytes", snapshot["memory_bytes"], "Bytes")
+        metrics.flush()
+
+
+_deduplicator: Optional[Deduplicator] = None
+
+
+def deduplicator_from_env(
+    s3_client_factory: Optional[Callable[[], Any]] = None,
+) -> Optional[Deduplicator]:
+    """
+    The container's deduplicator when ``DEDUP_ENABLED=true``, built once from
+    ``DEDUP_CAPACITY``, ``DEDUP_FP_RATE``, ``DEDUP_LRU_SIZE`` and ``DEDUP_STORE``.
+    """
+    global _deduplicator
+    if os.getenv("DEDUP_ENABLED", "false").lower() != "true":
+        return None
+    if _deduplicator is None:
+        _deduplicator = Deduplicator(
+            capacity=int(os.getenv("DEDUP_CAPACITY", "1000000")),
+            fp_rate=float(os.getenv("DEDUP_FP_RATE", "0.0001")),
+            lru_size=int(os.getenv("DEDUP_LRU_SIZE", "50000")),
+            store=dedup_store_from_url(os.getenv("DEDUP_STORE", ""), s3_client_factory),
+        )
+    return _deduplicator
@@ -0,0 +1,189 @@
+"""
+CloudWatch embedded metric format (EMF) writer.
+
+Lambda sends stdout to CloudWatch Logs, which turns EMF documents (JSON lines
+with an ``_aws`` block) into metrics: no SDK, layer or API call. Metrics are
+aggregated in memory and written on ``flush()``:
+
+    metrics = MetricsLogger("ApiMonitor", dimension_sets=[["Path"], ["Path", "ClientIP"]])
+    metrics.put("RequestCount", 1, dimensions={"Path": path, "ClientIP": ip})
+    metrics.put("Latency", 87, "Milliseconds", {"Path": path})
+    metrics.flush()
+
+Each distinct set of dimension values becomes its own document (EMF reads
+dimension values from the document root), holding at most MAX_METRICS metrics
+and MAX_VALUES distinct values per metric; larger groups are split. Repeated
+values are encoded as a histogram, ``{"Values": [...], "Counts": [...]}``, so
+a count put once per event is one value and its count however many events
+there were. ``dimension_sets`` lists the key combinations CloudWatch
+aggregates by (each document uses the ones its keys cover); by default a
+document is aggregated by all of its keys.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# EMF limits per document
+MAX_METRICS = 100
+MAX_DIMENSIONS = 30
+MAX_VALUES = 100
+
+_SIZES = ["Bytes", "Kilobytes", "Megabytes", "Gigabytes", "Terabytes"]
+_SIZES += ["Bits", "Kilobits", "Megabits", "Gigabits", "Terabits"]
+UNITS = frozenset(
+    ["Seconds", "Microseconds", "Milliseconds", "Percent", "Count", "Count/Second", "None"]
+    + _SIZES
+    + [f"{size}/Second" for size in _SIZES]
+)
+
+DimensionKey = Tuple[Tuple[str, str], ...]
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _print(line: str) -> None:
+    print(line)
+
+
+def encode_values(items: Sequence[Tuple[float, int]]) -> Any:
+    """``(value, count)`` pairs as one number, or a ``{"Values", "Counts"}`` histogram."""
+    if len(items) == 1 and items[0][1] == 1:
+        return items[0][0]
+    return {"Values": [value for value, _ in items], "Counts": [count for _, count in items]}
+
+
+class MetricsLogger:
+    """
+    Metrics aggregated per dimension values and written as EMF documents.
+
+    ``dimensions`` are added to every metric (e.g. ``{"Function": name}``).
+    ``write`` receives each document as one JSON line (default: stdout).
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        dimensions: Optional[Dict[str, str]] = None,
+        dimension_sets: Optional[Sequence[Sequence[str]]] = None,
+        write: Callable[[str], None] = _print,
+    ) -> None:
+        self.namespace = namespace
+        self.dimensions = {str(k): str(v) for k, v in (dimensions or {}).items()}
+        self.dimension_sets = [list(keys) for keys in dimension_sets] if dimension_sets else None
+        for keys in self.dimension_sets or []:
+            if len(keys) > MAX_DIMENSIONS:
+                raise ValueError(f"EMF: at most {MAX_DIMENSIONS} dimensions per set")
+        self.write = write
+        # dimension values -> metric name -> (unit, {value: count})
+        self._groups: Dict[DimensionKey, Dict[str, Tuple[str, Dict[float, int]]]] = {}
+        self._default_key: DimensionKey = tuple(self.dimensions.items())
+
+    def put(
+        self,
+        name: str,
+        value: float,
+        unit: str = "Count",
+        dimensions: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Record one ``value`` of metric ``name`` for ``dimensions`` (plus the defaults)."""
+        key = self._key(dimensions) if dimensions else self._default_key
+        metrics = self._groups.get(key)
+        if metrics is None:
+            metrics = self._groups[key] = {}
+        entry = metrics.get(name)
+        if entry is None:
+            if unit not in UNITS:
+                raise ValueError(f"EMF: unknown unit {unit!r} for {name!r}")
+            entry = metrics[name] = (unit, {})
+        elif entry[0] != unit:
+            raise ValueError(f"EMF: {name!r} already recorded in {entry[0]}, not {unit}")
+        counts = entry[1]
+        counts[value] = counts.get(value, 0) + 1
+
+    def _key(self, dimensions: Dict[str, str]) -> DimensionKey:
+        if not self.dimensions:
+            return tuple([(str(k), str(v)) for k, v in dimensions.items()])
+        merged = dict(self.dimensions)
+        merged.update((str(k), str(v)) for k, v in dimensions.items())
+        return tuple(merged.items())
+
+    def __len__(self) -> int:
+        """Metric series pending (one per metric name and dimension values)."""
+        return sum(len(metrics) for metrics in self._groups.values())
+
+    def _dimension_sets(self, keys: List[str]) -> List[List[str]]:
+        if self.dimension_sets is None:
+            if len(keys) > MAX_DIMENSIONS:
+                raise ValueError(f"EMF: at most {MAX_DIMENSIONS} dimensions per set")
+            return [keys]
+        present = set(keys)
+        return [dims for dims in self.dimension_sets if present.issuperset(dims)]
+
+    def _chunks(self) -> Iterator[Tuple[Dict[str, str], List[Tuple[str, str, Any]]]]:
+        """(dimension values, [(name, unit, encoded value)]) per document."""
+        for key, metrics in self._groups.items():
+            # parts[n]: the n-th MAX_VALUES slice of each metric's values, so a
+            # metric with many distinct values continues in later documents
+            parts: List[List[Tuple[str, str, Any]]] = []
+            for name, (unit, values) in metrics.items():
+                items = list(values.items())
+                for part, start in enumerate(range(0, len(items), MAX_VALUES)):
+                    if part == len(parts):
+                        parts.append([])
+                    value = encode_values(items[start : start + MAX_VALUES])
+                    parts[part].append((name, unit, value))
+            for entries in parts:
+                for start in range(0, len(entries), MAX_METRICS):
+                    yield dict(key), entries[start : start + MAX_METRICS]
+
+    def _directive(self, keys: Tuple[str, ...], metrics: Tuple[Tuple[str, str], ...]) -> Any:
+        return {
+            "Namespace": self.namespace,
+            "Dimensions": self._dimension_sets(list(keys)),
+            "Metrics": [{"Name": name, "Unit": unit} for name, unit in metrics],
+        }
+
+    def documents(self, timestamp_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The pending metrics as EMF documents (without clearing them)."""
+        timestamp = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+        documents = []
+        for root, chunk in self._chunks():
+            directive = self._directive(tuple(root), tuple((n, u) for n, u, _ in chunk))
+            document = {"_aws": {"Timestamp": timestamp, "CloudWatchMetrics": [directive]}}
+            document.update(root)
+            document.update((name, value) for name, _, value in chunk)
+            documents.append(document)
+        return documents
+
+    def lines(self, timestamp_ms: Optional[int] = None) -> List[str]:
+        """``documents()`` serialized, one JSON line each."""
+        timestamp = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+        # The _aws block only varies with the dimension keys and metric names:
+        # serialized once per shape
+        headers: Dict[Tuple[Any, ...], str] = {}
+        lines = []
+        for root, chunk in self._chunks():
+            shape = (tuple(root), tuple((n, u) for n, u, _ in chunk))
+            header = headers.get(shape)
+            if header is None:
+                directive = _encode(self._directive(*shape))
+                header = f'{{"_aws":{{"Timestamp":{timestamp},"CloudWatchMetrics":[{directive}]}},'
+                headers[shape] = header
+            body = dict(root)
+            body.update((name, value) for name, _, value in chunk)
+            lines.append(header + _encode(body)[1:])
+        return lines
+
+    def flush(self) -> int:
+        """Write and clear the pending metrics; returns the documents written."""
+        lines = self.lines()
+        self._groups.clear()
+        for line in lines:
+            self.write(line)
+        return len(lines)
+
+
+def function_dimensions() -> Dict[str, str]:
+    """``{"Function": <Lambda function name>}`` (``local`` outside Lambda)."""
+    return {"Function": os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local")}
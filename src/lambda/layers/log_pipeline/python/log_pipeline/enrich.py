@@ -0,0 +1,190 @@
+"""
+Enrichment stage: user-agent classes and GeoIP country/ASN per event.
+
+Adds ENRICHED_FIELDS to each parsed message before it reaches the sinks, so
+ClickHouse, OpenSearch and Loki labels get ready-made columns instead of
+``userAgent LIKE`` and IP-range queries at read time.
+
+- User agents repeat heavily, so a small rule set classifies each distinct
+  string once behind a bounded LRU (``ENRICH_UA_CACHE_SIZE``).
+- Country and ASN come from local memory-mapped MaxMind DB files
+  (``GEOIP_COUNTRY_DB`` / ``GEOIP_ASN_DB``, e.g. GeoLite2 from a Lambda
+  layer under /opt) through ``log_pipeline.mmdb``, also behind an LRU
+  (``ENRICH_IP_CACHE_SIZE``). A missing file only disables its columns.
+
+Enabled with ``ENRICH_ENABLED=true``.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ENRICHED_FIELDS = ("uaBrowser", "uaOS", "uaDevice", "geoCountry", "geoAsn")
+# Message fields the stage reads
+REQUIRED_FIELDS = ("userAgent", "ip")
+
+UNKNOWN_UA = ("", "", "")
+UNKNOWN_GEO = ("", 0)
+
+# First match wins; order matters (Edge and Opera also say "Chrome", and
+# Chrome says "Safari")
+_BROWSERS = [
+    ("Edge", re.compile(r"Edg(?:e|A|iOS)?/")),
+    ("Opera", re.compile(r"OPR/|Opera")),
+    ("Samsung Internet", re.compile(r"SamsungBrowser/")),
+    ("Chrome", re.compile(r"Chrome/|CriOS/")),
+    ("Firefox", re.compile(r"Firefox/|FxiOS/")),
+    ("Safari", re.compile(r"Version/[\d.]+.*Safari/")),
+    ("IE", re.compile(r"MSIE |Trident/")),
+    ("curl", re.compile(r"^curl/")),
+    ("Postman", re.compile(r"PostmanRuntime/")),
+    ("python-requests", re.compile(r"python-requests/|aiohttp/|python-urllib", re.I)),
+    ("okhttp", re.compile(r"okhttp/")),
+    ("axios", re.compile(r"axios/")),
+    ("Go", re.compile(r"Go-http-client/")),
+    ("Java", re.compile(r"^Java/|Apache-HttpClient/")),
+    ("Dart", re.compile(r"Dart/")),
+]
+_OS = [
+    ("iOS", re.compile(r"iPhone|iPad|iPod|\biOS\b")),
+    ("Android", re.compile(r"Android")),
+    ("Windows", re.compile(r"Windows")),
+    ("ChromeOS", re.compile(r"CrOS")),
+    ("macOS", re.compile(r"Mac OS X|Macintosh")),
+    ("Linux", re.compile(r"Linux|X11")),
+]
+_BOT = re.compile(r"bot\b|crawler|spider|slurp|HeadlessChrome", re.I)
+_TABLET = re.compile(r"iPad|Tablet|Kindle|Silk/")
+_MOBILE = re.compile(r"Mobi|iPhone|iPod|Android")
+# Libraries and tools rather than people
+_CLIENTS = {"curl", "Postman", "python-requests", "okhttp", "axios", "Go", "Java", "Dart"}
+
+
+def classify_user_agent(user_agent: str) -> Tuple[str, str, str]:
+    """``(browser, os, device)``; device is desktop, mobile, tablet, bot or client."""
+    if not user_agent or user_agent == "-":
+        return UNKNOWN_UA
+    browser = next((name for name, rx in _BROWSERS if rx.search(user_agent)), "Other")
+    os_name = next((name for name, rx in _OS if rx.search(user_agent)), "Other")
+    if _BOT.search(user_agent):
+        device = "bot"
+    elif browser in _CLIENTS:
+        device = "client"
+    elif _TABLET.search(user_agent) or (os_name == "Android" and "Mobile" not in user_agent):
+        device = "tablet"
+    elif _MOBILE.search(user_agent):
+        device = "mobile"
+    else:
+        device = "desktop"
+    return browser, os_name, device
+
+
+class GeoIP:
+    """Country ISO code and ASN for an IP from memory-mapped MMDB files."""
+
+    def __init__(self, country_db: Optional[str], asn_db: Optional[str]) -> None:
+        self.country = _open_reader(country_db)
+        self.asn = _open_reader(asn_db)
+
+    def __bool__(self) -> bool:
+        return self.country is not None or self.asn is not None
+
+    def lookup(self, ip: str) -> Tuple[str, int]:
+        if not ip or ip == "-":
+            return UNKNOWN_GEO
+        try:
+            country = self.country.get(ip) if self.country is not None else None
+            asn = self.asn.get(ip) if self.asn is not None else None
+        except ValueError:
+            return UNKNOWN_GEO
+        iso = ""
+        if country:
+            iso = (country.get("country") or country.get("registered_country") or {}).get(
+                "iso_code", ""
+            )
+        return iso, (asn or {}).get("autonomous_system_number", 0)
+
+
+def _open_reader(path: Optional[str]) -> Optional[Any]:
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"GeoIP database {path} not found; its columns stay empty")
+        return None
+    from log_pipeline.mmdb import Reader
+
+    return Reader(path)
+
+
+class Enricher:
+    """
+    Adds ENRICHED_FIELDS to parsed messages.
+
+    ``classify`` and ``locate`` are the cached user-agent and GeoIP lookups;
+    either may be None to leave its columns out.
+    """
+
+    def __init__(
+        self,
+        geoip: Optional[GeoIP] = None,
+        user_agents: bool = True,
+        ua_cache_size: int = 4096,
+        ip_cache_size: int = 65536,
+    ) -> None:
+        self.classify: Optional[Callable[[str], Tuple[str, str, str]]] = None
+        self.locate: Optional[Callable[[str], Tuple[str, int]]] = None
+        if user_agents:
+            self.classify = lru_cache(maxsize=ua_cache_size)(classify_user_agent)
+        if geoip:
+            self.locate = lru_cache(maxsize=ip_cache_size)(geoip.lookup)
+
+    def __call__(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        if not fields:
+            return fields
+        if self.classify is not None:
+            user_agent = fields.get("userAgent")
+            browser, os_name, device = self.classify(
+                user_agent if isinstance(user_agent, str) else ""
+            )
+            fields["uaBrowser"] = browser
+            fields["uaOS"] = os_name
+            fields["uaDevice"] = device
+        if self.locate is not None:
+            ip = fields.get("ip")
+            fields["geoCountry"], fields["geoAsn"] = self.locate(ip if isinstance(ip, str) else "")
+        return fields
+
+    def wrap(self, parse: Callable[[str], Dict[str, Any]]) -> Callable[[str], Dict[str, Any]]:
+        """``parse`` followed by enrichment."""
+        return lambda message: self(parse(message))
+
+    def stats(self) -> Dict[str, Any]:
+        """LRU hit rates, for logs and benchmarks."""
+        result = {}
+        for name, cached in (("userAgent", self.classify), ("ip", self.locate)):
+            if cached is not None:
+                info = cached.cache_info()
+                lookups = info.hits + info.misses
+                result[name] = {
+                    "entries": info.currsize,
+                    "hit_rate": round(info.hits / lookups, 4) if lookups else None,
+                }
+        return result
+
+
+_enricher: Optional[Enricher] = None
+
+
+def enricher_from_env() -> Optional[Enricher]:
+    """The container's enricher when ``ENRICH_ENABLED=true`` (kept warm with its caches)."""
+    global _enricher
+    if os.getenv("ENRICH_ENABLED", "false").lower() != "true":
+        return None
+    if _enricher is None:
+        _enricher = Enricher(
+            GeoIP(os.getenv("GEOIP_COUNTRY_DB"), os.getenv("GEOIP_ASN_DB")),
+            user_agents=os.getenv("ENRICH_USER_AGENT", "true").lower() == "true",
+            ua_cache_size=int(os.getenv("ENRICH_UA_CACHE_SIZE", "4096")),
+            ip_cache_size=int(os.getenv("ENRICH_IP_CACHE_SIZE", "65536")),
+        )
+    return _enricher
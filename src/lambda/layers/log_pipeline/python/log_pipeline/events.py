@@ -0,0 +1,134 @@
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from log_pipeline.projection import full_parse
+
+
+class LogRecord(NamedTuple):
+    """
+    One access-log entry, normalized once and shared by every sink.
+
+    A plain tuple (no per-instance dict): the CloudWatch envelope, then the
+    access-log fields in a fixed order, None when the message lacks them (or
+    they were not projected). Sinks buffer the record itself and serialize
+    straight from it. Parsed keys outside RECORD_FIELDS are kept in ``extra``
+    (None when there are none).
+    """
+
+    timestamp: Optional[int]  # CloudWatch epoch millis; None for bare records
+    event_id: Optional[str]
+    log_group: str
+    log_stream: str
+    message: str  # raw message as delivered by CloudWatch
+    parsed: bool  # the message yielded fields (a JSON object with wanted keys)
+    extra: Optional[Dict[str, Any]] = None  # parsed keys outside RECORD_FIELDS
+    # Custom access-log template, in template order
+    requestTime: Any = None
+    requestId: Any = None
+    httpMethod: Any = None
+    path: Any = None
+    routeKey: Any = None
+    status: Any = None
+    bytes: Any = None
+    responseLatency: Any = None
+    integrationRequestId: Any = None
+    functionResponseStatus: Any = None
+    integrationLatency: Any = None
+    integrationServiceStatus: Any = None
+    authorizeResultStatus: Any = None
+    authorizerRequestId: Any = None
+    principalId: Any = None
+    email: Any = None
+    userId: Any = None
+    orgId: Any = None
+    idCompany: Any = None
+    version: Any = None
+    release: Any = None
+    ip: Any = None
+    host: Any = None
+    userAgent: Any = None
+    integrationErrorMessage: Any = None
+    dataSource: Any = None
+    applicationVersion: Any = None
+    referer: Any = None
+    # API Gateway standard JSON format (json_with_standard_fields)
+    caller: Any = None
+    user: Any = None
+    resourcePath: Any = None
+    protocol: Any = None
+    responseLength: Any = None
+    # log_pipeline.enrich
+    uaBrowser: Any = None
+    uaOS: Any = None
+    uaDevice: Any = None
+    geoCountry: Any = None
+    geoAsn: Any = None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Field ``name`` like ``dict.get`` (None for names outside the schema)."""
+        index = FIELD_INDEX.get(name)
+        value = self[index] if index is not None else None
+        return default if value is None else value
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """``(field, value)`` pairs in schema order; absent fields are None."""
+        return zip(RECORD_FIELDS, self[_FIRST_FIELD:])
+
+
+_FIRST_FIELD = LogRecord._fields.index("requestTime")
+RECORD_FIELDS = LogRecord._fields[_FIRST_FIELD:]
+# Field name -> tuple position, for itemgetter-based serializers
+FIELD_INDEX = {name: index for index, name in enumerate(LogRecord._fields)}
+_ABSENT = (None,) * len(RECORD_FIELDS)
+_KNOWN = frozenset(RECORD_FIELDS)
+_new = tuple.__new__
+
+
+def normalize(
+    fields: Dict[str, Any],
+    message: str = "",
+    timestamp: Optional[int] = None,
+    event_id: Optional[str] = None,
+    log_group: str = "",
+    log_stream: str = "",
+) -> LogRecord:
+    """``LogRecord`` from parsed (or projected) message ``fields`` and its envelope."""
+    if not fields:
+        envelope = (timestamp, event_id, log_group, log_stream, message, False, None)
+        return _new(LogRecord, envelope + _ABSENT)
+    extra = None
+    if not _KNOWN.issuperset(fields):
+        extra = {key: value for key, value in fields.items() if key not in _KNOWN}
+    envelope = (timestamp, event_id, log_group, log_stream, message, True, extra)
+    return _new(LogRecord, (*envelope, *map(fields.get, RECORD_FIELDS)))
+
+
+def iter_log_events(
+    messages: Iterable[Dict[str, Any]],
+    parse: Callable[[str], Dict[str, Any]] = full_parse,
+) -> Iterator[LogRecord]:
+    """
+    Flatten CloudWatch subscription messages into ``LogRecord`` items.
+
+    ``parse`` turns each access-log message into the fields to normalize;
+    pass a ``log_pipeline.projection.FieldProjector`` to extract only
+    required keys.
+    """
+    for msg in messages:
+        message_type = msg.get("messageType")
+        if message_type == "DATA_MESSAGE":
+            log_group = msg.get("logGroup", "")
+            log_stream = msg.get("logStream", "")
+            for log_event in msg.get("logEvents", []):
+                raw_message = log_event.get("message", "")
+                yield normalize(
+                    parse(raw_message),
+                    raw_message,
+                    log_event.get("timestamp"),
+                    log_event.get("id"),
+                    log_group,
+                    log_stream,
+                )
+        elif message_type is None:
+            # Bare access-log records (no CloudWatch envelope)
+            yield normalize(msg, json.dumps(msg))
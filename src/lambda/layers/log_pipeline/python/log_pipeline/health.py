@@ -0,0 +1,157 @@
+"""
+Per-sink health: circuit breaker and adaptive (AIMD) delivery concurrency.
+
+Health objects live in a module-level registry, so a warm container keeps
+what it learned about a sink between invocations: a sink whose circuit is
+open is skipped without paying its request timeout again until the reset
+period lets one probe request through.
+"""
+import os
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    ``failure_threshold`` consecutive failures open the circuit; after
+    ``reset_timeout`` seconds one probe is allowed (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (at most one probe when half-open)."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = OPEN
+            self._opened_at = self._clock()
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on parallel requests.
+
+    Each successful, timely request raises the limit by ``increase``; a failure
+    or a request slower than ``latency_target_ms`` scales it by ``decrease``.
+    """
+
+    def __init__(
+        self,
+        maximum: int = 1,
+        minimum: int = 1,
+        initial: int = 1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target_ms: float = 0.0,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target_ms = latency_target_ms
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def on_result(self, ok: bool, elapsed_ms: float) -> None:
+        congested = not ok or (self.latency_target_ms and elapsed_ms > self.latency_target_ms)
+        if congested:
+            self._limit = max(self.minimum, self._limit * self.decrease)
+        else:
+            self._limit = min(self.maximum, self._limit + self.increase)
+
+
+class SinkHealth:
+    """Breaker plus concurrency limiter for one sink."""
+
+    def __init__(self, breaker: CircuitBreaker, limiter: AIMDLimiter) -> None:
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def allow(self) -> bool:
+        return self.breaker.allow()
+
+    @property
+    def concurrency(self) -> int:
+        # A recovering sink only gets one request at a time
+        return self.limiter.limit if self.breaker.state == CLOSED else 1
+
+    def record(self, ok: bool, elapsed_ms: float) -> None:
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        self.limiter.on_result(ok, elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"circuit": self.breaker.state, "concurrency": self.limiter.limit}
+
+
+_registry: Dict[str, SinkHealth] = {}
+
+
+def health_for(name: str, max_concurrency: int = 1, latency_target_ms: float = 0.0) -> SinkHealth:
+    """
+    Health of sink ``name``, created on first use and kept for the container.
+
+    Breaker settings come from ``CIRCUIT_FAILURE_THRESHOLD`` (default 3) and
+    ``CIRCUIT_RESET_SECONDS`` (default 30).
+    """
+    health = _registry.get(name)
+    if health is None:
+        health = _registry[name] = SinkHealth(
+            CircuitBreaker(
+                failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3")),
+                reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+            ),
+            AIMDLimiter(maximum=max_concurrency, latency_target_ms=latency_target_ms),
+        )
+    return health
+
+
+def reset_health() -> None:
+    """Forget all sink health (local runs and benchmarks)."""
+    _registry.clear()
@@ -0,0 +1,448 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from urllib.parse import unquote
+
+from log_pipeline.checkpoint import CheckpointStore, checkpoint_key, store_from_url
+from log_pipeline.deadline import DeadlineExceeded, TimeBudget
+from log_pipeline.decode import load_object, parse_messages
+from log_pipeline.dedup import Deduplicator, deduplicator_from_env
+from log_pipeline.enrich import REQUIRED_FIELDS, Enricher, enricher_from_env
+from log_pipeline.events import iter_log_events
+from log_pipeline.partitions import PartitionFilter
+from log_pipeline.policy import policy_from_env
+from log_pipeline.projection import make_parser
+from log_pipeline.router import SinkRouter
+from log_pipeline.sinks import SinkDeliveryError, build_sinks
+from log_pipeline.spill import spill_from_url
+from log_pipeline.sqs import is_sqs_event, iter_s3_records, send_continuations
+
+DEFAULT_SINKS = "clickhouse,loki,opensearch"
+DEFAULT_SLICE_EVENTS = 50_000
+# Events between deadline checks
+DEADLINE_CHECK_EVENTS = 1000
+# Object keys listed in the per-invocation log line
+LOGGED_KEYS = 20
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """S3 client created on first use and reused across warm invocations."""
+    import boto3
+
+    return boto3.client("s3")
+
+
+@lru_cache(maxsize=None)
+def get_sqs_client():
+    import boto3
+
+    return boto3.client("sqs")
+
+
+def sink_names_from_env() -> Sequence[str]:
+    names = os.getenv("INGEST_SINKS", DEFAULT_SINKS)
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+
+def _ingest_object(
+    record: Dict[str, Any],
+    router: SinkRouter,
+    store: Optional[CheckpointStore],
+    slice_events: int,
+    *,
+    budget: Optional[TimeBudget] = None,
+    partitions: Optional[PartitionFilter] = None,
+    dedup: Optional[Deduplicator] = None,
+    prefetched: Optional[Any] = None,
+    enricher: Optional[Enricher] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Route one object's events; return its report (None if not a create).
+
+    Objects outside the selected ``partitions`` are skipped without being
+    downloaded; events ``dedup`` already saw delivered are not routed.
+    ``prefetched`` is the object's download already under way. ``enricher``
+    adds user-agent/GeoIP fields to every parsed message.
+
+    When ``budget`` runs short the object is cut at an event boundary: sinks
+    are flushed, and the report is marked ``deferred`` with the positions
+    reached so a continuation resumes there.
+    """
+    event_name = record.get("eventName", "")
+    bucket = record["s3"]["bucket"]["name"]
+    # Decode URL-encoded object key (e.g., year%3D2026 -> year=2026)
+    key = unquote(record["s3"]["object"]["key"])
+
+    if event_name and not event_name.startswith("ObjectCreated:"):
+        print(f"Ignoring {event_name} for s3://{bucket}/{key}")
+        return None
+    if partitions is not None and not partitions(key):
+        print(f"Skipping s3://{bucket}/{key}: partition not selected")
+        return {"key": key, "events": 0, "skipped": True, "complete": True}
+
+    ckpt_key = checkpoint_key(bucket, key, record["s3"]["object"].get("eTag", ""))
+    state = (store.get(ckpt_key) if store else None) or {}
+    if state.get("complete"):
+        print(f"Skipping s3://{bucket}/{key}: already ingested")
+        return {"key": key, "events": state.get("events", 0), "complete": True}
+
+    if budget is not None and not budget.allows(DEADLINE_CHECK_EVENTS):
+        print(f"Deferring s3://{bucket}/{key}: {budget.remaining_ms():.0f} ms left")
+        return {"key": key, "events": 0, "deferred": True}
+    if state:
+        print(f"Resuming s3://{bucket}/{key} at {state.get('positions')}")
+    else:
+        print(f"Processing s3://{bucket}/{key}")
+    resume = state.get("positions") or {}
+    router.start(resume)
+
+    if prefetched is not None:
+        raw = prefetched.result()
+    else:
+        raw = load_object(get_s3_client(), bucket, key)
+    count = 0
+    recorded = 0
+    duplicates = 0
+    deferred = False
+    # Never stop before passing the resume point, so each attempt progresses
+    floor = min([resume.get(sink.name, 0) for sink in router.sinks] or [0])
+    fields = router.fields
+    if enricher is not None and fields is not None:
+        fields = tuple(sorted(set(fields) | set(REQUIRED_FIELDS)))
+    parse = make_parser(fields)
+    if enricher is not None:
+        parse = enricher.wrap(parse)
+    for log_event in iter_log_events(parse_messages(raw), parse):
+        if budget is not None and count - recorded >= DEADLINE_CHECK_EVENTS:
+            budget.record(count - recorded)
+            recorded = count
+            if count > floor and not budget.allows(DEADLINE_CHECK_EVENTS):
+                deferred = True
+                break
+        if dedup is not None and dedup.is_duplicate(log_event):
+            duplicates += 1
+        else:
+            router.dispatch(log_event, count)
+        count += 1
+        if store and count % slice_events == 0:
+            positions = _timed(budget, lambda: router.checkpoint(count))
+            store.put(ckpt_key, {"positions": positions, "events": count})
+    if budget is not None:
+        budget.record(count - recorded)
+
+    report = {"key": key, "events": count, "_checkpoint": ckpt_key, "_resume": resume}
+    if duplicates:
+        report["duplicates"] = duplicates
+        print(f"Skipped {duplicates} already delivered events in {key}")
+    if deferred:
+        report["deferred"] = True
+        report["positions"] = _timed(budget, lambda: router.checkpoint(count))
+        print(f"Deadline near; deferring s3://{bucket}/{key} after {count} events")
+    else:
+        print(f"Parsed {count} events from {key}")
+    return report
+
+
+def _timed(budget: Optional[TimeBudget], flush: Callable[[], Any]) -> Any:
+    return budget.timed_flush(flush) if budget is not None else flush()
+
+
+def _finalize(
+    report: Dict[str, Any], router: SinkRouter, store: Optional[CheckpointStore]
+) -> Dict[str, Any]:
+    """Resolve an object's per-sink positions once its events were flushed."""
+    ckpt_key = report.pop("_checkpoint", None)
+    resume = report.pop("_resume", None)
+    if ckpt_key is None:
+        return report
+    count = report["events"]
+    if report.get("deferred"):
+        # Cut short by the deadline: resume at the checkpointed positions
+        report["complete"] = False
+    else:
+        # Healthy sinks delivered the whole object; failed sinks restart from
+        # where this object's previous attempt left them.
+        positions = {
+            sink.name: count if sink.name not in router.errors else resume.get(sink.name, 0)
+            for sink in router.sinks
+        }
+        report["positions"] = positions
+        report["complete"] = all(pos >= count for pos in positions.values())
+    if store:
+        store.put(ckpt_key, dict(report))
+    return report
+
+
+def process_s3_event(
+    event: Dict[str, Any],
+    router: SinkRouter,
+    store: Optional[CheckpointStore] = None,
+    slice_events: int = DEFAULT_SLICE_EVENTS,
+    *,
+    budget: Optional[TimeBudget] = None,
+    partitions: Optional[PartitionFilter] = None,
+    dedup: Optional[Deduplicator] = None,
+    engine: Optional[Any] = None,
+    enricher: Optional[Enricher] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Parse every created object once and route its events to the sinks.
+
+    Direct S3 events flush the sinks after each object. SQS-wrapped events
+    (see ``log_pipeline.sqs``) let batches merge across all objects of the
+    invocation and flush once at the end, so sinks get a few large writes; an
+    object that cannot be read only fails its own message.
+
+    With a checkpoint ``store`` objects are also processed in slices of
+    ``slice_events`` messages: sinks are flushed and their positions saved at
+    every slice boundary, so a retry only redoes the unfinished slices of the
+    sinks that failed. Returns one report per object (with ``messageId`` for
+    SQS records).
+
+    With a ``budget``, work that would not finish before the deadline is
+    left undone: the object in progress and every later one get reports
+    marked ``deferred``.
+
+    With ``partitions`` only objects whose keys it selects are read (see
+    ``log_pipeline.partitions``). With ``dedup`` events delivered before
+    (see ``log_pipeline.dedup``) are skipped.
+
+    With an ``engine`` the next object is downloaded while the current one is
+    parsed (see ``log_pipeline.aio``). With an ``enricher`` messages gain the
+    ``log_pipeline.enrich`` fields before they reach the sinks.
+    """
+    merge = is_sqs_event(event)
+    reports: List[Dict[str, Any]] = []
+    out_of_time = False
+    records = list(iter_s3_records(event))
+    # Counts and a few object keys only: the full event can be thousands of records
+    keys = [unquote(record["s3"]["object"]["key"]) for _, record in records[:LOGGED_KEYS]]
+    more = f" (+{len(records) - len(keys)} more)" if len(records) > len(keys) else ""
+    received = len(event.get("Records") or [])
+    print(f"Received {received} records, {len(records)} objects: {keys}{more}")
+    downloads: Dict[int, Any] = {}
+    for index, (message_id, record) in enumerate(records):
+        if engine is not None and not out_of_time:
+            for ahead in (index, index + 1):
+                if ahead < len(records) and ahead not in downloads:
+                    downloads[ahead] = _prefetch(engine, records[ahead][1], partitions)
+        if out_of_time:
+            report = {"key": unquote(record["s3"]["object"]["key"]), "events": 0, "deferred": True}
+            if message_id is not None:
+                report["messageId"] = message_id
+            reports.append(report)
+            continue
+        try:
+            report = _ingest_object(
+                record,
+                router,
+                store,
+                slice_events,
+                budget=budget,
+                partitions=partitions,
+                dedup=dedup,
+                prefetched=downloads.pop(index, None),
+                enricher=enricher,
+            )
+        except Exception as exc:
+            if not merge:
+                raise
+            print(f"Error processing SQS message {message_id}: {exc}")
+            report = {
+                "key": unquote(record["s3"]["object"]["key"]),
+                "events": 0,
+                "error": str(exc),
+            }
+        if report is None:
+            continue
+        if message_id is not None:
+            report["messageId"] = message_id
+        out_of_time = bool(report.get("deferred"))
+        if not merge:
+            _timed(budget, router.flush)
+            report = _finalize(report, router, store)
+        reports.append(report)
+
+    for download in downloads.values():
+        if download is not None:
+            download.cancel()
+    _timed(budget, router.flush)
+    if merge:
+        reports = [_finalize(report, router, store) for report in reports]
+    return reports
+
+
+def _prefetch(
+    engine: Any, record: Dict[str, Any], partitions: Optional[PartitionFilter]
+) -> Optional[Any]:
+    """Start downloading a created object that ``_ingest_object`` will read."""
+    event_name = record.get("eventName", "")
+    if event_name and not event_name.startswith("ObjectCreated:"):
+        return None
+    key = unquote(record["s3"]["object"]["key"])
+    if partitions is not None and not partitions(key):
+        return None
+    return engine.read(load_object, get_s3_client(), record["s3"]["bucket"]["name"], key)
+
+
+def _send_deferred(
+    event: Dict[str, Any], deferred: List[Dict[str, Any]], sqs_client: Any
+) -> bool:
+    """Enqueue the deferred S3 records on ``INGEST_QUEUE_URL``; False if not possible."""
+    queue_url = os.getenv("INGEST_QUEUE_URL", "")
+    if not queue_url:
+        return False
+    wanted = {(report.get("messageId"), report["key"]) for report in deferred}
+    records = [
+        record
+        for message_id, record in iter_s3_records(event)
+        if (message_id, unquote(record["s3"]["object"]["key"])) in wanted
+    ]
+    if sqs_client is None:
+        sqs_client = get_sqs_client()
+    try:
+        send_continuations(sqs_client, queue_url, records)
+    except Exception as exc:
+        print(f"Error enqueuing continuations: {exc}")
+        return False
+    print(f"Enqueued {len(records)} deferred objects for a later invocation")
+    return True
+
+
+def make_s3_handler(
+    sink_names: Optional[Sequence[str]] = None,
+    sqs_client: Any = None,
+) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Build a Lambda handler delivering S3 objects to ``sink_names``.
+
+    Accepts direct S3 notifications and SQS-wrapped ones; for SQS it returns
+    ``batchItemFailures`` instead of raising. When ``sink_names`` is None the
+    sinks come from ``INGEST_SINKS``.
+
+    Objects that would not finish before the function timeout are deferred
+    (see ``log_pipeline.deadline``) and re-enqueued on ``INGEST_QUEUE_URL``
+    through ``sqs_client`` (boto3 by default). Without a queue, deferred SQS
+    messages are reported as failures and direct events raise
+    ``DeadlineExceeded``, so the retry resumes from the checkpoints.
+
+    ``PARTITION_INCLUDE`` / ``PARTITION_EXCLUDE`` restrict which partitioned
+    objects are read; the others are acknowledged as skipped. ``DEDUP_ENABLED``
+    turns on the de-duplication stage (``log_pipeline.dedup``) and
+    ``ASYNC_DELIVERY`` the asyncio delivery engine (``log_pipeline.aio``) and
+    ``ENRICH_ENABLED`` the enrichment stage (``log_pipeline.enrich``).
+    """
+
+    def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        sinks = build_sinks(sink_names or sink_names_from_env())
+        if not sinks:
+            msg = "No sinks configured; skipping ingest."
+            print(msg)
+            return {"statusCode": 200, "body": json.dumps({"message": msg})}
+
+        # Batches a sink cannot take (error or open circuit) are spilled for
+        # replay instead of failing the sink
+        spill = spill_from_url(os.getenv("SPILL_URL", ""), get_s3_client)
+        engine = None
+        if os.getenv("ASYNC_DELIVERY", "false").lower() == "true":
+            # asyncio is only imported when the engine is wanted
+            from log_pipeline.aio import engine_from_env
+
+            engine = engine_from_env()
+        for sink in sinks:
+            sink.spill = spill
+            if engine is not None and sink.http:
+                sink.engine = engine
+        store = store_from_url(os.getenv("CHECKPOINT_STORE", ""), get_s3_client)
+        slice_events = int(os.getenv("CHECKPOINT_SLICE_EVENTS", str(DEFAULT_SLICE_EVENTS)))
+        # ROUTING_POLICY: which events (or what sample of them) each sink gets
+        router = SinkRouter(sinks, policy_from_env())
+        budget = TimeBudget.from_env(context)
+        partitions = PartitionFilter.from_env()
+        dedup = deduplicator_from_env(get_s3_client)
+        if dedup is not None:
+            dedup.start()
+        enricher = enricher_from_env()
+        try:
+            reports = process_s3_event(
+                event,
+                router,
+                store,
+                slice_events,
+                budget=budget,
+                partitions=partitions or None,
+                dedup=dedup,
+                engine=engine,
+                enricher=enricher,
+            )
+        except Exception:
+            if dedup is not None:
+                dedup.discard()
+            raise
+        finally:
+            router.close()
+            if spill is not None:
+                # Ship spill files staged in /tmp (leftovers included)
+                spill.flush()
+        deferred = [report for report in reports if report.get("deferred")]
+        continued = bool(deferred) and _send_deferred(event, deferred, sqs_client)
+
+        summary = router.summary()
+        total_events = sum(report["events"] for report in reports)
+        print(f"Sink summary: {json.dumps(summary)}")
+        if enricher is not None:
+            print(f"Enrichment caches: {json.dumps(enricher.stats())}")
+        if dedup is not None:
+            # Only keys every sink took count as delivered
+            if router.errors:
+                dedup.discard()
+            else:
+                dedup.commit()
+            dedup.emit_metrics()
+        # Without checkpoints a retry re-delivers to every sink, so only
+        # critical sinks justify it; with checkpoints retries resume per sink.
+        failed = list(router.errors) if store else router.critical_failures
+
+        if is_sqs_event(event):
+            failed_ids = sorted(
+                {
+                    report["messageId"]
+                    for report in reports
+                    if "error" in report
+                    or (
+                        not continued
+                        if report.get("deferred")
+                        else failed and not report.get("complete")
+                    )
+                }
+            )
+            print(f"Processed {total_events} events; failed messages: {failed_ids}")
+            return {"batchItemFailures": [{"itemIdentifier": i} for i in failed_ids]}
+
+        if failed:
+            raise SinkDeliveryError(
+                f"Sinks failed: {', '.join(failed)}; "
+                f"objects: {json.dumps(reports)}"
+            )
+        if deferred and not continued:
+            raise DeadlineExceeded(
+                f"{len(deferred)} objects deferred near the deadline; "
+                f"objects: {json.dumps(reports)}"
+            )
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps(
+                {
+                    "message": f"Processed {total_events} events",
+                    "deferred": len(deferred),
+                    "sinks": summary,
+                    "dedup": dedup.snapshot() if dedup is not None else None,
+                    "objects": reports,
+                }
+            ),
+        }
+
+    return handler
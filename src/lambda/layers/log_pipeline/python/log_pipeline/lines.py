@@ -0,0 +1,139 @@
+"""
+Compact Loki log lines for API Gateway access logs.
+
+API Gateway renders about ten fields as ``"-"`` on most requests, and the raw
+template JSON repeats every key with spaces. ``LineEncoder`` rewrites a parsed
+message as logfmt or minimal JSON without placeholder or null values, and lifts
+high-cardinality fields (``requestId``, ``userId``) into Loki structured
+metadata: they stay queryable (``| requestId="..."``) without being indexed
+as labels or repeated in the line. Structured metadata needs Loki 2.9+ with
+``allow_structured_metadata`` (the default from 3.0).
+
+    LOKI_LINE_FORMAT=raw|json|logfmt       raw pushes the message unchanged
+    LOKI_STRUCTURED_METADATA=requestId,userId
+    LOKI_DROP_VALUES=-                     values left out of the line
+    LOKI_LINE_OMIT=                        fields left out of the line
+"""
+import json
+import os
+import re
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from log_pipeline.events import LogRecord
+from log_pipeline.projection import full_parse
+
+FORMATS = ("raw", "json", "logfmt")
+DEFAULT_METADATA = ("requestId", "userId")
+PLACEHOLDERS = ("-",)
+
+# (line, structured metadata)
+EncodedLine = Tuple[str, Dict[str, str]]
+
+_NEEDS_QUOTES = re.compile(r'[\s="\\]|^$').search
+
+
+def _logfmt_value(value: Any) -> str:
+    if isinstance(value, str):
+        if not _NEEDS_QUOTES(value):
+            return value
+    elif value is None:
+        return '""'
+    elif value is True or value is False:
+        return "true" if value else "false"
+    else:
+        return str(value)
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def logfmt(fields: Dict[str, Any]) -> str:
+    """``key=value`` pairs; values with spaces, quotes or ``=`` are quoted."""
+    return " ".join([f"{key}={_logfmt_value(value)}" for key, value in fields.items()])
+
+
+class LineEncoder:
+    """Turns access-log messages into compact lines plus structured metadata."""
+
+    def __init__(
+        self,
+        line_format: str = "logfmt",
+        metadata: Iterable[str] = DEFAULT_METADATA,
+        drop_values: Iterable[str] = PLACEHOLDERS,
+        omit: Iterable[str] = (),
+    ) -> None:
+        if line_format not in FORMATS:
+            raise ValueError(f"Unknown line format {line_format!r}; use {', '.join(FORMATS)}")
+        self.line_format = line_format
+        self.metadata = tuple(metadata)
+        self.drop_values = frozenset(drop_values)
+        self.omit = frozenset(omit) | frozenset(self.metadata)
+
+    @property
+    def raw(self) -> bool:
+        return self.line_format == "raw"
+
+    def omitting(self, names: Iterable[str]) -> "LineEncoder":
+        """A copy that also leaves ``names`` out of the line (this one is unchanged)."""
+        omit = self.omit | frozenset(names)
+        return LineEncoder(self.line_format, self.metadata, self.drop_values, omit)
+
+    def encode(self, message: str, fields: Optional[Dict[str, Any]] = None) -> EncodedLine:
+        """
+        Line and metadata for ``message``; ``fields`` is its parsed form when
+        already at hand. Messages that are not JSON objects pass through.
+        """
+        if self.raw:
+            return message, {}
+        if fields is None:
+            fields = full_parse(message)
+        if not fields:
+            return message, {}
+        return self._encode(fields.items(), fields.get)
+
+    def encode_record(self, record: LogRecord) -> EncodedLine:
+        """``encode`` for a ``LogRecord``, written straight from its fields."""
+        if self.raw or not record.parsed:
+            return record.message, {}
+        if record.extra:
+            # Keys outside the schema are part of the line too
+            extra = record.extra
+            return self._encode(
+                chain(record.items(), extra.items()),
+                lambda name: extra[name] if name in extra else record.get(name),
+            )
+        return self._encode(record.items(), record.get)
+
+    def _encode(self, items: Iterable[Tuple[str, Any]], get: Callable[[str], Any]) -> EncodedLine:
+        drop = self.drop_values
+        omit = self.omit
+        kept = {
+            key: value
+            for key, value in items
+            if value is not None
+            and key not in omit
+            and not (isinstance(value, str) and value in drop)
+        }
+        metadata = {}
+        for name in self.metadata:
+            value = get(name)
+            if value is not None and value not in drop:
+                metadata[name] = str(value)
+        if self.line_format == "json":
+            line = json.dumps(kept, separators=(",", ":"), ensure_ascii=False)
+        else:
+            line = logfmt(kept)
+        return line, metadata
+
+
+def _names(value: str) -> Tuple[str, ...]:
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+def line_encoder_from_env() -> LineEncoder:
+    return LineEncoder(
+        os.getenv("LOKI_LINE_FORMAT", "raw").lower(),
+        metadata=_names(os.getenv("LOKI_STRUCTURED_METADATA", ",".join(DEFAULT_METADATA))),
+        drop_values=_names(os.getenv("LOKI_DROP_VALUES", ",".join(PLACEHOLDERS))),
+        omit=_names(os.getenv("LOKI_LINE_OMIT", "")),
+    )
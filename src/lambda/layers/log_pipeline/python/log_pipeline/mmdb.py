@@ -0,0 +1,158 @@
+"""
+Minimal reader for MaxMind DB (``.mmdb``) files, e.g. GeoLite2 Country/ASN.
+
+The file is memory-mapped, so a lookup only touches the pages of its tree path
+and data record: nothing is loaded up front and warm containers share the
+page cache. Implements the MaxMind DB 2.0 format (binary search tree with
+24/28/32-bit records, then the data section); records decode to plain dicts
+and lists.
+"""
+import ipaddress
+import mmap
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+METADATA_MARKER = b"\xab\xcd\xefMaxMind.com"
+# The data section follows the tree after 16 zero bytes
+DATA_SEPARATOR = 16
+
+
+class InvalidDatabaseError(ValueError):
+    """The file is not a MaxMind DB this reader understands."""
+
+
+class _Decoder:
+    """Decoder for the data section format, reading from ``offset``."""
+
+    def __init__(self, buf: Any, base: int) -> None:
+        self.buf = buf
+        self.base = base  # start of the section; pointers are relative to it
+
+    def _size(self, ctrl: int, offset: int) -> Tuple[int, int]:
+        size = ctrl & 0x1F
+        if size < 29:
+            return size, offset
+        extra = size - 28
+        value = int.from_bytes(self.buf[offset : offset + extra], "big")
+        return (29, 285, 65821)[extra - 1] + value, offset + extra
+
+    def decode(self, offset: int) -> Tuple[Any, int]:
+        """Value at ``offset`` (relative to the section) and the offset after it."""
+        buf = self.buf
+        pos = self.base + offset
+        ctrl = buf[pos]
+        pos += 1
+        kind = ctrl >> 5
+        if kind == 1:  # pointer: decode the target, continue after the pointer
+            length = ((ctrl >> 3) & 0x3) + 1
+            raw = int.from_bytes(buf[pos : pos + length], "big")
+            if length == 4:
+                target = raw
+            else:
+                target = ((ctrl & 0x7) << (8 * length)) + raw
+                target += (0, 2048, 526336)[length - 1]
+            value, _ = self.decode(target)
+            return value, pos + length - self.base
+        if kind == 0:  # extended type
+            kind = 7 + buf[pos]
+            pos += 1
+        size, pos = self._size(ctrl, pos)
+        if kind == 2:
+            end = pos + size
+            return bytes(buf[pos:end]).decode("utf-8"), end - self.base
+        if kind == 7:
+            result: Dict[str, Any] = {}
+            offset = pos - self.base
+            for _ in range(size):
+                key, offset = self.decode(offset)
+                result[key], offset = self.decode(offset)
+            return result, offset
+        if kind == 11:
+            items = []
+            offset = pos - self.base
+            for _ in range(size):
+                item, offset = self.decode(offset)
+                items.append(item)
+            return items, offset
+        if kind in (5, 6, 8, 9, 10):
+            end = pos + size
+            value = int.from_bytes(buf[pos:end], "big", signed=kind == 8 and size == 4)
+            return value, end - self.base
+        if kind == 3:
+            return struct.unpack(">d", buf[pos : pos + 8])[0], pos + 8 - self.base
+        if kind == 15:
+            return struct.unpack(">f", buf[pos : pos + 4])[0], pos + 4 - self.base
+        if kind == 14:
+            return bool(size), pos - self.base
+        if kind == 4:
+            return bytes(buf[pos : pos + size]), pos + size - self.base
+        raise InvalidDatabaseError(f"Unsupported data type {kind} at offset {offset}")
+
+
+class Reader:
+    """Looks up IP addresses in a memory-mapped ``.mmdb`` file."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self._buf.rfind(METADATA_MARKER, max(0, len(self._buf) - 128 * 1024))
+        if start < 0:
+            raise InvalidDatabaseError(f"{path}: no MaxMind DB metadata")
+        metadata_start = start + len(METADATA_MARKER)
+        self.metadata, _ = _Decoder(self._buf, metadata_start).decode(0)
+        self.node_count = self.metadata["node_count"]
+        self.record_size = self.metadata["record_size"]
+        self.ip_version = self.metadata["ip_version"]
+        if self.record_size not in (24, 28, 32):
+            raise InvalidDatabaseError(f"{path}: record size {self.record_size}")
+        self._node_bytes = self.record_size // 4
+        tree_size = self.node_count * self._node_bytes
+        self._data = _Decoder(self._buf, tree_size + DATA_SEPARATOR)
+        self._ipv4_start: Optional[int] = None
+
+    def _record(self, node: int, bit: int) -> int:
+        buf = self._buf
+        pos = node * self._node_bytes
+        if self.record_size == 24:
+            pos += 3 * bit
+            return int.from_bytes(buf[pos : pos + 3], "big")
+        if self.record_size == 28:
+            middle = buf[pos + 3]
+            if bit:
+                return ((middle & 0x0F) << 24) | int.from_bytes(buf[pos + 4 : pos + 7], "big")
+            return ((middle & 0xF0) << 20) | int.from_bytes(buf[pos : pos + 3], "big")
+        pos += 4 * bit
+        return int.from_bytes(buf[pos : pos + 4], "big")
+
+    def _start(self, bits: int) -> int:
+        if self.ip_version == 4 or bits == 128:
+            return 0
+        if self._ipv4_start is None:
+            # IPv4 addresses live under ::/96 in an IPv6 tree
+            node = 0
+            for _ in range(96):
+                if node >= self.node_count:
+                    break
+                node = self._record(node, 0)
+            self._ipv4_start = node
+        return self._ipv4_start
+
+    def get(self, ip: str) -> Optional[Any]:
+        """Record for ``ip`` or None when it is not in the database."""
+        address = ipaddress.ip_address(ip)
+        bits = 32 if address.version == 4 else 128
+        if bits == 128 and self.ip_version == 4:
+            return None
+        value = int(address)
+        node = self._start(bits)
+        depth = 0
+        while node < self.node_count and depth < bits:
+            node = self._record(node, (value >> (bits - 1 - depth)) & 1)
+            depth += 1
+        if node <= self.node_count:
+            return None
+        record, _ = self._data.decode(node - self.node_count - DATA_SEPARATOR)
+        return record
+
+    def close(self) -> None:
+        self._buf.close()
@@ -0,0 +1,148 @@
+"""
+Firehose dynamic-partitioning keys and prefix selection of partitioned objects.
+
+``kinesis_transformer`` returns ``metadata.partitionKeys`` for every record, so
+Firehose (with dynamic partitioning and the prefix below) writes Hive-style
+keys that say what each object holds::
+
+    logs/year=!{partitionKeyFromLambda:year}/month=!{partitionKeyFromLambda:month}/
+    day=!{partitionKeyFromLambda:day}/hour=!{partitionKeyFromLambda:hour}/
+    applicationVersion=!{partitionKeyFromLambda:applicationVersion}/
+    logGroup=!{partitionKeyFromLambda:logGroup}/
+
+A record is one CloudWatch data message. Its hour is that of its first event
+and ``applicationVersion`` is ``mixed`` when its events disagree.
+
+``PartitionFilter`` then lets the S3 processors and the backfill/replay tools
+select or skip objects by key without downloading them.
+"""
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from log_pipeline.events import LogRecord
+from log_pipeline.projection import FieldProjector
+
+PARTITION_KEYS = ("year", "month", "day", "hour", "applicationVersion", "logGroup")
+MIXED = "mixed"
+UNKNOWN = "unknown"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+_project_version = FieldProjector(("applicationVersion",))
+
+
+def partition_value(value: Any) -> str:
+    """S3-safe partition value: unsafe characters collapse to ``-``."""
+    text = _UNSAFE.sub("-", str(value or "")).strip("-.")
+    return text or UNKNOWN
+
+
+def partition_keys(
+    message: Dict[str, Any],
+    parse: Callable[[str], Dict[str, Any]] = _project_version,
+    records: Optional[Sequence[LogRecord]] = None,
+) -> Dict[str, str]:
+    """
+    ``partitionKeys`` for a CloudWatch ``DATA_MESSAGE``. ``records`` are its
+    events already parsed (with ``applicationVersion``), so the messages are
+    not parsed again.
+    """
+    if records is not None:
+        timestamp = records[0].timestamp if records else None
+        versions = {record.applicationVersion for record in records}
+    else:
+        events = message.get("logEvents") or []
+        timestamp = events[0].get("timestamp") if events else None
+        versions = {parse(event.get("message", "")).get("applicationVersion") for event in events}
+    hour = time.gmtime(timestamp / 1000 if timestamp is not None else time.time())
+
+    versions.discard(None)
+    versions.discard("-")
+    if len(versions) > 1:
+        version = MIXED
+    else:
+        version = partition_value(versions.pop() if versions else "")
+
+    return {
+        "year": time.strftime("%Y", hour),
+        "month": time.strftime("%m", hour),
+        "day": time.strftime("%d", hour),
+        "hour": time.strftime("%H", hour),
+        "applicationVersion": version,
+        "logGroup": partition_value(message.get("logGroup")),
+    }
+
+
+def partition_path(keys: Dict[str, str]) -> str:
+    """``name=value/...`` path the Firehose prefix expression produces for ``keys``."""
+    return "".join(f"{name}={keys[name]}/" for name in PARTITION_KEYS if name in keys)
+
+
+def parse_partitions(key: str) -> Dict[str, str]:
+    """Partition values encoded in an S3 key (``name=value`` segments)."""
+    values = {}
+    for segment in key.split("/")[:-1]:
+        name, sep, value = segment.partition("=")
+        if sep:
+            values[name] = value
+    return values
+
+
+def _split(terms: str) -> List[str]:
+    return [term.strip() for term in terms.split(",") if term.strip()]
+
+
+class PartitionFilter:
+    """
+    Select S3 keys by partition.
+
+    A term matches a key that starts with it (``logs/year=2026/month=01/``)
+    or that contains it as whole path segments anywhere
+    (``applicationVersion=mixed``, ``day=08/hour=19``). A key is selected when
+    it matches some ``include`` term (or there are none) and no ``exclude``
+    term.
+    """
+
+    def __init__(self, include: Sequence[str] = (), exclude: Sequence[str] = ()) -> None:
+        self.include = [term for term in include if term]
+        self.exclude = [term for term in exclude if term]
+
+    @classmethod
+    def from_env(cls) -> "PartitionFilter":
+        """Terms from comma-separated ``PARTITION_INCLUDE`` / ``PARTITION_EXCLUDE``."""
+        return cls(
+            _split(os.getenv("PARTITION_INCLUDE", "")),
+            _split(os.getenv("PARTITION_EXCLUDE", "")),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    @staticmethod
+    def _matches(term: str, key: str) -> bool:
+        if key.startswith(term):
+            return True
+        return f"/{term.strip('/')}/" in f"/{key}"
+
+    def __call__(self, key: str) -> bool:
+        if self.include and not any(self._matches(term, key) for term in self.include):
+            return False
+        return not any(self._matches(term, key) for term in self.exclude)
+
+    def list_prefixes(self, root: str) -> List[str]:
+        """
+        Prefixes to list under ``root``: the include terms that are prefixes
+        of whole partitions, so listing skips everything else; ``[root]``
+        when some include term can only be matched per key.
+        """
+        root = root.lstrip("/")
+        prefixes = []
+        for term in self.include:
+            if not term.startswith(root):
+                term = root + term.lstrip("/")
+            first = term[len(root) :].split("/", 1)[0]
+            if not first.startswith(f"{PARTITION_KEYS[0]}="):
+                return [root]
+            prefixes.append(term)
+        return prefixes or [root]
@@ -0,0 +1,348 @@
+"""
+Declarative routing and sampling of events across sinks.
+
+Most access-log traffic is repetitive successful requests; a routing policy
+keeps all of it in ClickHouse while Loki and OpenSearch only get a sample,
+and still sends every error and slow request everywhere. ``ROUTING_POLICY``
+holds the policy as JSON (or the path of a JSON file, e.g. in a layer)::
+
+    {
+      "rules": [
+        {"name": "errors", "when": {"status": ["4*", "5*"]}, "sinks": "*"},
+        {"name": "slow", "when": {"responseLatency": ">=1000"}, "sinks": "*"},
+        {"name": "watched", "when": [{"ip": ["190.99.139.120", "10.0.0.0/8"]},
+                                     {"routeKey": "POST /api/v1/payments*"}],
+         "sinks": "*"},
+        {"name": "health", "when": {"path": "/health"}, "sinks": []}
+      ],
+      "default": {"clickhouse": 1, "loki": 0.05, "opensearch": 0.05}
+    }
+
+Rules are tried in order and the first match decides. ``when`` maps fields
+(LogRecord names) to matchers, all of which must hold; a list of such maps
+matches if any does. A matcher is a value (equality; numbers and their
+strings are interchangeable), a list (any of), ``">=500"``-style numeric
+comparisons (``>``, ``>=``, ``<``, ``<=``), ``"!=value"``, a glob with ``*``/``?``
+or, for IP addresses, a CIDR block. ``sinks`` (and ``default``, ``"*"``
+when omitted) is ``"*"`` for every sink, a list of sink names, or a map of
+sink names to sampling rates in [0, 1] where ``"*"`` sets the rate of the
+unnamed sinks; sinks left out get nothing. Names of sinks the function does
+not run are ignored.
+
+Sampling is deterministic: an event's bucket is the CRC32 of its
+``requestId`` (the CloudWatch event id without one), and a sink with rate r
+takes the event when the bucket falls in the lowest r of the hash range. The
+same request is therefore kept or dropped alike by every sink with the same
+rate and by every function (s3_ingest and kinesis_transformer), and a 5%
+sink always sees a subset of a 10% one, so traces stay complete.
+
+``RoutingPolicy.compile`` turns the rules into one generated Python function
+per sink list. Plain values are set lookups and other matchers are memoized
+by field value, so an event costs a few dict lookups plus, when sampled, one
+CRC32 (about 1 us; see benchmarks/bench_policy.py).
+"""
+import json
+import math
+import operator
+import os
+import re
+from fnmatch import translate
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from zlib import crc32
+
+from log_pipeline.events import FIELD_INDEX, RECORD_FIELDS, LogRecord
+
+ALL_SINKS = "*"
+SAMPLE_FIELD = "requestId"
+# Distinct values remembered per matcher
+MEMO_SIZE = 65_536
+# Buckets are 32-bit CRCs: a rate r keeps buckets below r * 2**32
+_BUCKETS = 1 << 32
+_COMPARISONS = {">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt}
+_NAN = float("nan")
+
+_SAMPLE_INDEX = FIELD_INDEX[SAMPLE_FIELD]
+
+Route = Callable[[LogRecord], Tuple[bool, ...]]
+
+
+def _number(value: Any) -> float:
+    """``value`` as a float; NaN (false in every comparison) when it is not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _variants(value: Any) -> List[Any]:
+    """``value`` as a record may hold it: numbers also as strings and vice versa."""
+    found = [value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        found.append(str(value))
+    elif isinstance(value, str):
+        number = _number(value)
+        if not math.isnan(number):
+            found.append(int(number) if number.is_integer() else number)
+    return found
+
+
+def _compare(compare: Callable[[float, float], bool], bound: float, value: Any) -> bool:
+    return compare(_number(value), bound)
+
+
+def _excluded(values: frozenset, value: Any) -> bool:
+    return value not in values
+
+
+def _network(value: str) -> Optional[Any]:
+    if "/" not in value:
+        return None
+    import ipaddress
+
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+
+def _in_networks(networks: Sequence[Any]) -> Callable[[Any], bool]:
+    import ipaddress
+
+    def test(value: Any) -> bool:
+        try:
+            address = ipaddress.ip_address(str(value).strip())
+        except ValueError:
+            return False
+        return any(address in network for network in networks)
+
+    return test
+
+
+def _glob(patterns: Sequence[str]) -> Callable[[Any], bool]:
+    match = re.compile("|".join(f"(?:{translate(p)})" for p in patterns)).match
+
+    def test(value: Any) -> bool:
+        return value is not None and match(str(value)) is not None
+
+    return test
+
+
+class _Memo(dict):
+    """
+    ``test`` results by field value: a matcher on a low-cardinality field
+    (status, route, IP) costs one dict lookup once a value has been seen.
+    """
+
+    def __init__(self, test: Callable[[Any], bool]) -> None:
+        super().__init__()
+        self.test = test
+
+    def __missing__(self, value: Any) -> bool:
+        result = self.test(value)
+        if len(self) < MEMO_SIZE:
+            self[value] = result
+        return result
+
+
+class _Condition:
+    """One ``field: matcher`` test on a record value."""
+
+    def __init__(self, field: str, matcher: Any) -> None:
+        if field not in RECORD_FIELDS:
+            raise ValueError(f"Routing policy: unknown field {field!r}")
+        self.field = field
+        self.index = FIELD_INDEX[field]
+        values: List[Any] = []
+        excluded: List[Any] = []
+        globs: List[str] = []
+        networks: List[Any] = []
+        tests: List[Callable[[Any], bool]] = []
+        for option in matcher if isinstance(matcher, list) else [matcher]:
+            if isinstance(option, (dict, list)):
+                raise ValueError(f"Routing policy: bad matcher for {field!r}: {option!r}")
+            if not isinstance(option, str):
+                values.extend(_variants(option))
+                continue
+            comparison = next((op for op in _COMPARISONS if option.startswith(op)), None)
+            network = _network(option)
+            if comparison:
+                bound = _number(option[len(comparison):])
+                if math.isnan(bound):
+                    raise ValueError(f"Routing policy: bad comparison for {field!r}: {option!r}")
+                tests.append(partial(_compare, _COMPARISONS[comparison], bound))
+            elif option.startswith("!="):
+                excluded.extend(_variants(option[2:]))
+            elif "*" in option or "?" in option:
+                globs.append(option)
+            elif network is not None:
+                networks.append(network)
+            else:
+                values.extend(_variants(option))
+        # Plain values alone are a set lookup; anything else goes through a memo
+        self.values = frozenset(values)
+        self.test: Optional[_Memo] = None
+        if excluded:
+            tests.append(partial(_excluded, frozenset(excluded)))
+        if globs:
+            tests.append(_glob(globs))
+        if networks:
+            tests.append(_in_networks(networks))
+        if tests:
+            if values:
+                tests.append(self.values.__contains__)
+            self.test = _Memo(lambda value: any(check(value) for check in tests))
+
+
+class Rule:
+    """``when`` clauses (ORed lists of ANDed conditions) and the sink rates they select."""
+
+    def __init__(self, spec: Dict[str, Any], position: int) -> None:
+        self.name = str(spec.get("name") or f"rule{position}")
+        when = spec.get("when") or {}
+        clauses = when if isinstance(when, list) else [when]
+        if not clauses or not all(isinstance(c, dict) and c for c in clauses):
+            raise ValueError(f"Routing policy: rule {self.name!r} needs 'when' conditions")
+        self.clauses = [[_Condition(f, m) for f, m in clause.items()] for clause in clauses]
+        self.rates = _rates(spec.get("sinks", ALL_SINKS), self.name)
+
+    @property
+    def fields(self) -> List[str]:
+        return [c.field for clause in self.clauses for c in clause]
+
+
+def _rates(spec: Any, name: str) -> Dict[str, float]:
+    """Sink name -> sampling rate; ``"*"`` is the rate of unnamed sinks."""
+    if spec == ALL_SINKS:
+        return {ALL_SINKS: 1.0}
+    if isinstance(spec, list):
+        return {str(sink): 1.0 for sink in spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Routing policy: bad sinks for {name!r}: {spec!r}")
+    rates = {}
+    for sink, rate in spec.items():
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+            raise ValueError(f"Routing policy: rate for {sink!r} in {name!r} must be in [0, 1]")
+        rates[str(sink)] = float(rate)
+    return rates
+
+
+def _thresholds(rates: Dict[str, float], sinks: Sequence[str]) -> Tuple[int, ...]:
+    default = rates.get(ALL_SINKS, 0.0)
+    return tuple(round(rates.get(sink, default) * _BUCKETS) for sink in sinks)
+
+
+def sample_bucket(record: LogRecord) -> int:
+    """The record's 32-bit sampling bucket (CRC32 of its requestId)."""
+    key = record[_SAMPLE_INDEX]
+    if key is None or key == "-":
+        key = record.event_id or record.message
+    return crc32(str(key).encode("utf-8"))
+
+
+def _decision(thresholds: Tuple[int, ...]) -> Tuple[Optional[bool], ...]:
+    """Per sink: True/False when the rate is 1/0, None when it samples."""
+    return tuple(t == _BUCKETS if t in (0, _BUCKETS) else None for t in thresholds)
+
+
+class RoutingPolicy:
+    """
+    Ordered routing rules; ``compile(sink_names)`` gives the per-event route.
+
+    The route maps a LogRecord to one bool per sink (in the given order):
+    whether that sink takes the event.
+    """
+
+    def __init__(self, rules: Sequence[Dict[str, Any]], default: Any = ALL_SINKS) -> None:
+        # Malformed policies fail here, when the function starts, not on an event
+        if not isinstance(rules, list) or not all(isinstance(spec, dict) for spec in rules):
+            raise ValueError("Routing policy: 'rules' must be a list of objects")
+        self.rules = [Rule(spec, n) for n, spec in enumerate(rules)]
+        self.default = _rates(default, "default")
+        self._compiled: Dict[Tuple[str, ...], Route] = {}
+
+    @classmethod
+    def from_json(cls, text: str) -> "RoutingPolicy":
+        spec = json.loads(text)
+        if isinstance(spec, list):
+            return cls(spec)
+        if not isinstance(spec, dict):
+            raise ValueError("Routing policy: expected a JSON object or list of rules")
+        return cls(spec.get("rules") or [], spec.get("default", ALL_SINKS))
+
+    @property
+    def samples(self) -> bool:
+        every = [self.default] + [rule.rates for rule in self.rules]
+        return any(0 < rate < 1 for rates in every for rate in rates.values())
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """Message fields the policy reads (for the parser's projection)."""
+        names = {name for rule in self.rules for name in rule.fields}
+        if self.samples:
+            names.add(SAMPLE_FIELD)
+        return tuple(sorted(names))
+
+    def compile(self, sinks: Sequence[str]) -> Route:
+        key = tuple(sinks)
+        route = self._compiled.get(key)
+        if route is None:
+            route = self._compiled[key] = self._generate(key)
+        return route
+
+    def _generate(self, sinks: Tuple[str, ...]) -> Route:
+        namespace: Dict[str, Any] = {"_number": _number, "_bucket": sample_bucket}
+
+        def bind(value: Any) -> str:
+            name = f"_c{len(namespace)}"
+            namespace[name] = value
+            return name
+
+        def expression(condition: _Condition) -> str:
+            value = f"r[{condition.index}]"
+            if condition.test is not None:
+                return f"{bind(condition.test)}[{value}]"
+            # An empty list matches nothing (e.g. an override list kept for later)
+            return f"{value} in {bind(condition.values)}" if condition.values else "False"
+
+        def returned(thresholds: Tuple[int, ...]) -> str:
+            decision = _decision(thresholds)
+            if None not in decision:
+                return f"return {bind(decision)}"
+            # Sampling: one bucket per event, compared with each sink's bound
+            shares = [
+                f"_b < {t}" if fixed is None else str(fixed)
+                for t, fixed in zip(thresholds, decision)
+            ]
+            return f"_b = _bucket(r); return ({', '.join(shares)},)"
+
+        # Unhashable values (nested JSON) cannot be matched: such events go
+        # to every sink
+        lines = ["def route(r):", "  try:"]
+        for rule in self.rules:
+            clauses = [
+                " and ".join(expression(condition) for condition in clause)
+                for clause in rule.clauses
+            ]
+            test = " or ".join(f"({clause})" for clause in clauses)
+            lines.append(f"    if {test}:  # {rule.name!r}")
+            lines.append(f"        {returned(_thresholds(rule.rates, sinks))}")
+        lines.append(f"    {returned(_thresholds(self.default, sinks))}")
+        lines.append("  except TypeError:")
+        lines.append(f"    return {bind((True,) * len(sinks))}")
+        exec(compile("\n".join(lines), "<routing policy>", "exec"), namespace)
+        return namespace["route"]
+
+
+@lru_cache(maxsize=4)
+def _load(text: str) -> RoutingPolicy:
+    if not text.lstrip().startswith(("{", "[")):
+        with open(text, encoding="utf-8") as f:
+            text = f.read()
+    return RoutingPolicy.from_json(text)
+
+
+def policy_from_env() -> Optional[RoutingPolicy]:
+    """The ``ROUTING_POLICY`` policy (parsed once per container); None if unset."""
+    text = os.getenv("ROUTING_POLICY", "").strip()
+    return _load(text) if text else None
@@ -0,0 +1,137 @@
+"""
+Field projection for API Gateway JSON access logs.
+
+API Gateway renders access logs from a fixed template: one flat JSON object
+whose values are plain strings (``"-"`` when empty) or numbers. For that shape
+a scanner prepared once per field set can pull just the required keys out of the message
+without building the full ~30-key dict. Anything outside that shape (escaped
+characters, nested values, non-object messages) falls back to ``json.loads``.
+"""
+import json
+from typing import Any, Callable, Dict, Iterable, Optional
+
+_LITERALS = {"true": True, "false": False, "null": None}
+# Above this many fields C ``json.loads`` beats scanning key by key
+# (see benchmarks/bench_projection.py).
+MAX_PROJECTED_FIELDS = 6
+
+
+def full_parse(message: str) -> Dict[str, Any]:
+    """``json.loads`` a message, returning ``{}`` when it is not a JSON object."""
+    try:
+        fields = json.loads(message)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return fields if isinstance(fields, dict) else {}
+
+
+def _has_nested(message: str) -> bool:
+    """True if any value is an object or array (API Gateway never emits one)."""
+    for bracket in "{[":
+        pos = message.find(bracket, 1)
+        while pos != -1:
+            if message[:pos].rstrip().endswith(":"):
+                return True
+            pos = message.find(bracket, pos + 1)
+    return False
+
+
+class FieldProjector:
+    """
+    Extracts ``fields`` from access-log messages.
+
+    Calling the projector returns a dict holding the required keys present in
+    the message; keys the message lacks are absent, as with a full parse.
+    ``fallbacks`` counts messages that needed ``json.loads``. Messages that
+    are not JSON objects give ``{}``, or None when ``strict``: then a message
+    lacking a required key is also checked with ``json.loads``, so malformed
+    JSON is never taken for an object without those keys.
+
+    Each key is located with ``str.find`` on its quoted name. Without
+    backslashes every quote in the message is structural, so a quoted match
+    followed by ``:`` is a key and its value ends at the next quote (strings)
+    or at the next ``,``/``}`` (numbers and literals). Keys are searched in
+    the order the first message lays them out, each search resuming where the
+    previous value ended, so a message is scanned about once.
+    """
+
+    def __init__(self, fields: Iterable[str], strict: bool = False) -> None:
+        self.fields = tuple(sorted(set(fields)))
+        self.strict = strict
+        self.fallbacks = 0
+        self._needles = [(name, f'"{name}"', len(name) + 2) for name in self.fields]
+        self._ordered = False
+
+    def _fallback(self, message: str) -> Optional[Dict[str, Any]]:
+        self.fallbacks += 1
+        try:
+            fields = json.loads(message)
+        except (json.JSONDecodeError, TypeError):
+            fields = None
+        if not isinstance(fields, dict):
+            return None if self.strict else {}
+        return {name: fields[name] for name in self.fields if name in fields}
+
+    def _learn_order(self, message: str) -> None:
+        # Template order; keys missing from this message go last
+        size = len(message)
+        self._needles.sort(key=lambda needle: message.find(needle[1]) % (size + 1))
+        self._ordered = True
+
+    def __call__(self, message: str) -> Optional[Dict[str, Any]]:
+        if not self._needles:
+            return self._fallback(message) if self.strict else {}
+        if message[:1] != "{" or message[-1:] != "}" or "\\" in message or _has_nested(message):
+            return self._fallback(message)
+        if not self._ordered:
+            self._learn_order(message)
+
+        find = message.find
+        result: Dict[str, Any] = {}
+        cursor = 0
+        for name, needle, size in self._needles:
+            pos = find(needle, cursor)
+            if pos == -1 and cursor:
+                # Out of template order; search the whole message
+                pos = find(needle)
+            while pos != -1:
+                colon = pos + size
+                while message[colon] == " ":
+                    colon += 1
+                if message[colon] == ":":
+                    break
+                # A string value equal to the key name; keep looking
+                pos = find(needle, colon)
+            if pos == -1:
+                continue
+            start = colon + 1
+            while message[start] == " ":
+                start += 1
+            if message[start] == '"':
+                cursor = find('"', start + 1)
+                result[name] = message[start + 1 : cursor]
+                continue
+            cursor = start
+            while message[cursor] not in ",}":
+                cursor += 1
+            literal = message[start:cursor].rstrip()
+            try:
+                result[name] = _LITERALS[literal] if literal in _LITERALS else json.loads(literal)
+            except json.JSONDecodeError:
+                return self._fallback(message)
+        if self.strict and len(result) < len(self._needles):
+            return self._fallback(message)
+        return result
+
+
+def make_parser(fields: Optional[Iterable[str]]) -> Callable[[str], Dict[str, Any]]:
+    """
+    Message parser for ``fields``: a projector for small field sets, otherwise
+    a full parse. None means the caller needs every field.
+    """
+    if fields is None:
+        return full_parse
+    fields = tuple(fields)
+    if len(set(fields)) > MAX_PROJECTED_FIELDS:
+        return full_parse
+    return FieldProjector(fields)
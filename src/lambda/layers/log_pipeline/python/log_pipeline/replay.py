@@ -0,0 +1,130 @@
+"""
+Replay spilled batches into their sinks once they recover.
+
+    python -m log_pipeline.replay s3://test-nf-tags/spill/ [--sink loki] [--keep] [--dry-run]
+    python -m log_pipeline.replay file:///tmp/spill
+    python -m log_pipeline.replay s3://test-nf-tags/spill/ --include 2026/01/09 --exclude 2026/01/09/03
+
+Sinks are configured from the environment exactly as in the Lambda functions
+(``LOKI_ENDPOINT``, ``CLICKHOUSE_HOST``, ...). Every spill file is decoded,
+its chunks merged into full ``batch_size`` batches and delivered; the file is
+deleted once all of it went through. A sink that fails again stops its drain
+and keeps the remaining files.
+
+``--include`` / ``--exclude`` select spill files by key the way
+``log_pipeline.partitions.PartitionFilter`` selects log partitions (S3 spill
+keys are ``<prefix>/<sink>/<yyyy>/<mm>/<dd>/<hh>/``).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from log_pipeline.partitions import PartitionFilter
+from log_pipeline.sinks import SINK_MODULES, Sink, build_sinks
+from log_pipeline.spill import SUFFIX, decode_rows, iter_chunks
+
+# (description, read bytes, delete)
+SpillFile = Tuple[str, Callable[[], bytes], Callable[[], None]]
+
+
+def read_items(sink: Sink, data: bytes) -> List[Any]:
+    """Decode a spill file into ``sink`` items."""
+    items = []
+    for payload in iter_chunks(data):
+        schema, rows = decode_rows(payload)
+        items.extend(sink.restore(dict(zip(schema, row))) for row in rows)
+    return items
+
+
+def iter_spill_files(
+    url: str,
+    sink_name: str,
+    s3_client: Any = None,
+    partitions: Optional[PartitionFilter] = None,
+) -> Iterator[SpillFile]:
+    """Spill files for ``sink_name`` under an ``s3://`` or ``file://`` URL, oldest first."""
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        for path in sorted(Path(parsed.path).glob(f"{sink_name}--*{SUFFIX}")):
+            if partitions is None or partitions(str(path)):
+                yield str(path), path.read_bytes, path.unlink
+        return
+    if parsed.scheme != "s3":
+        raise ValueError(f"Unsupported spill location '{url}'")
+
+    if s3_client is None:
+        import boto3
+
+        s3_client = boto3.client("s3")
+    bucket = parsed.netloc
+    prefix = parsed.path.lstrip("/")
+    prefix = f"{prefix.rstrip('/')}/{sink_name}/" if prefix.strip("/") else f"{sink_name}/"
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if partitions is not None and not partitions(key):
+                continue
+            yield (
+                f"s3://{bucket}/{key}",
+                lambda key=key: s3_client.get_object(Bucket=bucket, Key=key)["Body"].read(),
+                lambda key=key: s3_client.delete_object(Bucket=bucket, Key=key),
+            )
+
+
+def drain(
+    url: str,
+    sink_names: Optional[Sequence[str]] = None,
+    keep: bool = False,
+    dry_run: bool = False,
+    s3_client: Any = None,
+    partitions: Optional[PartitionFilter] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Replay every spill file under ``url``; return per-sink file/item counts."""
+    summary: Dict[str, Dict[str, Any]] = {}
+    for sink in build_sinks(sink_names or list(SINK_MODULES)):
+        stats = summary[sink.name] = {"files": 0, "items": 0, "error": None}
+        for description, read, delete in iter_spill_files(url, sink.name, s3_client, partitions):
+            items = read_items(sink, read())
+            if not dry_run:
+                try:
+                    sink.replay(items)
+                except Exception as exc:
+                    print(f"✗ Replay of {description} into '{sink.name}' failed: {exc}")
+                    stats["error"] = str(exc)
+                    break
+                if not keep:
+                    delete()
+            stats["files"] += 1
+            stats["items"] += len(items)
+            print(f"{'Read' if dry_run else 'Replayed'} {len(items)} items from {description}")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay spilled sink batches.")
+    parser.add_argument("url", help="spill location: s3://bucket/prefix/ or file:///tmp/spill")
+    parser.add_argument("--sink", action="append", choices=sorted(SINK_MODULES))
+    parser.add_argument("--keep", action="store_true", help="do not delete replayed files")
+    parser.add_argument("--dry-run", action="store_true", help="decode and count only")
+    parser.add_argument("--include", action="append", default=[], help="key prefix/segments")
+    parser.add_argument("--exclude", action="append", default=[], help="key prefix/segments")
+    args = parser.parse_args(argv)
+
+    partitions = PartitionFilter(args.include, args.exclude)
+    summary = drain(
+        args.url,
+        args.sink,
+        keep=args.keep,
+        dry_run=args.dry_run,
+        partitions=partitions if partitions else None,
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if any(stats["error"] for stats in summary.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Dashboard queries over ``api_logs`` that read the per-minute rollup when possible.
+
+``api_logs_route_1m`` is an AggregatingMergeTree fed by a materialized view
+(see ``ec2/click-house.sh``); it keeps request counts, bytes and latency
+quantile states per company, minute, applicationVersion, path and status. Ranges whose
+bounds fall on whole minutes are answered from it instead of the raw rows.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from log_pipeline.schema import QUANTILES, RAW_TABLE, ROLLUP_TABLE
+
+_Q = ", ".join(str(q) for q in QUANTILES)
+GROUP_BY = ("applicationVersion", "path", "status")
+
+
+def can_use_rollup(start: datetime, end: datetime) -> bool:
+    """The rollup answers exactly only for ranges on whole-minute bounds."""
+    return all(ts.second == 0 and ts.microsecond == 0 for ts in (start, end))
+
+
+def route_stats_query(
+    start: datetime,
+    end: datetime,
+    application_version: Optional[str] = None,
+    database: str = "sistema_logs",
+    use_rollup: Optional[bool] = None,
+    company_id: Optional[str] = None,
+    group_by: Sequence[str] = GROUP_BY,
+    limit: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    SQL and parameters behind ``route_stats``, for callers with their own
+    (e.g. async) client. ``group_by`` is a subset of ``GROUP_BY``.
+    """
+    if use_rollup is None:
+        use_rollup = can_use_rollup(start, end)
+    unknown = set(group_by) - set(GROUP_BY)
+    if not group_by or unknown:
+        raise ValueError(f"group_by must be a subset of {', '.join(GROUP_BY)}")
+
+    params: Dict[str, Any] = {"start": start, "end": end}
+    if use_rollup:
+        time_col, time_type = "minute", "DateTime"
+        source = f"{database}.{ROLLUP_TABLE}"
+        aggregates = f"""
+            countMerge(requests) AS requests,
+            countMergeIf(requests, status >= 400) AS errors,
+            sum(bytes) AS bytes,
+            quantilesMerge({_Q})(responseLatency) AS responseLatency,
+            quantilesMerge({_Q})(integrationLatency) AS integrationLatency"""
+    else:
+        time_col, time_type = "requestTime", "DateTime64(3)"
+        source = f"{database}.{RAW_TABLE}"
+        aggregates = f"""
+            count() AS requests,
+            countIf(status >= 400) AS errors,
+            sum(toUInt64(bytes)) AS bytes,
+            quantiles({_Q})(responseLatency) AS responseLatency,
+            quantiles({_Q})(integrationLatency) AS integrationLatency"""
+
+    where = [
+        f"{time_col} >= {{start:{time_type}}}",
+        f"{time_col} < {{end:{time_type}}}",
+    ]
+    if company_id is not None:
+        where.insert(0, "idCompany = {company_id:String}")
+        params["company_id"] = company_id
+    if application_version:
+        where.append("applicationVersion = {application_version:String}")
+        params["application_version"] = application_version
+
+    if limit is not None:
+        params["limit"] = limit
+    columns = ", ".join(group_by)
+    sql = f"""
+        SELECT {columns},{aggregates}
+        FROM {source}
+        WHERE {' AND '.join(where)}
+        GROUP BY {columns}
+        ORDER BY requests DESC
+        {"LIMIT {limit:UInt32}" if limit is not None else ""}
+    """
+    return sql, params
+
+
+def route_stats(
+    client: Any,
+    start: datetime,
+    end: datetime,
+    application_version: Optional[str] = None,
+    database: str = "sistema_logs",
+    use_rollup: Optional[bool] = None,
+    company_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Requests, errors (status >= 400), bytes and latency quantiles per
+    applicationVersion/path/status for ``[start, end)``, busiest first.
+
+    ``use_rollup`` defaults to whether the range is minute-aligned; pass
+    False to force a scan of the raw rows.
+    """
+    sql, params = route_stats_query(
+        start, end, application_version, database, use_rollup, company_id
+    )
+    return list(client.query(sql, parameters=params).named_results())
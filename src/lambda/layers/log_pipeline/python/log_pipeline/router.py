@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from log_pipeline.events import LogRecord
+from log_pipeline.policy import RoutingPolicy
+from log_pipeline.sinks import Sink
+
+
+class SinkRouter:
+    """
+    Fans each event out to every sink, isolating failures per sink.
+
+    A sink that raises is marked failed and receives no further events in this
+    invocation; the remaining sinks keep batching and delivering normally.
+
+    Per-sink resume positions (message index within the current object) let a
+    retried object skip events each sink already delivered.
+
+    With a routing policy (log_pipeline.policy) each sink only gets the events
+    the policy sends it; the others count as sampled out.
+    """
+
+    def __init__(self, sinks: Iterable[Sink], policy: Optional[RoutingPolicy] = None) -> None:
+        self.sinks: List[Sink] = list(sinks)
+        self.errors: Dict[str, str] = {}
+        self._positions: Dict[str, int] = {}
+        self.policy = policy
+        self._route = policy.compile([s.name for s in self.sinks]) if policy else None
+        self._sampled_out = [0] * len(self.sinks)
+
+    def _fail(self, sink: Sink, exc: Exception) -> None:
+        print(f"✗ Sink '{sink.name}' failed: {exc}")
+        self.errors[sink.name] = str(exc)
+        sink.discard()
+
+    def start(self, positions: Optional[Dict[str, int]] = None) -> None:
+        """Begin a new object, resuming each sink at its recorded position."""
+        self._positions = dict(positions or {})
+
+    def dispatch(self, event: LogRecord, index: int = 0) -> None:
+        routes = self._route(event) if self._route is not None else None
+        for n, sink in enumerate(self.sinks):
+            if index < self._positions.get(sink.name, 0):
+                continue
+            if routes is not None and not routes[n]:
+                self._sampled_out[n] += 1
+                continue
+            if sink.name in self.errors:
+                sink.failed += 1
+                continue
+            try:
+                sink.add(event)
+            except Exception as exc:
+                self._fail(sink, exc)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            if sink.name in self.errors:
+                continue
+            try:
+                sink.flush()
+            except Exception as exc:
+                self._fail(sink, exc)
+
+    def checkpoint(self, next_index: int) -> Dict[str, int]:
+        """
+        Flush every sink and return the per-sink resume positions.
+
+        Healthy sinks have delivered everything before ``next_index``; failed
+        sinks keep the position they had reached before failing.
+        """
+        self.flush()
+        for sink in self.sinks:
+            if sink.name not in self.errors:
+                self._positions[sink.name] = max(
+                    self._positions.get(sink.name, 0), next_index
+                )
+        return dict(self._positions)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as exc:
+                print(f"Warning: could not close sink '{sink.name}': {exc}")
+
+    @property
+    def fields(self) -> Optional[Tuple[str, ...]]:
+        """Union of the message fields the sinks (and policy) read; None if any needs all."""
+        names = set(self.policy.fields if self.policy else ())
+        for sink in self.sinks:
+            if sink.fields is None:
+                return None
+            names.update(sink.fields)
+        return tuple(sorted(names))
+
+    @property
+    def critical_failures(self) -> List[str]:
+        return [s.name for s in self.sinks if s.critical and s.name in self.errors]
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            sink.name: {
+                "delivered": sink.delivered,
+                "failed": sink.failed,
+                "spilled": sink.spilled,
+                **({"sampled_out": sampled_out} if self._route is not None else {}),
+                "error": self.errors.get(sink.name),
+                **sink.health.snapshot(),
+            }
+            for sink, sampled_out in zip(self.sinks, self._sampled_out)
+        }
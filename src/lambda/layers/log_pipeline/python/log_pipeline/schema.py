@@ -0,0 +1,93 @@
+"""
+ClickHouse DDL for ``api_logs`` and its rollups (mirrors ec2/click-house.sh).
+
+Columns use compact types: IPs as IPv6 (IPv4 stored v4-mapped), user/org IDs
+as UUID, repetitive strings as LowCardinality, and delta/T64 codecs plus ZSTD
+on the time and numeric columns. The ua*/geo* columns come from the
+enrichment stage (``log_pipeline.enrich``); ``ADD COLUMN IF NOT EXISTS``
+brings tables created before it up to date.
+"""
+from typing import List
+
+RAW_TABLE = "api_logs"
+ROLLUP_TABLE = "api_logs_route_1m"
+QUANTILES = (0.5, 0.9, 0.99)
+
+_Q = ", ".join(str(q) for q in QUANTILES)
+
+
+def schema_statements(database: str = "sistema_logs") -> List[str]:
+    """DDL for the raw table, the per-minute rollup and its materialized view."""
+    return [
+        f"CREATE DATABASE IF NOT EXISTS {database}",
+        f"""
+        CREATE TABLE IF NOT EXISTS {database}.{RAW_TABLE} (
+            requestTime DateTime64(3, 'UTC') CODEC(Delta, ZSTD(1)),
+            requestId String CODEC(ZSTD(1)),
+            httpMethod LowCardinality(String),
+            path LowCardinality(String),
+            routeKey LowCardinality(String),
+            status UInt16,
+            bytes UInt32 CODEC(T64, ZSTD(1)),
+            responseLatency UInt32 CODEC(T64, ZSTD(1)),
+            integrationLatency UInt32 CODEC(T64, ZSTD(1)),
+            functionResponseStatus UInt16,
+            email String CODEC(ZSTD(1)),
+            userId UUID,
+            orgId UUID,
+            idCompany String,
+            ip IPv6,
+            host LowCardinality(String),
+            userAgent LowCardinality(String),
+            dataSource LowCardinality(String),
+            applicationVersion LowCardinality(String),
+            referer String CODEC(ZSTD(1)),
+            uaBrowser LowCardinality(String),
+            uaOS LowCardinality(String),
+            uaDevice LowCardinality(String),
+            geoCountry LowCardinality(String),
+            geoAsn UInt32 CODEC(T64, ZSTD(1))
+        ) ENGINE = MergeTree()
+        PARTITION BY toYYYYMM(requestTime)
+        ORDER BY (idCompany, requestTime, status)
+        """,
+        f"""
+        ALTER TABLE {database}.{RAW_TABLE}
+            ADD COLUMN IF NOT EXISTS uaBrowser LowCardinality(String),
+            ADD COLUMN IF NOT EXISTS uaOS LowCardinality(String),
+            ADD COLUMN IF NOT EXISTS uaDevice LowCardinality(String),
+            ADD COLUMN IF NOT EXISTS geoCountry LowCardinality(String),
+            ADD COLUMN IF NOT EXISTS geoAsn UInt32 CODEC(T64, ZSTD(1))
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {database}.{ROLLUP_TABLE} (
+            idCompany String,
+            minute DateTime('UTC') CODEC(Delta, ZSTD(1)),
+            applicationVersion LowCardinality(String),
+            path LowCardinality(String),
+            status UInt16,
+            requests AggregateFunction(count),
+            bytes SimpleAggregateFunction(sum, UInt64),
+            responseLatency AggregateFunction(quantiles({_Q}), UInt32),
+            integrationLatency AggregateFunction(quantiles({_Q}), UInt32)
+        ) ENGINE = AggregatingMergeTree()
+        PARTITION BY toYYYYMM(minute)
+        ORDER BY (idCompany, minute, applicationVersion, path, status)
+        """,
+        f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {database}.{ROLLUP_TABLE}_mv
+        TO {database}.{ROLLUP_TABLE} AS
+        SELECT
+            idCompany,
+            toStartOfMinute(requestTime) AS minute,
+            applicationVersion,
+            path,
+            status,
+            countState() AS requests,
+            sum(toUInt64(bytes)) AS bytes,
+            quantilesState({_Q})(responseLatency) AS responseLatency,
+            quantilesState({_Q})(integrationLatency) AS integrationLatency
+        FROM {database}.{RAW_TABLE}
+        GROUP BY idCompany, minute, applicationVersion, path, status
+        """,
+    ]
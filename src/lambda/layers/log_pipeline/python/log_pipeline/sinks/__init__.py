@@ -0,0 +1,285 @@
+import importlib
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from log_pipeline.events import LogRecord
+from log_pipeline.health import health_for
+
+# Sink name -> module exposing ``from_env() -> Optional[Sink]``. Modules are
+# imported on demand so a function only loads the client libraries it uses.
+SINK_MODULES = {
+    "clickhouse": "log_pipeline.sinks.clickhouse",
+    "loki": "log_pipeline.sinks.loki",
+    "opensearch": "log_pipeline.sinks.opensearch",
+    "summary": "log_pipeline.sinks.summary",
+}
+
+
+@lru_cache(maxsize=None)
+def http_session():
+    """Keep-alive ``requests`` session shared by HTTP sinks across warm invocations."""
+    import requests
+
+    return requests.Session()
+
+
+class SinkDeliveryError(Exception):
+    """Raised when a sink rejects a batch."""
+
+
+class HttpRequest(NamedTuple):
+    """A prepared HTTP delivery, sendable by ``requests`` or the async engine."""
+
+    url: str
+    body: bytes
+    headers: Dict[str, str]
+    timeout: float
+    method: str = "POST"
+
+
+class Sink:
+    """
+    Buffers converted events and delivers them in batches of ``batch_size``.
+
+    Full batches queue up to the sink's current concurrency limit and are
+    then sent in parallel (see ``log_pipeline.health``). While the sink's
+    circuit is open batches are not sent at all: they go to ``spill`` when
+    one is attached, otherwise delivery fails fast.
+
+    HTTP sinks split ``deliver`` into ``request`` and ``response``; with an
+    ``engine`` (``log_pipeline.aio``) their batches are sent as soon as they
+    fill, up to the concurrency limit in flight, while events keep flowing.
+    """
+
+    name = "sink"
+    # A critical sink failing makes the invocation fail so S3 retries it.
+    critical = False
+    # Message fields ``convert`` reads; None means it needs the full message.
+    fields: Optional[Tuple[str, ...]] = None
+    # Columns stored for spilled items (see ``spill_row`` / ``restore``).
+    spill_schema: Tuple[str, ...] = ()
+    # Implements ``request`` / ``response`` and can use the async engine.
+    http = False
+
+    def __init__(
+        self, batch_size: int, max_concurrency: int = 1, latency_target_ms: float = 0.0
+    ) -> None:
+        self.batch_size = max(1, batch_size)
+        self.delivered = 0
+        self.failed = 0
+        self.spilled = 0
+        self.spill: Optional[Any] = None  # log_pipeline.spill.Spill
+        self.engine: Optional[Any] = None  # log_pipeline.aio.AsyncEngine
+        self.health = health_for(self.name, max_concurrency, latency_target_ms)
+        self._buffer: List[Any] = []
+        self._pending: List[List[Any]] = []
+        self._inflight: List[Tuple[List[Any], Any]] = []
+
+    def add(self, event: LogRecord) -> None:
+        item = self.convert(event)
+        if item is None:
+            return
+        self._buffer.append(item)
+        if len(self._buffer) >= self.batch_size:
+            self._pending.append(self._buffer)
+            self._buffer = []
+            if self.engine is not None or len(self._pending) >= self.health.concurrency:
+                self._deliver_pending()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._pending.append(self._buffer)
+            self._buffer = []
+        self._deliver_pending()
+        if self._inflight:
+            error = None
+            while self._inflight:
+                error = self._collect(block=True) or error
+            if error is not None:
+                raise error
+
+    def _deliver_pending(self) -> None:
+        if self.engine is not None:
+            self._submit_pending()
+            return
+        batches, self._pending = self._pending, []
+        error: Optional[Exception] = None
+        while batches:
+            if not self.health.allow():
+                exc = SinkDeliveryError(f"Circuit open for sink '{self.name}'")
+                for batch in batches:
+                    error = self._undelivered(batch, exc) or error
+                break
+            width = self.health.concurrency
+            wave, batches = batches[:width], batches[width:]
+            for batch, (result, elapsed_ms) in zip(wave, self._send(wave)):
+                error = self._apply(batch, result, elapsed_ms) or error
+        if error is not None:
+            raise error
+
+    def _apply(self, batch: List[Any], result: Any, elapsed_ms: float) -> Optional[Exception]:
+        """Account for one delivery result; return the error to raise, if any."""
+        self.health.record(not isinstance(result, Exception), elapsed_ms)
+        if isinstance(result, Exception):
+            return self._undelivered(batch, result)
+        if isinstance(result, list):
+            # Items the sink rejected individually; keep them for replay
+            self.delivered += len(batch) - len(result)
+            if result:
+                # Without a spill (e.g. during replay) the rejection must surface
+                return self._undelivered(
+                    result, SinkDeliveryError(f"{len(result)} items rejected")
+                )
+        else:
+            self.delivered += len(batch) - result
+            self.failed += result
+        return None
+
+    def _submit_pending(self) -> None:
+        """Hand pending batches to the engine, keeping at most the limit in flight."""
+        batches, self._pending = self._pending, []
+        error: Optional[Exception] = None
+        for batch in batches:
+            while len(self._inflight) >= self.health.concurrency:
+                error = self._collect(block=True) or error
+            if not self.health.allow():
+                exc = SinkDeliveryError(f"Circuit open for sink '{self.name}'")
+                error = self._undelivered(batch, exc) or error
+                continue
+            try:
+                request = self.request(batch)
+            except Exception as exc:
+                error = self._apply(batch, exc, 0.0) or error
+                continue
+            self._inflight.append((batch, self.engine.send(request)))
+        error = self._collect(block=False) or error
+        if error is not None:
+            raise error
+
+    def _collect(self, block: bool) -> Optional[Exception]:
+        """Apply finished deliveries (waiting for one first when ``block``)."""
+        if block and self._inflight:
+            from concurrent.futures import FIRST_COMPLETED, wait
+
+            wait([future for _, future in self._inflight], return_when=FIRST_COMPLETED)
+        error: Optional[Exception] = None
+        running = []
+        for batch, future in self._inflight:
+            if not future.done():
+                running.append((batch, future))
+                continue
+            response, elapsed_ms = future.result()
+            result: Any = response
+            if not isinstance(response, Exception):
+                try:
+                    result = self.response(batch, *response) or 0
+                except Exception as exc:
+                    result = exc
+            error = self._apply(batch, result, elapsed_ms) or error
+        self._inflight = running
+        return error
+
+    def _send(self, wave: List[List[Any]]) -> List[Tuple[Any, float]]:
+        """Deliver ``wave`` in parallel; return (rejected or exception, ms) per batch."""
+        if len(wave) == 1:
+            return [self._send_one(wave[0])]
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+            return list(pool.map(self._send_one, wave))
+
+    def _send_one(self, batch: List[Any]) -> Tuple[Any, float]:
+        started = time.monotonic()
+        try:
+            result: Any = self.deliver(batch) or 0
+        except Exception as exc:
+            result = exc
+        return result, (time.monotonic() - started) * 1000
+
+    def _undelivered(self, batch: List[Any], exc: Exception) -> Optional[Exception]:
+        """Spill ``batch``; return ``exc`` if it could not be kept."""
+        if self.spill is not None:
+            try:
+                rows = [self.spill_row(item) for item in batch]
+                location = self.spill.write(self.name, self.spill_schema, rows)
+            except Exception as spill_exc:
+                print(f"Could not spill {len(batch)} items for '{self.name}': {spill_exc}")
+            else:
+                print(f"Spilled {len(batch)} items for '{self.name}' to {location} ({exc})")
+                self.spilled += len(batch)
+                return None
+        self.failed += len(batch)
+        return exc
+
+    def replay(self, items: List[Any]) -> None:
+        """Deliver previously spilled ``items`` in batches of ``batch_size``."""
+        for start in range(0, len(items), self.batch_size):
+            self._pending.append(items[start : start + self.batch_size])
+        self.flush()
+
+    def discard(self) -> None:
+        """Drop buffered items after a failure, counting them as failed."""
+        for batch, future in self._inflight:
+            future.cancel()
+            self.failed += len(batch)
+        self.failed += len(self._buffer) + sum(len(batch) for batch in self._pending)
+        self._buffer = []
+        self._pending = []
+        self._inflight = []
+
+    def close(self) -> None:
+        pass
+
+    def convert(self, event: LogRecord) -> Optional[Any]:
+        """Return the sink-specific item for ``event`` or None to skip it."""
+        raise NotImplementedError
+
+    def deliver(self, batch: List[Any]) -> Union[None, int, List[Any]]:
+        """
+        Send ``batch``; return the number of items the sink rejected, or the
+        rejected items themselves so they can be spilled.
+
+        HTTP sinks only implement ``request`` and ``response``.
+        """
+        if not self.http:
+            raise NotImplementedError
+        request = self.request(batch)
+        response = http_session().request(
+            request.method,
+            request.url,
+            data=request.body,
+            headers=request.headers,
+            timeout=request.timeout,
+        )
+        return self.response(batch, response.status_code, response.text)
+
+    def request(self, batch: List[Any]) -> HttpRequest:
+        """HTTP request delivering ``batch`` (HTTP sinks)."""
+        raise NotImplementedError
+
+    def response(self, batch: List[Any], status: int, text: str) -> Union[None, int, List[Any]]:
+        """Interpret the HTTP response to ``request(batch)``, like ``deliver``."""
+        raise NotImplementedError
+
+    def spill_row(self, item: Any) -> Tuple[Any, ...]:
+        """Values of ``item`` in ``spill_schema`` order (items with ``get`` by default)."""
+        return tuple(item.get(name) for name in self.spill_schema)
+
+    def restore(self, values: Dict[str, Any]) -> Any:
+        """Rebuild an item from a spilled row, given as ``{column: value}``."""
+        return values
+
+
+def build_sinks(names: Sequence[str]) -> List[Sink]:
+    """Instantiate the named sinks, skipping those without configuration."""
+    sinks: List[Sink] = []
+    for name in names:
+        if name not in SINK_MODULES:
+            raise ValueError(f"Unknown sink '{name}'")
+        sink = importlib.import_module(SINK_MODULES[name]).from_env()
+        if sink is None:
+            print(f"Sink '{name}' not configured; skipping")
+            continue
+        sinks.append(sink)
+    return sinks
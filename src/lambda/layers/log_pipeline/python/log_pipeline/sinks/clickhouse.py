@@ -0,0 +1,238 @@
+import importlib.util
+import ipaddress
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from log_pipeline.enrich import enricher_from_env
+from log_pipeline.events import FIELD_INDEX, LogRecord, normalize
+from log_pipeline.projection import full_parse
+from log_pipeline.sinks import Sink
+
+_NIL_UUID = uuid.UUID(int=0)
+_UNSPECIFIED_IP = ipaddress.IPv6Address("::")
+
+
+@lru_cache(maxsize=4096)
+def _cached_dt(val: str) -> Optional[datetime]:
+    # Request times repeat within a second, so parsed values are cached
+    try:
+        return datetime.strptime(val, "%d/%b/%Y:%H:%M:%S %z").astimezone(timezone.utc)
+    except Exception:
+        return None
+
+
+def _parse_dt(val: str) -> datetime:
+    return _cached_dt(val) or datetime.now(timezone.utc)
+
+
+def _int(val, default=0):
+    try:
+        return int(val)
+    except Exception:
+        return default
+
+
+@lru_cache(maxsize=16384)
+def _ip(val: str) -> ipaddress.IPv6Address:
+    """IPv6 column value; IPv4 addresses are stored v4-mapped."""
+    try:
+        addr = ipaddress.ip_address(val)
+    except ValueError:
+        return _UNSPECIFIED_IP
+    if addr.version == 4:
+        return ipaddress.IPv6Address(f"::ffff:{addr}")
+    return addr
+
+
+@lru_cache(maxsize=16384)
+def _uuid(val: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(val)
+    except (ValueError, AttributeError, TypeError):
+        return _NIL_UUID
+
+
+def _str(val) -> str:
+    if isinstance(val, str):
+        return val
+    return "" if val is None else str(val)
+
+
+# (column, converter) in table order; converters take the raw message value
+# (None when the message lacks it)
+COLUMN_CONVERTERS: List[Tuple[str, Callable[[Any], Any]]] = [
+    ("requestTime", _parse_dt),
+    ("requestId", _str),
+    ("httpMethod", _str),
+    ("path", _str),
+    ("routeKey", _str),
+    ("status", _int),
+    ("bytes", _int),
+    ("responseLatency", _int),
+    ("integrationLatency", _int),
+    ("functionResponseStatus", _int),
+    ("email", _str),
+    ("userId", _uuid),
+    ("orgId", _uuid),
+    ("idCompany", _str),
+    ("ip", _ip),
+    ("host", _str),
+    ("userAgent", _str),
+    ("dataSource", _str),
+    ("applicationVersion", _str),
+    ("referer", _str),
+    # Added by the enrichment stage (log_pipeline.enrich); empty/0 without it
+    ("uaBrowser", _str),
+    ("uaOS", _str),
+    ("uaDevice", _str),
+    ("geoCountry", _str),
+    ("geoAsn", _int),
+]
+COLUMNS = [name for name, _ in COLUMN_CONVERTERS]
+
+
+_COLUMN_GETTERS = [(itemgetter(FIELD_INDEX[name]), convert) for name, convert in COLUMN_CONVERTERS]
+
+
+def columns_from_records(records: List[LogRecord]) -> List[List[Any]]:
+    """Convert records into typed column lists, one column at a time."""
+    return [list(map(convert, map(get, records))) for get, convert in _COLUMN_GETTERS]
+
+
+@lru_cache(maxsize=4)
+def _get_client(**connect_args):
+    """Client per connection settings, kept open across warm invocations."""
+    import clickhouse_connect
+
+    return clickhouse_connect.get_client(**connect_args)
+
+
+class ClickHouseSink(Sink):
+    """
+    Bulk-inserts access-log rows into ``sistema_logs.api_logs``.
+
+    Batches hold the ``LogRecord`` items; they are converted column-wise to
+    the table's compact types (IPv6, UUID, ints, DateTime64) and inserted in
+    column-oriented form.
+
+    With ``arrow=True`` batches hold the raw message lines instead and are
+    converted by ``log_pipeline.sinks.clickhouse_arrow`` (pyarrow) and sent
+    with ``insert_arrow``; a batch Arrow cannot read goes the row way.
+    """
+
+    name = "clickhouse"
+    critical = True
+    fields = tuple(COLUMNS)
+    spill_schema = tuple(COLUMNS)
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        secure: bool,
+        timeout: float,
+        database: str = "sistema_logs",
+        table: str = "api_logs",
+        batch_size: int = 100_000,
+        max_concurrency: int = 1,
+        arrow: bool = False,
+        enricher: Optional[Any] = None,
+    ) -> None:
+        # Few large inserts suit MergeTree best; parallel inserts are opt-in
+        super().__init__(batch_size, max_concurrency)
+        self.database = database
+        self.table = table
+        self.arrow = arrow
+        # Arrow batches are raw lines: enriched columns are derived per batch
+        self.enricher = enricher
+        if arrow:
+            # Messages are parsed by pyarrow.json, not in Python
+            self.fields = ()
+            self.spill_schema = ("message",)
+        self._connect_args = dict(
+            host=host,
+            port=port,
+            username=user,
+            password=password,
+            secure=secure,
+            connect_timeout=timeout,
+        )
+
+    @property
+    def client(self):
+        # Connect on first insert so objects without rows never open a session
+        return _get_client(**self._connect_args)
+
+    def convert(self, event: LogRecord) -> Union[None, str, LogRecord]:
+        if self.arrow:
+            return event.message if event.message.lstrip().startswith("{") else None
+        return event if event.parsed else None
+
+    def deliver(self, batch: List[Any]) -> None:
+        if self.arrow:
+            from log_pipeline.sinks.clickhouse_arrow import arrow_table
+
+            try:
+                table = arrow_table(batch, self.enricher)
+            except ValueError as exc:
+                print(f"Arrow could not read batch ({exc}); inserting it row-wise")
+                parse = full_parse if self.enricher is None else self.enricher.wrap(full_parse)
+                batch = [normalize(fields) for fields in map(parse, batch) if fields]
+            else:
+                self.client.insert_arrow(self.table, table, database=self.database or None)
+                print(f"Inserted {len(batch)} rows into {self.database}.{self.table} (arrow)")
+                return
+
+        self.client.insert(
+            table=self.table,
+            data=columns_from_records(batch),
+            column_names=COLUMNS,
+            database=self.database or None,
+            column_oriented=True,
+        )
+        print(f"Inserted {len(batch)} rows into {self.database}.{self.table}")
+
+    def spill_row(self, item: Any) -> Tuple[Any, ...]:
+        return (item,) if self.arrow else super().spill_row(item)
+
+    def restore(self, values: Dict[str, Any]) -> Any:
+        # Spills from either mode replay into either mode
+        if "message" in values:
+            return values["message"] if self.arrow else normalize(full_parse(values["message"]))
+        return json.dumps(values) if self.arrow else normalize(values)
+
+
+def from_env() -> Optional[ClickHouseSink]:
+    host = os.getenv("CLICKHOUSE_HOST", "")
+    if not host:
+        return None
+    return ClickHouseSink(
+        host=host,
+        port=int(os.getenv("CLICKHOUSE_PORT", "8123")),
+        user=os.getenv("CLICKHOUSE_USER", ""),
+        password=os.getenv("CLICKHOUSE_PASSWORD", ""),
+        secure=os.getenv("CLICKHOUSE_SECURE", "false").lower() == "true",
+        timeout=float(os.getenv("CLICKHOUSE_TIMEOUT", "10")),
+        database=os.getenv("CLICKHOUSE_DATABASE") or "sistema_logs",
+        table=os.getenv("CLICKHOUSE_TABLE") or "api_logs",
+        batch_size=int(os.getenv("CLICKHOUSE_BATCH_SIZE", "100000")),
+        max_concurrency=int(os.getenv("CLICKHOUSE_MAX_CONCURRENCY", "1")),
+        arrow=_arrow_enabled(),
+        enricher=enricher_from_env(),
+    )
+
+
+def _arrow_enabled() -> bool:
+    if os.getenv("CLICKHOUSE_ARROW", "false").lower() != "true":
+        return False
+    if importlib.util.find_spec("pyarrow") is None:
+        print("CLICKHOUSE_ARROW is set but pyarrow is not installed; using row inserts")
+        return False
+    return True
@@ -0,0 +1,347 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from log_pipeline.events import LogRecord
+from log_pipeline.health import health_for
+from log_pipeline.lines import LineEncoder, line_encoder_from_env
+from log_pipeline.sinks import HttpRequest, Sink, SinkDeliveryError
+
+# Loki's tenant when auth_enabled is off
+DEFAULT_TENANT = "fake"
+# X-Scope-OrgID may not contain "|" (multi-tenant queries) or control chars
+_TENANT_UNSAFE = re.compile(r"[^A-Za-z0-9!\-_.*'()]")
+
+# (logGroup, logStream, *(label, value) pairs)
+StreamKey = Tuple[Any, ...]
+LokiItem = Tuple[StreamKey, List[Any]]
+
+
+class LokiSink(Sink):
+    """
+    Pushes access-log lines to Loki, one stream per logGroup/logStream and
+    values of the ``labels`` message fields (low-cardinality ones such as the
+    enriched ``uaDevice`` / ``geoCountry``; empty values are left out).
+
+    Lines are pushed raw unless an ``encoder`` rewrites them (see
+    ``log_pipeline.lines``); its structured metadata goes in the third
+    element of each value. With a ``tenant`` every push carries it as
+    ``X-Scope-OrgID`` and the sink gets its own circuit and concurrency.
+    """
+
+    name = "loki"
+    # Raw lines need no parsing and labels come from the CloudWatch envelope
+    fields = ()
+    spill_schema = (
+        "logGroup",
+        "logStream",
+        "timestamp",
+        "line",
+        "metadata",
+        "tenant",
+        "labels",
+    )
+    http = True
+
+    def __init__(
+        self,
+        endpoint: str,
+        batch_size: int = 1000,
+        timeout: float = 30,
+        max_concurrency: int = 4,
+        latency_target_ms: float = 2000,
+        encoder: Optional[LineEncoder] = None,
+        tenant: Optional[str] = None,
+        labels: Sequence[str] = (),
+    ) -> None:
+        super().__init__(batch_size, max_concurrency, latency_target_ms)
+        self.url = f"{endpoint.rstrip('/')}/loki/api/v1/push"
+        self.timeout = timeout
+        self.tenant = tenant
+        if tenant is not None:
+            # One tenant hitting its ingestion limits must not trip the others
+            self.health = health_for(f"loki/{tenant}", max_concurrency, latency_target_ms)
+        self.labels = tuple(labels)
+        self.encoder = encoder if encoder is not None and not encoder.raw else None
+        if self.encoder is not None:
+            self.fields = None
+            if self.labels:
+                # Label values are already on the stream; the encoder may be
+                # shared (per-tenant sinks), so this sink gets its own copy
+                self.encoder = self.encoder.omitting(self.labels)
+        elif self.labels:
+            self.fields = self.labels
+
+    def convert(self, event: LogRecord) -> Optional[LokiItem]:
+        # Only CloudWatch events carry the timestamp Loki requires
+        if event.timestamp is None:
+            return None
+        ts_nano = str(event.timestamp * 1_000_000)
+        key: StreamKey = (event.log_group, event.log_stream)
+        if self.labels:
+            get = event.get
+            key += tuple((name, str(get(name))) for name in self.labels if get(name))
+        if self.encoder is None:
+            return key, [ts_nano, event.message]
+        line, metadata = self.encoder.encode_record(event)
+        value: List[Any] = [ts_nano, line, metadata] if metadata else [ts_nano, line]
+        return key, value
+
+    def spill_row(self, item: LokiItem) -> Tuple[Any, ...]:
+        key, value = item
+        metadata = json.dumps(value[2]) if len(value) > 2 else None
+        labels = json.dumps(dict(key[2:])) if len(key) > 2 else None
+        return key[0], key[1], value[0], value[1], metadata, self.tenant, labels
+
+    def restore(self, values: Dict[str, Any]) -> LokiItem:
+        return _restore_item(values)
+
+    def request(self, batch: List[LokiItem]) -> HttpRequest:
+        streams: Dict[StreamKey, List[List[Any]]] = {}
+        for stream_key, value in batch:
+            streams.setdefault(stream_key, []).append(value)
+
+        payload: Dict[str, Any] = {
+            "streams": [
+                {
+                    "stream": {
+                        "job": "s3-processor",
+                        "logGroup": key[0] or "unknown",
+                        "logStream": key[1] or "unknown",
+                        "source": "cloudwatch-logs",
+                        **dict(key[2:]),
+                    },
+                    "values": values,
+                }
+                for key, values in streams.items()
+            ]
+        }
+        headers = {"Content-Type": "application/json"}
+        if self.tenant is not None:
+            headers["X-Scope-OrgID"] = self.tenant
+        return HttpRequest(
+            self.url,
+            json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+            headers,
+            self.timeout,
+        )
+
+    def response(self, batch: List[Any], status: int, text: str) -> None:
+        if status != 204:
+            raise SinkDeliveryError(f"Loki push failed: Status {status}, Response: {text[:500]}")
+        if self.tenant is None:
+            print(f"Sent {len(batch)} lines to Loki")
+        else:
+            print(f"Sent {len(batch)} lines to Loki tenant {self.tenant}")
+
+
+class TenantResolver:
+    """
+    Maps an event to its Loki tenant (``X-Scope-OrgID``).
+
+    The tenant is the value of ``field`` (e.g. ``applicationVersion``; one of
+    ``log_pipeline.events.RECORD_FIELDS``), or its entry in ``mapping`` when
+    one is given (e.g. ``idCompany`` -> tenant).
+    Events without the field, with a value outside ``mapping`` or beyond the
+    first ``max_tenants`` distinct tenants go to ``default``.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        mapping: Optional[Dict[str, str]] = None,
+        default: str = DEFAULT_TENANT,
+        max_tenants: int = 50,
+    ) -> None:
+        self.field = field
+        self.mapping = {str(k): v for k, v in mapping.items()} if mapping else None
+        self.default = default
+        self.max_tenants = max(1, max_tenants)
+        # Field value -> tenant for the tenants admitted so far
+        self._known: Dict[str, str] = {}
+
+    def __call__(self, event: LogRecord) -> str:
+        value = event.get(self.field)
+        if value is None or value == "-":
+            return self.default
+        key = str(value)
+        if self.mapping is not None:
+            return self.mapping.get(key, self.default)
+        tenant = self._known.get(key)
+        if tenant is None:
+            if len(self._known) >= self.max_tenants:
+                return self.default
+            tenant = self._known[key] = _TENANT_UNSAFE.sub("_", key)[:150] or self.default
+        return tenant
+
+
+def _restore_item(values: Dict[str, Any]) -> LokiItem:
+    value: List[Any] = [values["timestamp"], values["line"]]
+    # Older chunks have no metadata/labels columns
+    if values.get("metadata"):
+        value.append(json.loads(values["metadata"]))
+    key: StreamKey = (values["logGroup"], values["logStream"])
+    if values.get("labels"):
+        key += tuple(json.loads(values["labels"]).items())
+    return key, value
+
+
+def _tenant_total(counter: str) -> property:
+    """Sum of a per-tenant counter; writes go to the router-side remainder."""
+
+    def get(self: "MultiTenantLokiSink") -> int:
+        return self._own[counter] + sum(getattr(s, counter) for s in self.tenants.values())
+
+    def set(self: "MultiTenantLokiSink", value: int) -> None:
+        self._own[counter] += value - get(self)
+
+    return property(get, set)
+
+
+class _TenantsHealth:
+    """Per-tenant health snapshot for ``SinkRouter.summary``."""
+
+    def __init__(self, sink: "MultiTenantLokiSink") -> None:
+        self.sink = sink
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tenants": {
+                tenant: {"delivered": s.delivered, "failed": s.failed, **s.health.snapshot()}
+                for tenant, s in self.sink.tenants.items()
+            }
+        }
+
+
+class MultiTenantLokiSink(Sink):
+    """
+    Routes events to one ``LokiSink`` per tenant (see ``TenantResolver``).
+
+    Each tenant has its own buffer, batch size, concurrency and circuit, so
+    a tenant throttled by its ingestion limits only slows (or spills) its own
+    batches. ``limits`` overrides ``batch_size`` / ``max_concurrency`` per
+    tenant. Spilled rows record the tenant and replay to it.
+    """
+
+    name = "loki"
+    spill_schema = LokiSink.spill_schema
+    http = True
+
+    delivered = _tenant_total("delivered")
+    failed = _tenant_total("failed")
+    spilled = _tenant_total("spilled")
+
+    def __init__(
+        self,
+        endpoint: str,
+        resolver: TenantResolver,
+        batch_size: int = 1000,
+        timeout: float = 30,
+        max_concurrency: int = 4,
+        latency_target_ms: float = 2000,
+        encoder: Optional[LineEncoder] = None,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        labels: Sequence[str] = (),
+    ) -> None:
+        self._own = {"delivered": 0, "failed": 0, "spilled": 0}
+        self.tenants: Dict[str, LokiSink] = {}
+        super().__init__(batch_size, max_concurrency, latency_target_ms)
+        self.health = _TenantsHealth(self)
+        self.endpoint = endpoint
+        self.resolver = resolver
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.latency_target_ms = latency_target_ms
+        self.encoder = encoder
+        self.limits = limits or {}
+        self.labels = tuple(labels)
+        # Encoded lines need the full message, raw ones only the tenant field
+        # and labels
+        raw = encoder is None or encoder.raw
+        self.fields = (resolver.field, *self.labels) if raw else None
+
+    def tenant(self, name: str) -> LokiSink:
+        sink = self.tenants.get(name)
+        if sink is None:
+            limits = self.limits.get(name, {})
+            sink = LokiSink(
+                self.endpoint,
+                batch_size=limits.get("batch_size", self.batch_size),
+                timeout=self.timeout,
+                max_concurrency=limits.get("max_concurrency", self.max_concurrency),
+                latency_target_ms=self.latency_target_ms,
+                encoder=self.encoder,
+                tenant=name,
+                labels=self.labels,
+            )
+            sink.spill = self.spill
+            sink.engine = self.engine
+            self.tenants[name] = sink
+        return sink
+
+    def add(self, event: LogRecord) -> None:
+        self.tenant(self.resolver(event)).add(event)
+
+    def flush(self) -> None:
+        # Every tenant gets its flush even when an earlier one fails
+        error: Optional[Exception] = None
+        for sink in self.tenants.values():
+            try:
+                sink.flush()
+            except Exception as exc:
+                error = error or exc
+        if error is not None:
+            raise error
+
+    def discard(self) -> None:
+        for sink in self.tenants.values():
+            sink.discard()
+
+    def restore(self, values: Dict[str, Any]) -> Tuple[str, Any]:
+        return values.get("tenant") or self.resolver.default, _restore_item(values)
+
+    def replay(self, items: List[Any]) -> None:
+        by_tenant: Dict[str, List[Any]] = {}
+        for tenant, item in items:
+            by_tenant.setdefault(tenant, []).append(item)
+        error: Optional[Exception] = None
+        for tenant, tenant_items in by_tenant.items():
+            try:
+                self.tenant(tenant).replay(tenant_items)
+            except Exception as exc:
+                error = error or exc
+        if error is not None:
+            raise error
+
+
+def from_env() -> Optional[Sink]:
+    """
+    ``LokiSink`` for ``LOKI_ENDPOINT``; with ``LOKI_TENANT_FIELD`` a
+    ``MultiTenantLokiSink`` instead, using ``LOKI_TENANT_MAP`` (JSON value ->
+    tenant), ``LOKI_DEFAULT_TENANT``, ``LOKI_MAX_TENANTS`` and
+    ``LOKI_TENANT_LIMITS`` (JSON tenant -> {batch_size, max_concurrency}).
+    ``LOKI_LABEL_FIELDS`` adds stream labels from record fields.
+    """
+    endpoint = os.environ.get("LOKI_ENDPOINT")
+    if not endpoint:
+        return None
+    options: Dict[str, Any] = {
+        "batch_size": int(os.getenv("LOKI_BATCH_SIZE", "1000")),
+        "timeout": float(os.getenv("LOKI_TIMEOUT", "30")),
+        "max_concurrency": int(os.getenv("LOKI_MAX_CONCURRENCY", "4")),
+        "latency_target_ms": float(os.getenv("LOKI_LATENCY_TARGET_MS", "2000")),
+        "encoder": line_encoder_from_env(),
+        "labels": [n.strip() for n in os.getenv("LOKI_LABEL_FIELDS", "").split(",") if n.strip()],
+    }
+    tenant_field = os.getenv("LOKI_TENANT_FIELD", "")
+    if not tenant_field:
+        return LokiSink(endpoint, **options)
+    resolver = TenantResolver(
+        tenant_field,
+        mapping=json.loads(os.getenv("LOKI_TENANT_MAP", "") or "null"),
+        default=os.getenv("LOKI_DEFAULT_TENANT", DEFAULT_TENANT),
+        max_tenants=int(os.getenv("LOKI_MAX_TENANTS", "50")),
+    )
+    limits = json.loads(os.getenv("LOKI_TENANT_LIMITS", "") or "{}")
+    return MultiTenantLokiSink(endpoint, resolver, limits=limits, **options)
@@ -0,0 +1,168 @@
+import json
+import os
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from log_pipeline.enrich import ENRICHED_FIELDS, enricher_from_env
+from log_pipeline.events import FIELD_INDEX, LogRecord, normalize
+from log_pipeline.sinks import HttpRequest, Sink, SinkDeliveryError
+
+
+@lru_cache(maxsize=None)
+def _aws_auth() -> Optional[Any]:
+    """SigV4 auth for the ``es`` service, resolved once per container."""
+    import boto3
+    from requests_aws4auth import AWS4Auth
+
+    session = boto3.Session()
+    credentials = session.get_credentials()
+    if not credentials:
+        return None
+    region = os.environ.get("AWS_REGION", session.region_name or "us-east-1")
+    return AWS4Auth(
+        credentials.access_key,
+        credentials.secret_key,
+        region,
+        "es",
+        session_token=credentials.token,
+    )
+
+
+class OpenSearchSink(Sink):
+    """
+    Indexes access-log documents through the OpenSearch ``_bulk`` API.
+
+    Batches hold the ``LogRecord`` items; each document is written from its
+    record when the bulk body is built. The ENRICHED_FIELDS are only part of
+    the document when ``enriched`` (the enrichment stage is on), so the
+    index keeps its shape otherwise.
+    """
+
+    name = "opensearch"
+    fields = (
+        "requestId",
+        "ip",
+        "user",
+        "caller",
+        "requestTime",
+        "httpMethod",
+        "resourcePath",
+        "status",
+        "protocol",
+        "responseLength",
+    )
+    spill_schema = ("timestamp", "id", "logGroup", "logStream", *fields, "message")
+    http = True
+
+    def __init__(
+        self,
+        endpoint: str,
+        index: str = "apigw-logs",
+        batch_size: int = 500,
+        timeout: float = 10,
+        auth: Optional[Any] = None,
+        max_concurrency: int = 4,
+        latency_target_ms: float = 2000,
+        enriched: bool = False,
+    ) -> None:
+        super().__init__(batch_size, max_concurrency, latency_target_ms)
+        self.endpoint = endpoint.rstrip("/")
+        self.index = index
+        self.timeout = timeout
+        self.auth = auth
+        self._doc_values = _doc_values
+        if enriched:
+            self.fields = OpenSearchSink.fields + ENRICHED_FIELDS
+            envelope = ("timestamp", "id", "logGroup", "logStream")
+            self.spill_schema = (*envelope, *self.fields, "message")
+            self._doc_values = _values_getter(self.fields)
+
+    def convert(self, event: LogRecord) -> Optional[LogRecord]:
+        return None if event.timestamp is None else event
+
+    def spill_row(self, item: LogRecord) -> Tuple[Any, ...]:
+        return self._doc_values(item)
+
+    def restore(self, values: Dict[str, Any]) -> LogRecord:
+        return normalize(
+            values,
+            values["message"],
+            values["timestamp"],
+            values["id"],
+            values["logGroup"],
+            values["logStream"],
+        )
+
+    def request(self, batch: List[LogRecord]) -> HttpRequest:
+        action = json.dumps({"index": {"_index": self.index}})
+        dumps = json.dumps
+        keys = self.spill_schema
+        doc_values = self._doc_values
+        lines = []
+        for record in batch:
+            lines.append(action)
+            lines.append(dumps(dict(zip(keys, doc_values(record)))))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        url = f"{self.endpoint}/_bulk"
+        headers = {"Content-Type": "application/x-ndjson"}
+        if self.auth is not None:
+            # Sign here so either transport can send the request as is
+            import requests
+
+            prepared = requests.Request("POST", url, data=payload, headers=headers).prepare()
+            self.auth(prepared)
+            headers = {k: v for k, v in prepared.headers.items() if k != "Content-Length"}
+        return HttpRequest(url, payload, headers, self.timeout)
+
+    def response(self, batch: List[LogRecord], status: int, text: str) -> List[LogRecord]:
+        if status >= 300:
+            raise SinkDeliveryError(f"OpenSearch bulk error: {status} -> {text[:500]}")
+
+        try:
+            body = json.loads(text)
+        except Exception:
+            raise SinkDeliveryError(f"OpenSearch bulk response not JSON: {text[:200]}")
+
+        rejected: List[LogRecord] = []
+        if body.get("errors"):
+            # Bulk items come back in request order
+            rejected = [
+                record
+                for record, item in zip(batch, body.get("items", []))
+                if item.get("index", {}).get("status", 200) >= 300
+            ]
+            print(f"OpenSearch bulk reported {len(rejected)} item errors: {json.dumps(body)[:500]}")
+        print(f"Indexed {len(batch) - len(rejected)} documents into {self.index}")
+        return rejected
+
+
+def _values_getter(fields: Tuple[str, ...]) -> Callable[[LogRecord], Tuple[Any, ...]]:
+    """Document values in spill_schema order (the document's key order)."""
+    return itemgetter(
+        FIELD_INDEX["timestamp"],
+        FIELD_INDEX["event_id"],
+        FIELD_INDEX["log_group"],
+        FIELD_INDEX["log_stream"],
+        *(FIELD_INDEX[name] for name in fields),
+        FIELD_INDEX["message"],
+    )
+
+
+_doc_values = _values_getter(OpenSearchSink.fields)
+
+
+def from_env() -> Optional[OpenSearchSink]:
+    endpoint = os.environ.get("OPENSEARCH_ENDPOINT")
+    if not endpoint:
+        return None
+    return OpenSearchSink(
+        endpoint,
+        index=os.environ.get("OPENSEARCH_INDEX", "apigw-logs"),
+        batch_size=int(os.getenv("OPENSEARCH_BATCH_SIZE", "500")),
+        timeout=float(os.getenv("OPENSEARCH_TIMEOUT", "10")),
+        auth=_aws_auth(),
+        max_concurrency=int(os.getenv("OPENSEARCH_MAX_CONCURRENCY", "4")),
+        latency_target_ms=float(os.getenv("OPENSEARCH_LATENCY_TARGET_MS", "2000")),
+        enriched=enricher_from_env() is not None,
+    )
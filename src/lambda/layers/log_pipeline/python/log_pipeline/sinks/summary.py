@@ -0,0 +1,163 @@
+import calendar
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from log_pipeline.events import LogRecord
+from log_pipeline.sinks import Sink, SinkDeliveryError
+from log_pipeline.summaries import (
+    DEFAULT_ACCURACY,
+    DEFAULT_MAX_PATHS,
+    DEFAULT_TOP_IPS,
+    HourSummary,
+    SummaryStore,
+    merge_summary,
+    summary_key,
+    summary_store_from_url,
+)
+
+# (hour, path, status, applicationVersion, latency, ip, bytes)
+SummaryItem = Tuple[int, str, str, str, Optional[float], Optional[str], int]
+
+
+@lru_cache(maxsize=4096)
+def _clf_hour(day_hour: str, zone: str) -> int:
+    """Epoch hour of a ``01/Jan/2026:00`` prefix of a ``requestTime`` in ``zone``."""
+    parsed = time.strptime(f"{day_hour}:00:00 {zone}", "%d/%b/%Y:%H:%M:%S %z")
+    return (calendar.timegm(parsed) - parsed.tm_gmtoff) // 3600 * 3600
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or value == "-" or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value: Any) -> str:
+    return "-" if value is None or value == "" else str(value)
+
+
+class SummarySink(Sink):
+    """
+    Keeps the hourly summaries of ``log_pipeline.summaries`` up to date.
+
+    Each batch is aggregated per UTC hour and merged into that hour's stored
+    summary with a conditional read-modify-write. Hours whose merge keeps
+    conflicting (or fails) are handed back as rejected items, so they are
+    spilled and replayed like any other sink's. Counts follow the ingest
+    guarantees: a retried object is only counted again for the slices the
+    checkpoints say were not delivered (and not at all with de-duplication).
+    """
+
+    name = "summary"
+    fields = (
+        "requestTime",
+        "path",
+        "status",
+        "applicationVersion",
+        "responseLatency",
+        "ip",
+        "bytes",
+    )
+    spill_schema = ("hour", "path", "status", "applicationVersion", "latency", "ip", "bytes")
+
+    def __init__(
+        self,
+        store: SummaryStore,
+        batch_size: int = 100_000,
+        accuracy: float = DEFAULT_ACCURACY,
+        top_ips: int = DEFAULT_TOP_IPS,
+        max_paths: int = DEFAULT_MAX_PATHS,
+        attempts: int = 8,
+    ) -> None:
+        super().__init__(batch_size)
+        self.store = store
+        self.accuracy = accuracy
+        self.top_ips = top_ips
+        self.max_paths = max_paths
+        self.attempts = attempts
+        self.conflicts = 0
+
+    def convert(self, event: LogRecord) -> Optional[SummaryItem]:
+        if event.timestamp is not None:
+            hour = event.timestamp // 3_600_000 * 3600
+        else:
+            # Bare records: the hour of the CLF requestTime
+            request_time = event.requestTime
+            if not isinstance(request_time, str) or len(request_time) < 20:
+                return None
+            try:
+                hour = _clf_hour(request_time[:14], request_time[-5:])
+            except ValueError:
+                return None
+        size = _number(event.bytes)
+        return (
+            hour,
+            _text(event.path),
+            _text(event.status),
+            _text(event.applicationVersion),
+            _number(event.responseLatency),
+            event.ip if event.ip and event.ip != "-" else None,
+            int(size) if size is not None else 0,
+        )
+
+    def spill_row(self, item: SummaryItem) -> Tuple[Any, ...]:
+        return item
+
+    def restore(self, values: Dict[str, Any]) -> SummaryItem:
+        return tuple(values.get(name) for name in self.spill_schema)  # type: ignore[return-value]
+
+    def deliver(self, batch: List[SummaryItem]) -> List[SummaryItem]:
+        by_hour: Dict[int, List[SummaryItem]] = {}
+        for item in batch:
+            by_hour.setdefault(item[0], []).append(item)
+
+        rejected: List[SummaryItem] = []
+        error: Optional[Exception] = None
+        for hour, items in sorted(by_hour.items()):
+            partial = HourSummary(hour, self.accuracy, self.top_ips, self.max_paths)
+            add = partial.add
+            for _, path, status, version, latency, ip, size in items:
+                add(path, status, version, latency, ip, size)
+            try:
+                attempts = merge_summary(self.store, partial, self.attempts)
+            except Exception as exc:
+                print(f"Could not merge the summary {summary_key(hour)}: {exc}")
+                error = exc
+                attempts = 0
+            if attempts:
+                self.conflicts += attempts - 1
+            else:
+                rejected.extend(items)
+        if error is not None and len(rejected) == len(batch):
+            raise SinkDeliveryError(f"Summary merge failed: {error}")
+        print(
+            f"Merged {len(batch) - len(rejected)} events into "
+            f"{len(by_hour)} hourly summaries ({self.conflicts} conflicts so far)"
+        )
+        return rejected
+
+
+def from_env() -> Optional[SummarySink]:
+    """
+    ``SummarySink`` for ``SUMMARY_STORE`` (``s3://bucket/prefix/`` or
+    ``memory://``), tuned by ``SUMMARY_BATCH_SIZE``, ``SUMMARY_ACCURACY``,
+    ``SUMMARY_TOP_IPS`` and ``SUMMARY_MAX_PATHS``.
+    """
+    # The S3 client ingest caches for the container, not a new one per invocation
+    from log_pipeline.ingest import get_s3_client
+
+    store = summary_store_from_url(os.getenv("SUMMARY_STORE", ""), get_s3_client)
+    if store is None:
+        return None
+    return SummarySink(
+        store,
+        batch_size=int(os.getenv("SUMMARY_BATCH_SIZE", "100000")),
+        accuracy=float(os.getenv("SUMMARY_ACCURACY", str(DEFAULT_ACCURACY))),
+        top_ips=int(os.getenv("SUMMARY_TOP_IPS", str(DEFAULT_TOP_IPS))),
+        max_paths=int(os.getenv("SUMMARY_MAX_PATHS", str(DEFAULT_MAX_PATHS))),
+    )
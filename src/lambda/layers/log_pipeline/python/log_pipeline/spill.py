@@ -0,0 +1,281 @@
+"""
+Spill buffer for batches a sink could not take (failed, rejected or circuit open).
+
+Spilled batches are stored as length-prefixed chunks, one per batch::
+
+    chunk   = u32 length | u8 codec | compressed payload
+    payload = "LPS1" | u16 columns | u32 rows | column names | column data
+
+Rows hold the sink's ``spill_schema`` values and are laid out column by column
+(type tags, u32 byte lengths, one UTF-8 blob), so replay decodes a column with a
+few slices instead of parsing JSON. Payloads are zstd-compressed when
+``zstandard`` is installed, zlib otherwise.
+
+Chunks are appended to files under ``/tmp`` first, so spilling never waits on
+the network, and ``Spill.flush`` uploads them to the spill prefix at the end of
+the invocation. Files that fail to upload stay in ``/tmp`` and go up with the
+next warm invocation. ``python -m log_pipeline.replay`` drains the prefix.
+"""
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from functools import lru_cache
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+MAGIC = b"LPS1"
+SUFFIX = ".lps"
+CODEC_RAW, CODEC_ZSTD, CODEC_ZLIB = 0, 1, 2
+
+_NONE, _STR, _INT, _FLOAT, _TRUE, _FALSE = range(6)
+_CHUNK_HEADER = struct.Struct("<IB")
+_SWAP = sys.byteorder != "little"
+
+
+def _tag(value: Any) -> int:
+    if value is None:
+        return _NONE
+    if isinstance(value, str):
+        return _STR
+    if value is True:
+        return _TRUE
+    if value is False:
+        return _FALSE
+    if isinstance(value, int):
+        return _INT
+    if isinstance(value, float):
+        return _FLOAT
+    return _STR
+
+
+def _text(tag: int, value: Any) -> bytes:
+    if tag == _STR:
+        return (value if isinstance(value, str) else str(value)).encode("utf-8")
+    if tag in (_INT, _FLOAT):
+        return repr(value).encode("ascii")
+    return b""
+
+
+def _value(tag: int, raw: bytes) -> Any:
+    if tag == _STR:
+        return raw.decode("utf-8")
+    if tag == _INT:
+        return int(raw)
+    if tag == _FLOAT:
+        return float(raw)
+    return {_NONE: None, _TRUE: True, _FALSE: False}[tag]
+
+
+def _u32_array(data: bytes) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if _SWAP:
+        values.byteswap()
+    return values
+
+
+def encode_rows(schema: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """Columnar payload for ``rows`` (tuples ordered like ``schema``)."""
+    parts = [MAGIC, struct.pack("<HI", len(schema), len(rows))]
+    for name in schema:
+        encoded = name.encode("utf-8")
+        parts.append(struct.pack("<H", len(encoded)) + encoded)
+    for column in zip(*rows) if rows else [() for _ in schema]:
+        tags = bytes(map(_tag, column))
+        uniform = not tags or tags.count(tags[0]) == len(tags)
+        if uniform and tags and tags[0] == _STR:
+            texts = [value.encode("utf-8") for value in column]
+        else:
+            texts = [_text(tag, value) for tag, value in zip(tags, column)]
+        lengths = array("I", map(len, texts))
+        if _SWAP:
+            lengths.byteswap()
+        blob = b"".join(texts)
+        parts.append(struct.pack("<BB", uniform, tags[0] if tags else _NONE))
+        if not uniform:
+            parts.append(tags)
+        parts.append(lengths.tobytes())
+        parts.append(struct.pack("<I", len(blob)))
+        parts.append(blob)
+    return b"".join(parts)
+
+
+def decode_rows(payload: bytes) -> Tuple[Tuple[str, ...], List[Tuple[Any, ...]]]:
+    """Inverse of ``encode_rows``: ``(schema, rows)``."""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a spill payload")
+    columns, count = struct.unpack_from("<HI", payload, 4)
+    offset = 10
+    names = []
+    for _ in range(columns):
+        (size,) = struct.unpack_from("<H", payload, offset)
+        names.append(payload[offset + 2 : offset + 2 + size].decode("utf-8"))
+        offset += 2 + size
+    data = []
+    for _ in range(columns):
+        uniform, tag = struct.unpack_from("<BB", payload, offset)
+        offset += 2
+        if uniform:
+            tags = None
+        else:
+            tags = payload[offset : offset + count]
+            offset += count
+        lengths = _u32_array(payload[offset : offset + 4 * count])
+        offset += 4 * count
+        (size,) = struct.unpack_from("<I", payload, offset)
+        blob = payload[offset + 4 : offset + 4 + size]
+        offset += 4 + size
+        ends = list(accumulate(lengths))
+        starts = [0] + ends[:-1]
+        if tags is None and tag == _STR:
+            column = [blob[s:e].decode("utf-8") for s, e in zip(starts, ends)]
+        elif tags is None:
+            column = [_value(tag, blob[s:e]) for s, e in zip(starts, ends)]
+        else:
+            column = [_value(t, blob[s:e]) for t, s, e in zip(tags, starts, ends)]
+        data.append(column)
+    return tuple(names), list(zip(*data)) if count else []
+
+
+@lru_cache(maxsize=None)
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor()
+
+
+def encode_chunk(payload: bytes) -> bytes:
+    codecs = _zstd()
+    if codecs is not None:
+        codec, body = CODEC_ZSTD, codecs[0].compress(payload)
+    else:
+        codec, body = CODEC_ZLIB, zlib.compress(payload, 6)
+    return _CHUNK_HEADER.pack(len(body), codec) + body
+
+
+def iter_chunks(data: bytes) -> Iterator[bytes]:
+    """Yield the decompressed payloads of a spill file's chunks."""
+    offset = 0
+    while offset < len(data):
+        size, codec = _CHUNK_HEADER.unpack_from(data, offset)
+        body = data[offset + _CHUNK_HEADER.size : offset + _CHUNK_HEADER.size + size]
+        offset += _CHUNK_HEADER.size + size
+        if codec == CODEC_ZSTD:
+            codecs = _zstd()
+            if codecs is None:
+                raise RuntimeError("zstandard is required to read this spill file")
+            yield codecs[1].decompress(body)
+        elif codec == CODEC_ZLIB:
+            yield zlib.decompress(body)
+        else:
+            yield body
+
+
+class Spill:
+    """Destination for undelivered batches, keyed by sink name."""
+
+    def write(self, sink: str, schema: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+        """Persist ``rows``; return where they were written."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Move buffered chunks to durable storage."""
+
+
+class MemorySpill(Spill):
+    """Keeps encoded chunks in memory per sink; for local runs."""
+
+    def __init__(self) -> None:
+        self.files: Dict[str, bytearray] = {}
+
+    def write(self, sink: str, schema: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+        self.files.setdefault(sink, bytearray()).extend(encode_chunk(encode_rows(schema, rows)))
+        return f"memory://{sink}"
+
+
+class FileSpill(Spill):
+    """Appends chunks to ``<directory>/<sink>--<id>.lps``, a new file per invocation."""
+
+    def __init__(self, directory: str = "/tmp/spill") -> None:
+        self.directory = Path(directory)
+        self._paths: Dict[str, Path] = {}
+
+    def write(self, sink: str, schema: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+        path = self._paths.get(sink)
+        if path is None:
+            import uuid
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._paths[sink] = self.directory / f"{sink}--{uuid.uuid4().hex}{SUFFIX}"
+        with open(path, "ab") as f:
+            f.write(encode_chunk(encode_rows(schema, rows)))
+        return str(path)
+
+    def flush(self) -> None:
+        self._paths = {}
+
+
+class S3Spill(FileSpill):
+    """
+    Stages chunks in ``directory`` and uploads every staged file (including
+    leftovers from earlier invocations) to ``s3://bucket/prefix/<sink>/<yyyy/mm/dd/hh>/``.
+    """
+
+    def __init__(
+        self, s3_client: Any, bucket: str, prefix: str = "spill/", directory: str = "/tmp/spill"
+    ) -> None:
+        super().__init__(directory)
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def flush(self) -> None:
+        super().flush()
+        if not self.directory.is_dir():
+            return
+        for path in sorted(self.directory.glob(f"*{SUFFIX}")):
+            sink, name = path.name.split("--", 1)
+            hour = time.strftime("%Y/%m/%d/%H", time.gmtime(path.stat().st_mtime))
+            key = f"{self.prefix}{sink}/{hour}/{name}"
+            try:
+                self.s3_client.upload_file(str(path), self.bucket, key)
+            except Exception as exc:
+                print(f"Could not upload spill file {path.name}; keeping it: {exc}")
+                continue
+            path.unlink()
+            print(f"Uploaded spill file to s3://{self.bucket}/{key}")
+
+
+_memory_spill = MemorySpill()
+
+
+def spill_from_url(
+    url: str, s3_client_factory: Optional[Callable[[], Any]] = None
+) -> Optional[Spill]:
+    """
+    Build a spill from ``SPILL_URL``-style URLs: ``s3://bucket/prefix/``,
+    ``file:///path`` or ``memory://``. Local staging goes to ``SPILL_DIR``
+    (default ``/tmp/spill``).
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    directory = os.getenv("SPILL_DIR", "/tmp/spill")
+    if parsed.scheme == "s3":
+        if s3_client_factory is None:
+            import boto3
+
+            s3_client_factory = lambda: boto3.client("s3")  # noqa: E731
+        return S3Spill(s3_client_factory(), parsed.netloc, parsed.path.lstrip("/"), directory)
+    if parsed.scheme == "file":
+        return FileSpill(parsed.path)
+    if parsed.scheme == "memory":
+        return _memory_spill
+    raise ValueError(f"Unsupported spill '{url}'")
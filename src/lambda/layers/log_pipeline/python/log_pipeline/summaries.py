@@ -0,0 +1,472 @@
+"""
+Hourly traffic summaries kept at ingest time, one small JSON object per hour.
+
+Each summary holds, for one UTC hour:
+
+- request and byte counts per path/status/applicationVersion (the keys of
+  the ClickHouse rollup, see ``log_pipeline.rollups``);
+- a latency sketch per path: log-spaced buckets whose quantiles are within
+  ``accuracy`` (relative) of the exact ones, mergeable by adding buckets;
+- the busiest client IPs (top ``top_ips``, the rest counted as ``other``).
+
+Summaries only grow by merging: the summary sink (``log_pipeline.sinks.summary``)
+aggregates a batch, then folds it into the stored hour with a read-modify-write
+that only succeeds if the object is unchanged (S3 ``If-Match`` on its ETag, or
+``If-None-Match: *`` when it does not exist yet) and retries on conflict, so
+concurrent invocations never lose each other's counts. Dashboards read a few
+KB per hour instead of scanning the raw rows::
+
+    store = summary_store_from_url("s3://test-nf-tags/summaries/")
+    day = combine(read_summaries(store, start, end))
+    day.quantiles("/api/v1/items", (0.5, 0.99))
+"""
+import calendar
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_ACCURACY = 0.02
+DEFAULT_TOP_IPS = 100
+DEFAULT_MAX_PATHS = 500
+# Paths beyond ``max_paths`` (least requested first) are folded into this one
+OTHER = "(other)"
+_FORMAT = 1
+
+CountKey = Tuple[str, str, str]  # path, status, applicationVersion
+
+
+class LatencySketch:
+    """
+    Relative-error quantile sketch (as DDSketch): value ``v`` falls in bucket
+    ``ceil(log(v) / log(gamma))``, ``gamma = (1 + accuracy) / (1 - accuracy)``,
+    so every value in a bucket is within ``accuracy`` of its midpoint.
+    """
+
+    def __init__(self, accuracy: float = DEFAULT_ACCURACY) -> None:
+        if not 0 < accuracy < 1:
+            raise ValueError("Sketch accuracy must be between 0 and 1")
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value > 0:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        else:
+            self.zero += count
+        self.count += count
+        self.total += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencySketch") -> None:
+        if other.accuracy != self.accuracy:
+            raise ValueError("Latency sketches differ in accuracy")
+        bins = self.bins
+        for index, count in other.bins.items():
+            bins[index] = bins.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated ``q`` quantile (None when empty)."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                value = 2 * self.gamma**index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_json(self) -> Dict[str, Any]:
+        # Buckets as a dense run from the lowest index: latencies cluster, so
+        # few zeros are written and keys are not repeated
+        offset = min(self.bins) if self.bins else 0
+        counts = [0] * (max(self.bins) - offset + 1) if self.bins else []
+        for index, count in self.bins.items():
+            counts[index - offset] = count
+        return {
+            "accuracy": self.accuracy,
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero": self.zero,
+            "offset": offset,
+            "bins": counts,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls(data["accuracy"])
+        offset = data["offset"]
+        sketch.bins = {offset + n: count for n, count in enumerate(data["bins"]) if count}
+        sketch.zero = data["zero"]
+        sketch.count = data["count"]
+        sketch.total = data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+class TopCounts:
+    """
+    Counts of the ``capacity`` most frequent keys.
+
+    ``other`` counts everything not listed. Keys trimmed off in an earlier
+    merge may have lost up to ``floor`` counts, so a listed count is exact
+    only while ``floor`` is 0 and otherwise at most ``floor`` short.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_IPS) -> None:
+        self.capacity = max(1, capacity)
+        self.counts: Dict[str, int] = {}
+        self.other = 0
+        self.floor = 0
+
+    def add(self, key: str, count: int = 1) -> None:
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + count
+
+    def merge(self, other: "TopCounts") -> None:
+        for key, count in other.counts.items():
+            self.add(key, count)
+        self.other += other.other
+        self.floor = max(self.floor, other.floor)
+
+    def trim(self) -> None:
+        if len(self.counts) <= self.capacity:
+            return
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        dropped = ranked[self.capacity :]
+        self.counts = dict(ranked[: self.capacity])
+        self.other += sum(count for _, count in dropped)
+        self.floor = max(self.floor, dropped[0][1])
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+    def to_json(self) -> Dict[str, Any]:
+        self.trim()
+        return {"top": self.top(), "other": self.other, "floor": self.floor}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any], capacity: int = DEFAULT_TOP_IPS) -> "TopCounts":
+        top = cls(capacity)
+        top.counts = {key: count for key, count in data["top"]}
+        top.other = data["other"]
+        top.floor = data["floor"]
+        return top
+
+
+class HourSummary:
+    """Counts, latency sketches and top IPs of one UTC hour (``hour``: epoch seconds)."""
+
+    def __init__(
+        self,
+        hour: int,
+        accuracy: float = DEFAULT_ACCURACY,
+        top_ips: int = DEFAULT_TOP_IPS,
+        max_paths: int = DEFAULT_MAX_PATHS,
+    ) -> None:
+        self.hour = hour
+        self.accuracy = accuracy
+        self.max_paths = max_paths
+        self.events = 0
+        # (path, status, applicationVersion) -> [requests, bytes]
+        self.counts: Dict[CountKey, List[int]] = {}
+        self.latency: Dict[str, LatencySketch] = {}
+        self.ips = TopCounts(top_ips)
+        self.merges = 0
+
+    def add(
+        self,
+        path: str,
+        status: str,
+        version: str,
+        latency: Optional[float],
+        ip: Optional[str],
+        size: int = 0,
+    ) -> None:
+        self.events += 1
+        row = self.counts.get((path, status, version))
+        if row is None:
+            self.counts[(path, status, version)] = [1, size]
+        else:
+            row[0] += 1
+            row[1] += size
+        if latency is not None:
+            sketch = self.latency.get(path)
+            if sketch is None:
+                sketch = self.latency[path] = LatencySketch(self.accuracy)
+            sketch.add(latency)
+        if ip:
+            self.ips.add(ip)
+
+    def merge(self, other: "HourSummary") -> None:
+        self.events += other.events
+        for key, (requests, size) in other.counts.items():
+            row = self.counts.get(key)
+            if row is None:
+                self.counts[key] = [requests, size]
+            else:
+                row[0] += requests
+                row[1] += size
+        for path, sketch in other.latency.items():
+            mine = self.latency.get(path)
+            if mine is None:
+                mine = self.latency[path] = LatencySketch(sketch.accuracy)
+            mine.merge(sketch)
+        self.ips.merge(other.ips)
+        self.merges += max(1, other.merges)
+
+    def trim(self) -> None:
+        """Fold the least requested paths beyond ``max_paths`` into OTHER."""
+        requests: Dict[str, int] = {}
+        for (path, _, _), (count, _) in self.counts.items():
+            requests[path] = requests.get(path, 0) + count
+        if len(requests) <= self.max_paths:
+            self.ips.trim()
+            return
+        # OTHER takes one of the max_paths slots, whether or not it exists yet
+        ranked = sorted(
+            (path for path in requests if path != OTHER), key=lambda path: (-requests[path], path)
+        )
+        kept = set(ranked[: self.max_paths - 1]) | {OTHER}
+        counts: Dict[CountKey, List[int]] = {}
+        for (path, status, version), (count, size) in self.counts.items():
+            key = (path if path in kept else OTHER, status, version)
+            row = counts.setdefault(key, [0, 0])
+            row[0] += count
+            row[1] += size
+        self.counts = counts
+        for path in [path for path in self.latency if path not in kept]:
+            sketch = self.latency.pop(path)
+            folded = self.latency.get(OTHER)
+            if folded is None:
+                self.latency[OTHER] = sketch
+            else:
+                folded.merge(sketch)
+        self.ips.trim()
+
+    def requests(self, by: str = "path") -> Dict[str, int]:
+        """Requests per ``path``, ``status`` or ``applicationVersion``."""
+        position = ("path", "status", "applicationVersion").index(by)
+        totals: Dict[str, int] = {}
+        for key, (count, _) in self.counts.items():
+            totals[key[position]] = totals.get(key[position], 0) + count
+        return totals
+
+    def quantiles(self, path: str, qs: Sequence[float] = (0.5, 0.9, 0.99)) -> List[Any]:
+        sketch = self.latency.get(path)
+        return [sketch.quantile(q) if sketch else None for q in qs]
+
+    def to_json(self) -> Dict[str, Any]:
+        self.trim()
+        return {
+            "format": _FORMAT,
+            "hour": time.strftime("%Y-%m-%dT%H:00:00Z", time.gmtime(self.hour)),
+            "events": self.events,
+            "merges": self.merges,
+            "updated": int(time.time()),
+            "counts": [[*key, count, size] for key, (count, size) in self.counts.items()],
+            "latency": {path: sketch.to_json() for path, sketch in self.latency.items()},
+            "ips": self.ips.to_json(),
+        }
+
+    def empty(self, hour: Optional[int] = None) -> "HourSummary":
+        """A summary with the same settings and no data."""
+        hour = self.hour if hour is None else hour
+        return HourSummary(hour, self.accuracy, self.ips.capacity, self.max_paths)
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(self.to_json(), separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes, top_ips: int = DEFAULT_TOP_IPS, max_paths: int = DEFAULT_MAX_PATHS
+    ) -> "HourSummary":
+        raw = json.loads(data)
+        if raw.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported summary format {raw.get('format')!r}")
+        hour = calendar.timegm(time.strptime(raw["hour"], "%Y-%m-%dT%H:%M:%SZ"))
+        latency = {path: LatencySketch.from_json(s) for path, s in raw["latency"].items()}
+        accuracy = next(iter(latency.values())).accuracy if latency else DEFAULT_ACCURACY
+        summary = cls(hour, accuracy, top_ips, max_paths)
+        summary.events = raw["events"]
+        summary.merges = raw["merges"]
+        summary.counts = {(p, s, v): [count, size] for p, s, v, count, size in raw["counts"]}
+        summary.latency = latency
+        summary.ips = TopCounts.from_json(raw["ips"], top_ips)
+        return summary
+
+
+def summary_key(hour: int) -> str:
+    """Hive-style key of an hour's summary (relative to the store prefix)."""
+    return time.strftime("year=%Y/month=%m/day=%d/hour=%H.json", time.gmtime(hour))
+
+
+class SummaryStore:
+    """Summary objects by key: versioned get and conditional put."""
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """Object body and its version (``None, None`` when absent)."""
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        """Write ``data`` if the stored version is still ``version``; False on conflict."""
+        raise NotImplementedError
+
+
+class MemorySummaryStore(SummaryStore):
+    """In-process stand-in (local runs, tests of concurrent writers)."""
+
+    def __init__(self) -> None:
+        self._items: Dict[str, Tuple[bytes, int]] = {}
+        # Compare-and-set must be atomic across writer threads, as on S3
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        item = self._items.get(key)
+        return (item[0], str(item[1])) if item else (None, None)
+
+    def put(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        with self._lock:
+            item = self._items.get(key)
+            if version != (str(item[1]) if item else None):
+                return False
+            self._items[key] = (data, item[1] + 1 if item else 1)
+        return True
+
+
+_CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+class S3SummaryStore(SummaryStore):
+    """Objects under ``prefix``, replaced with ``If-Match`` / ``If-None-Match`` puts."""
+
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = "summaries/") -> None:
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except Exception as exc:
+            if _error_code(exc) in ("NoSuchKey", "404", "NotFound"):
+                return None, None
+            raise
+        return obj["Body"].read(), obj["ETag"]
+
+    def put(self, key: str, data: bytes, version: Optional[str]) -> bool:
+        condition = {"IfMatch": version} if version else {"IfNoneMatch": "*"}
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.prefix + key,
+                Body=data,
+                ContentType="application/json",
+                **condition,
+            )
+        except Exception as exc:
+            if _error_code(exc) in _CONFLICT_CODES:
+                return False
+            raise
+        return True
+
+
+_memory_store = MemorySummaryStore()
+
+
+def summary_store_from_url(
+    url: str, s3_client_factory: Optional[Callable[[], Any]] = None
+) -> Optional[SummaryStore]:
+    """``SUMMARY_STORE``-style URLs: ``s3://bucket/prefix/`` or ``memory://``."""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        if s3_client_factory is None:
+            import boto3
+
+            s3_client_factory = lambda: boto3.client("s3")  # noqa: E731
+        return S3SummaryStore(s3_client_factory(), parsed.netloc, parsed.path.lstrip("/"))
+    if parsed.scheme == "memory":
+        return _memory_store
+    raise ValueError(f"Unsupported summary store '{url}'")
+
+
+def merge_summary(
+    store: SummaryStore,
+    partial: HourSummary,
+    attempts: int = 8,
+    backoff: float = 0.02,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """
+    Fold ``partial`` into its stored hour (optimistic concurrency).
+
+    Returns the attempts it took, or 0 when the object kept changing for
+    ``attempts`` tries. Conflicts wait a jittered, doubling ``backoff``.
+    """
+    key = summary_key(partial.hour)
+    for attempt in range(1, attempts + 1):
+        data, version = store.get(key)
+        if data is None:
+            merged = partial.empty()
+        else:
+            merged = HourSummary.from_bytes(data, partial.ips.capacity, partial.max_paths)
+        merged.merge(partial)
+        if store.put(key, merged.to_bytes(), version):
+            return attempt
+        sleep(random.uniform(0, backoff * 2 ** (attempt - 1)))
+    return 0
+
+
+def read_summaries(store: SummaryStore, start: datetime, end: datetime) -> List[HourSummary]:
+    """The stored summaries of the hours overlapping ``[start, end)``."""
+    first = int(start.timestamp()) // 3600 * 3600
+    summaries = []
+    for hour in range(first, int(end.timestamp()), 3600):
+        data, _ = store.get(summary_key(hour))
+        if data is not None:
+            summaries.append(HourSummary.from_bytes(data))
+    return summaries
+
+
+def combine(summaries: Iterable[HourSummary]) -> HourSummary:
+    """One summary for several hours (its ``hour`` is the first one's)."""
+    combined: Optional[HourSummary] = None
+    for summary in summaries:
+        if combined is None:
+            combined = summary.empty()
+        combined.merge(summary)
+    return combined if combined is not None else HourSummary(0)
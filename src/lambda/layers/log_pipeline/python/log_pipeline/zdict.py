@@ -0,0 +1,173 @@
+"""
+zstd with trained dictionaries for archived access-log objects.
+
+API Gateway access logs repeat the same keys, hosts, routes and user agents in
+every event. A dictionary trained on a sample of them gives zstd that
+vocabulary up front, so even small objects compress well from their first
+byte, and zstd decodes several times faster than gzip.
+
+    python -m log_pipeline.zdict train fake_logs.json more/*.gz -o api-logs.zdict
+    python -m log_pipeline.zdict compress fake_logs.gz -d api-logs.zdict -o fake_logs.zst
+    python -m log_pipeline.zdict info fake_logs.zst
+
+Training samples are the CloudWatch data messages in the given objects (plain,
+gzip or zstd; e.g. ``generate_fake_logs.py`` output or downloaded Firehose
+objects). Every zstd frame records its dictionary id, and readers look it up
+among the ``.zdict`` files in ``ZSTD_DICTIONARIES`` (comma-separated files or
+directories; default ``/opt/zstd``, a ``zstd/`` folder in a Lambda layer).
+``log_pipeline.decode`` reads such objects transparently.
+"""
+import argparse
+import json
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from log_pipeline.decode import ZSTD_MAGIC
+from log_pipeline.decode import decompress as decode
+
+DICT_SUFFIX = ".zdict"
+# zstd's default dictionary size (110 KiB)
+DEFAULT_DICT_SIZE = 112_640
+DEFAULT_LEVEL = 19
+
+
+def _zstandard() -> Any:
+    """The ``zstandard`` module, or an ImportError saying where it is needed."""
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise ImportError(
+            "zstd objects need the zstandard package (pip install zstandard, "
+            "or add it to the Lambda layer)"
+        ) from exc
+    return zstandard
+
+
+def load_dictionary(path: str) -> Any:
+    zstandard = _zstandard()
+    return zstandard.ZstdCompressionDict(Path(path).read_bytes())
+
+
+@lru_cache(maxsize=None)
+def dictionaries() -> Dict[int, Any]:
+    """Dictionaries from ``ZSTD_DICTIONARIES`` by id, loaded once per container."""
+    found: Dict[int, Any] = {}
+    for entry in os.getenv("ZSTD_DICTIONARIES", "/opt/zstd").split(","):
+        path = Path(entry.strip())
+        if not entry.strip() or not path.exists():
+            continue
+        for file in sorted(path.glob(f"*{DICT_SUFFIX}")) if path.is_dir() else [path]:
+            dictionary = load_dictionary(str(file))
+            found[dictionary.dict_id()] = dictionary
+    return found
+
+
+@lru_cache(maxsize=8)
+def _decompressor(dict_id: int) -> Any:
+    zstandard = _zstandard()
+    if not dict_id:
+        return zstandard.ZstdDecompressor()
+    dictionary = dictionaries().get(dict_id)
+    if dictionary is None:
+        raise ValueError(f"zstd object needs dictionary {dict_id}, not found in ZSTD_DICTIONARIES")
+    return zstandard.ZstdDecompressor(dict_data=dictionary)
+
+
+def decompress(raw: bytes) -> bytes:
+    """Decompress zstd frames (concatenated frames included) with their dictionary."""
+    zstandard = _zstandard()
+    dict_id = zstandard.get_frame_parameters(raw).dict_id
+    return _decompressor(dict_id).stream_reader(raw, read_across_frames=True).read()
+
+
+def compress(data: bytes, dictionary: Optional[Any] = None, level: int = DEFAULT_LEVEL) -> bytes:
+    zstandard = _zstandard()
+    return zstandard.ZstdCompressor(level=level, dict_data=dictionary).compress(data)
+
+
+def read_object(path: str) -> bytes:
+    """Decompressed contents of a plain, gzip or zstd object."""
+    return decode(Path(path).read_bytes())
+
+
+def split_messages(text: str) -> List[bytes]:
+    """The concatenated JSON objects in ``text``, each as its original bytes."""
+    decoder = json.JSONDecoder()
+    samples = []
+    idx = 0
+    end = len(text)
+    while idx < end:
+        while idx < end and text[idx].isspace():
+            idx += 1
+        if idx == end:
+            break
+        try:
+            _, stop = decoder.raw_decode(text, idx)
+        except json.JSONDecodeError:
+            break
+        samples.append(text[idx:stop].encode("utf-8"))
+        idx = stop
+    return samples
+
+
+def train(samples: Sequence[bytes], dict_size: int = DEFAULT_DICT_SIZE, level: int = 3) -> Any:
+    """Dictionary for ``samples`` (k/d parameters tuned by zstd's COVER search)."""
+    zstandard = _zstandard()
+    return zstandard.train_dictionary(dict_size, list(samples), level=level, threads=-1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train and use zstd dictionaries for logs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = commands.add_parser("train", help="train a dictionary from log objects")
+    train_cmd.add_argument("objects", nargs="+")
+    train_cmd.add_argument("-o", "--output", required=True)
+    train_cmd.add_argument("--size", type=int, default=DEFAULT_DICT_SIZE, help="bytes")
+    compress_cmd = commands.add_parser("compress", help="re-compress an object as zstd")
+    compress_cmd.add_argument("object")
+    compress_cmd.add_argument("-o", "--output", required=True)
+    compress_cmd.add_argument("-d", "--dictionary")
+    compress_cmd.add_argument("--level", type=int, default=DEFAULT_LEVEL)
+    info_cmd = commands.add_parser("info", help="dictionary id of an object or dictionary")
+    info_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+    try:
+        return _run(args)
+    except ImportError as exc:
+        print(exc)
+        return 1
+
+
+def _run(args: argparse.Namespace) -> int:
+    if args.command == "train":
+        samples = [s for path in args.objects for s in split_messages(read_object(path).decode())]
+        if not samples:
+            print("No data messages found in the given objects")
+            return 1
+        dictionary = train(samples, args.size)
+        Path(args.output).write_bytes(dictionary.as_bytes())
+        print(
+            f"Trained dictionary {dictionary.dict_id()} ({len(dictionary.as_bytes())} bytes) "
+            f"from {len(samples)} samples, {sum(map(len, samples))} bytes -> {args.output}"
+        )
+    elif args.command == "compress":
+        data = read_object(args.object)
+        dictionary = load_dictionary(args.dictionary) if args.dictionary else None
+        body = compress(data, dictionary, args.level)
+        Path(args.output).write_bytes(body)
+        print(f"{args.object}: {len(data)} -> {len(body)} bytes ({len(data) / len(body):.1f}x)")
+    else:
+        zstandard = _zstandard()
+        raw = Path(args.path).read_bytes()
+        if raw[:4] == ZSTD_MAGIC:
+            print(f"zstd frame, dictionary {zstandard.get_frame_parameters(raw).dict_id}")
+        else:
+            print(f"dictionary {zstandard.ZstdCompressionDict(raw).dict_id()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,28 @@
 import json
 import gzip
 import base64
-from aws_lambda_powertools import Metrics
-from aws_lambda_powertools.metrics import MetricUnit
+from log_pipeline.emf import MetricsLogger
+from log_pipeline.projection import FieldProjector
 
-metrics = Metrics(namespace="ApiMonitor")
+# Embedded metric format on stdout (see log_pipeline.emf); no Powertools layer
+metrics = MetricsLogger(namespace="ApiMonitor")
+# Only these fields are read, so skip the full json.loads of each message;
+# strict: None for messages that are not JSON objects
+project = FieldProjector(("ip", "resourcePath"), strict=True)
 
 
-@metrics.log_metrics  # <--- ESTO ES VITAL para publicar métricas automáticamente
 def handler(event, context):
     """
     Lambda function to process CloudWatch Logs from API Gateway subscription filter
     """
+    try:
+        return _process(event)
+    finally:
+        # ESTO ES VITAL: publica las métricas (una vez por invocación)
+        metrics.flush()
+
+
+def _process(event):
     print(f"Received event: {json.dumps(event)}")
 
     # Decode and decompress the log data
@@ -27,22 +38,18 @@ def handler(event, context):
         message = log_event.get("message", "")
 
         # Parse the log message (API Gateway access log format)
-        try:
-            log_entry = json.loads(message)
-
+        log_entry = project(message)
+        if log_entry is not None:
             # Extract relevant information
             ip = log_entry.get("ip", "unknown")
             resource_path = log_entry.get("resourcePath", "unknown")
 
-            # Add metric with dimensions (clear dimensions before adding new ones)
-            metrics.clear_default_dimensions()
-            metrics.add_dimension(name="Path", value=resource_path)
-            metrics.add_dimension(name="ClientIP", value=ip)
-            metrics.add_metric(name="RequestCount", unit=MetricUnit.Count, value=1)
+            # One RequestCount series per (Path, ClientIP)
+            metrics.put("RequestCount", 1, "Count", {"Path": resource_path, "ClientIP": ip})
 
             print(f"Processing log: IP={ip}, Path={resource_path}")
 
-        except json.JSONDecodeError:
+        else:
             # If it's not JSON, skip this log entry
             print(f"Plain text log (skipping): {message}")
 
@@ -0,0 +1,7 @@
+"""
+Single S3 ingestion Lambda: parses each Firehose object once and fans the
+events out to every sink listed in INGEST_SINKS (clickhouse, loki, opensearch).
+"""
+from log_pipeline.ingest import make_s3_handler
+
+handler = make_s3_handler()
@@ -0,0 +1,25 @@
+"""
+Drain S3 notifications through a local stand-in of the ingest SQS queue.
+
+Sends one notification per object listed on the command line (defaults to
+fake_logs.gz) and lets S3IngestLambda drain the queue in merged batches.
+"""
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Make the log_pipeline layer importable when running outside Lambda
+sys.path.insert(
+    0, str(Path(__file__).resolve().parents[1] / "layers" / "log_pipeline" / "python")
+)
+from handler import handler
+from log_pipeline.sqs import LocalQueue
+
+queue = LocalQueue()
+for key in sys.argv[1:] or ["fake_logs.gz"]:
+    queue.send_s3_notification("test-nf-tags", key)
+
+invocations = queue.drain(handler, batch_size=100)
+print(f"Drained in {invocations} invocations; dead letters: {len(queue.dead_letters)}")
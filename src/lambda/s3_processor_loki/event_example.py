@@ -31,9 +31,16 @@ EVENT = {
     ]
 }
 
+import sys
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 load_dotenv()
+# Make the log_pipeline layer importable when running outside Lambda
+sys.path.insert(
+    0, str(Path(__file__).resolve().parents[1] / "layers" / "log_pipeline" / "python")
+)
 from handler import handler
 
 handler(EVENT, {})
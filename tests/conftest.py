@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+LAMBDA_ROOT = ROOT / "src" / "lambda"
+
+# The log_pipeline layer and the API function, importable as in Lambda
+for path in (LAMBDA_ROOT / "layers" / "log_pipeline" / "python", LAMBDA_ROOT / "api_handler"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
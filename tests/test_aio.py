@@ -0,0 +1,172 @@
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from log_pipeline import health
+from log_pipeline.aio import AsyncEngine
+from log_pipeline.decode import load_object
+from log_pipeline.sinks import HttpRequest, Sink, SinkDeliveryError
+
+
+class Server(ThreadingHTTPServer):
+    """Answers every POST after ``delay`` seconds, tracking concurrent requests."""
+
+    daemon_threads = True
+
+    def __init__(self, status=204, delay=0.02):
+        self.status = status
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/push"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.active += 1
+            server.requests += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        self.send_response(server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class PushSink(Sink):
+    name = "push"
+    http = True
+
+    def __init__(self, url, max_concurrency):
+        super().__init__(batch_size=1, max_concurrency=max_concurrency)
+        self.url = url
+
+    def convert(self, event):
+        return event
+
+    def request(self, batch):
+        return HttpRequest(self.url, repr(batch).encode(), {}, timeout=5)
+
+    def response(self, batch, status, text):
+        if status >= 300:
+            raise SinkDeliveryError(f"HTTP {status}")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(health, "_registry", {})
+    engine = AsyncEngine(pool_size=8)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def server():
+    server = Server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_in_flight_requests_stay_within_the_sink_concurrency(engine, server):
+    sink = PushSink(server.url, max_concurrency=3)
+    sink.engine = engine
+    for n in range(30):
+        sink.add(n)
+        assert len(sink._inflight) <= sink.health.concurrency <= 3
+    sink.flush()
+
+    assert (server.requests, sink.delivered, sink.failed) == (30, 30, 0)
+    # AIMD grew the window from 1 up to the ceiling, and never past it
+    assert server.peak == 3
+    assert sink.health.limiter.limit == 3
+
+
+def test_failed_responses_surface_when_the_sink_flushes(engine, server):
+    server.status = 503
+    sink = PushSink(server.url, max_concurrency=2)
+    sink.engine = engine
+    sink._buffer.append("a")
+    with pytest.raises(SinkDeliveryError, match="HTTP 503"):
+        sink.flush()
+    assert sink.failed == 1 and not sink._inflight
+
+
+def test_connection_errors_come_back_as_results_not_raised(engine):
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+    request = HttpRequest(f"http://127.0.0.1:{port}/", b"", {}, timeout=2)
+
+    result, elapsed_ms = engine.send(request).result(timeout=10)
+
+    assert isinstance(result, Exception) and elapsed_ms >= 0
+    sink = PushSink(f"http://127.0.0.1:{port}/", max_concurrency=1)
+    sink.engine = engine
+    sink._buffer.append("a")
+    with pytest.raises(Exception):
+        sink.flush()
+    assert sink.failed == 1
+
+
+def test_reads_run_one_at_a_time_and_raise_from_the_future(engine):
+    running, peak = [0], [0]
+
+    def read(n):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(0.005)
+        running[0] -= 1
+        if n == 2:
+            raise KeyError(n)
+        return n
+
+    futures = [engine.read(read, n) for n in range(4)]
+
+    assert [futures[n].result(timeout=5) for n in (0, 1, 3)] == [0, 1, 3]
+    with pytest.raises(KeyError):
+        futures[2].result(timeout=5)
+    assert peak[0] == 1
+
+    async def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        engine.run(boom(), timeout=5)
+    assert engine.run(asyncio.sleep(0, result="ok"), timeout=5) == "ok"
+
+
+def test_downloads_of_keys_with_the_same_basename_do_not_collide():
+    barrier = threading.Barrier(2)
+
+    class S3:
+        def download_file(self, bucket, key, path):
+            with open(path, "wb") as f:
+                f.write(key.encode())
+            # Both downloads are on disk before either is read back
+            barrier.wait(timeout=5)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        keys = ["2026/01/a/part.gz", "2026/01/b/part.gz"]
+        results = list(pool.map(lambda key: load_object(S3(), "bucket", key), keys))
+
+    assert results == [key.encode() for key in keys]
@@ -0,0 +1,251 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import analytics
+from cache import QueryCache
+
+UTC = timezone.utc
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def named_results(self):
+        return iter(self.rows)
+
+
+class FakeAsyncClient:
+    """Records the queries and answers each with ``rows``."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = []
+
+    async def query(self, sql, parameters=None):
+        self.queries.append((sql, parameters))
+        await asyncio.sleep(0)
+        return FakeResult(self.rows)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = QueryCache(ttl=10, clock=clock)
+    loads = []
+
+    async def load():
+        loads.append(clock.now)
+        return len(loads)
+
+    async def scenario():
+        assert await cache.get_or_load("k", load) == 1
+        clock.now = 9.9
+        assert await cache.get_or_load("k", load) == 1
+        clock.now = 10
+        assert await cache.get_or_load("k", load) == 2
+        # A per-call ttl overrides the default
+        assert await cache.get_or_load("h", load, ttl=100) == 3
+        clock.now = 50
+        assert await cache.get_or_load("h", load) == 3
+
+    asyncio.run(scenario())
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 3, "coalesced": 0}
+
+
+def test_cache_evicts_the_least_recently_used_key():
+    cache = QueryCache(maxsize=2, ttl=60)
+
+    async def value(key):
+        async def load():
+            return key
+
+        return await cache.get_or_load(key, load)
+
+    async def scenario():
+        await value("a")
+        await value("b")
+        await value("a")  # "b" is now the oldest
+        await value("c")
+
+    asyncio.run(scenario())
+    assert len(cache) == 2
+    assert cache._get("a")[0] and cache._get("c")[0]
+    assert not cache._get("b")[0]
+
+
+def test_cache_coalesces_concurrent_loads_and_shares_failures():
+    cache = QueryCache(ttl=60)
+    calls = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def load():
+            calls.append(1)
+            await release.wait()
+            return "rows"
+
+        waiters = [asyncio.ensure_future(cache.get_or_load("k", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["rows"] * 5
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError("down")
+
+        failing = [asyncio.ensure_future(cache.get_or_load("x", fail)) for _ in range(3)]
+        results = await asyncio.gather(*failing, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.coalesced == 6
+    # Failures are not cached
+    assert len(cache) == 1
+
+
+def test_align_range_widens_to_whole_buckets():
+    now = datetime(2026, 1, 1, 12, 34, 56, tzinfo=UTC)
+    start, end, bucket = analytics.align_range(None, None, now=now)
+    assert (start, end, bucket) == (
+        datetime(2026, 1, 1, 11, 34, tzinfo=UTC),
+        datetime(2026, 1, 1, 12, 35, tzinfo=UTC),
+        60,
+    )
+
+    naive = datetime(2026, 1, 1, 0, 7)
+    start, end, bucket = analytics.align_range(naive, naive + timedelta(days=2), now=now)
+    assert bucket == 3600
+    assert start == datetime(2026, 1, 1, tzinfo=UTC)
+    assert end == datetime(2026, 1, 3, 1, tzinfo=UTC)
+
+
+@pytest.mark.parametrize(
+    "start, end",
+    [
+        (datetime(2026, 1, 2, tzinfo=UTC), datetime(2026, 1, 1, tzinfo=UTC)),
+        (datetime(2026, 1, 1, tzinfo=UTC), datetime(2026, 3, 1, tzinfo=UTC)),
+    ],
+)
+def test_align_range_rejects_bad_ranges(start, end):
+    with pytest.raises(HTTPException) as error:
+        analytics.align_range(start, end)
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(analytics, "cache", QueryCache(ttl=60))
+    client = FakeAsyncClient()
+    app = FastAPI()
+    app.include_router(analytics.router)
+    app.dependency_overrides[analytics.get_client] = lambda: client
+    return TestClient(app), client
+
+
+def test_per_path_endpoints_read_the_rollup(api):
+    http, client = api
+    client.rows = [
+        {
+            "path": "/user",
+            "requests": 7,
+            "errors": 1,
+            "bytes": 700,
+            "responseLatency": [10.0, 20.0, 30.0],
+            "integrationLatency": [1.0, 2.0, 3.0],
+        }
+    ]
+    params = {"start": "2026-01-01T00:00:00Z", "end": "2026-01-01T06:00:00Z", "limit": 5}
+
+    routes = http.get("/analytics/acme/top-routes", params=params).json()
+    latency = http.get("/analytics/acme/latency", params=params).json()
+
+    assert routes["rows"] == [{"path": "/user", "requests": 7, "errors": 1}]
+    assert latency["rows"] == [
+        {
+            "path": "/user",
+            "requests": 7,
+            "responseLatency": [10.0, 20.0, 30.0],
+            "integrationLatency": [1.0, 2.0, 3.0],
+        }
+    ]
+    assert routes["bucketSeconds"] == 300
+    for sql, parameters in client.queries:
+        assert "api_logs_route_1m" in sql and "GROUP BY path" in sql
+        assert parameters["company_id"] == "acme" and parameters["limit"] == 5
+        assert parameters["start"] == datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def test_other_endpoints_scan_the_raw_rows_once_per_range(api):
+    http, client = api
+    client.rows = [{"ip": "1.1.1.1", "requests": 3, "errors": 0}]
+    params = {"start": "2026-01-01T00:01:10Z", "end": "2026-01-01T00:41:00Z"}
+
+    first = http.get("/analytics/acme/top-ips", params=params)
+    # Same buckets once aligned: served from the cache
+    second = http.get("/analytics/acme/top-ips", params={**params, "end": "2026-01-01T00:40:30Z"})
+
+    assert first.json() == second.json()
+    assert first.json()["start"] == "2026-01-01T00:01:00+00:00"
+    (sql, parameters), = client.queries
+    assert "sistema_logs.api_logs " in sql and "api_logs_route_1m" not in sql
+    assert parameters["limit"] == 10
+
+
+def test_bad_ranges_are_rejected(api):
+    http, client = api
+    params = {"start": "2026-01-02T00:00:00Z", "end": "2026-01-01T00:00:00Z"}
+    assert http.get("/analytics/acme/latency", params=params).status_code == 400
+    assert http.get("/analytics/acme/latency", params={"limit": 0}).status_code == 422
+    assert client.queries == []
+
+
+def test_get_client_connects_once_under_concurrency(monkeypatch):
+    connects = []
+
+    async def connect():
+        connects.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    monkeypatch.setattr(analytics, "_client", None)
+    monkeypatch.setattr(analytics, "_connect", connect)
+
+    async def scenario():
+        return await asyncio.gather(*(analytics.get_client() for _ in range(10)))
+
+    clients = asyncio.run(scenario())
+    assert len(connects) == 1
+    assert all(client is clients[0] for client in clients)
+
+
+def test_empty_settings_fall_back_to_defaults(monkeypatch):
+    import clickhouse_connect
+
+    seen = {}
+
+    async def get_async_client(**kwargs):
+        seen.update(kwargs)
+        return object()
+
+    monkeypatch.setattr(clickhouse_connect, "get_async_client", get_async_client)
+    for name in ("CLICKHOUSE_HOST", "CLICKHOUSE_PORT", "CLICKHOUSE_USER", "CLICKHOUSE_SECURE"):
+        monkeypatch.setenv(name, "")
+
+    asyncio.run(analytics._connect())
+    assert (seen["host"], seen["port"], seen["username"]) == ("localhost", 8123, "default")
+    assert seen["secure"] is False
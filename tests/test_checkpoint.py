@@ -0,0 +1,203 @@
+import json
+
+import pytest
+
+from log_pipeline import health, ingest
+from log_pipeline.checkpoint import (
+    DynamoDBCheckpointStore,
+    MemoryCheckpointStore,
+    S3CheckpointStore,
+    checkpoint_key,
+    store_from_url,
+)
+from log_pipeline.deadline import TimeBudget
+from log_pipeline.router import SinkRouter
+from log_pipeline.sinks import Sink
+
+
+class NotFound(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+class Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeS3:
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+        self.downloads = []
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NotFound(Key)
+        return {"Body": Body(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+    def download_file(self, bucket, key, path):
+        self.downloads.append(key)
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+
+class FakeTable:
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key["pk"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item["pk"]] = Item
+
+
+STATE = {"positions": {"clickhouse": 40}, "events": 40, "complete": False}
+
+
+def test_s3_store_round_trips_markers_under_its_prefix():
+    s3 = FakeS3()
+    store = store_from_url("s3://bucket/ckpt", lambda: s3)
+    key = checkpoint_key("logs", "a/b.json", "etag")
+
+    assert store.get(key) is None
+    store.put(key, STATE)
+    assert store.get(key) == STATE
+    assert list(s3.objects) == ["ckpt/logs/a/b.json@etag.json"]
+    assert S3CheckpointStore(s3, "bucket", "/").prefix == ""
+
+    class Denied(Exception):
+        response = {"Error": {"Code": "AccessDenied"}}
+
+    s3.get_object = lambda **kwargs: (_ for _ in ()).throw(Denied())
+    with pytest.raises(Denied):
+        store.get(key)
+
+
+def test_dynamodb_store_sets_the_ttl_attribute(monkeypatch):
+    monkeypatch.setattr("log_pipeline.checkpoint.time.time", lambda: 1000.0)
+    table = FakeTable()
+    store = DynamoDBCheckpointStore(table, ttl_seconds=60)
+
+    assert store.get("k") is None
+    store.put("k", STATE)
+    assert store.get("k") == STATE
+    assert table.items["k"]["expiresAt"] == 1060
+
+
+def test_store_urls():
+    assert store_from_url("") is None
+    assert isinstance(store_from_url("memory://"), MemoryCheckpointStore)
+    with pytest.raises(ValueError):
+        store_from_url("redis://host")
+
+
+class ClockedSink(Sink):
+    """Keeps the paths it delivers; each event costs ``cost_ms`` on ``clock``."""
+
+    name = "clickhouse"
+    fields = ("path",)
+
+    def __init__(self, clock=None, cost_ms=0.0):
+        super().__init__(batch_size=1000)
+        self.clock = clock
+        self.cost_ms = cost_ms
+        self.paths = []
+
+    def convert(self, event):
+        if self.clock is not None:
+            self.clock.now += self.cost_ms / 1000
+        return event.path
+
+    def deliver(self, batch):
+        self.paths.extend(batch)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def _object(count):
+    events = [
+        {"id": str(i), "timestamp": 1_767_225_600_000 + i, "message": json.dumps({"path": f"/{i}"})}
+        for i in range(count)
+    ]
+    message = {"messageType": "DATA_MESSAGE", "logGroup": "g", "logStream": "s"}
+    return json.dumps({**message, "logEvents": events}).encode()
+
+
+def _event(*keys):
+    return {
+        "Records": [
+            {
+                "eventName": "ObjectCreated:Put",
+                "s3": {"bucket": {"name": "logs"}, "object": {"key": key, "eTag": "e1"}},
+            }
+            for key in keys
+        ]
+    }
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setattr(health, "_registry", {})
+    client = FakeS3({"a.json": _object(100), "b.json": _object(3)})
+    monkeypatch.setattr(ingest, "get_s3_client", lambda: client)
+    return client
+
+
+def test_finished_objects_are_skipped_without_being_read(s3):
+    store = MemoryCheckpointStore()
+    sink = ClockedSink()
+    ingest.process_s3_event(_event("b.json"), SinkRouter([sink]), store)
+    assert store.get(checkpoint_key("logs", "b.json", "e1"))["complete"]
+
+    again = ClockedSink()
+    (report,) = ingest.process_s3_event(_event("b.json"), SinkRouter([again]), store)
+
+    assert report == {"key": "b.json", "events": 3, "complete": True}
+    assert again.paths == [] and s3.downloads == ["b.json"]
+
+
+def test_a_deferred_object_resumes_at_its_saved_positions(s3, monkeypatch):
+    monkeypatch.setattr(ingest, "DEADLINE_CHECK_EVENTS", 10)
+    store = MemoryCheckpointStore()
+    clock = Clock()
+    first = ClockedSink(clock, cost_ms=1)
+    budget = TimeBudget(Context(remaining_ms=50), reserve_ms=0, clock=clock)
+
+    router = SinkRouter([first])
+    reports = ingest.process_s3_event(_event("a.json", "b.json"), router, store, budget=budget)
+
+    # 1 ms per event: after 40 the next 10 no longer fit in the 50 ms
+    assert [report.get("deferred") for report in reports] == [True, True]
+    assert first.paths == [f"/{i}" for i in range(40)]
+    state = store.get(checkpoint_key("logs", "a.json", "e1"))
+    assert state["positions"] == {"clickhouse": 40} and not state["complete"]
+    assert store.get(checkpoint_key("logs", "b.json", "e1")) is None
+
+    # The continuation picks up at event 40 and finishes both objects
+    second = ClockedSink()
+    reports = ingest.process_s3_event(_event("a.json", "b.json"), SinkRouter([second]), store)
+
+    assert second.paths == [f"/{i}" for i in range(40, 100)] + ["/0", "/1", "/2"]
+    assert [report["complete"] for report in reports] == [True, True]
+    assert store.get(checkpoint_key("logs", "a.json", "e1"))["positions"] == {"clickhouse": 100}
@@ -0,0 +1,211 @@
+import json
+
+import pytest
+
+from log_pipeline import dedup, health, ingest
+from log_pipeline.dedup import (
+    MAX_SHARED_BYTES,
+    BloomFilter,
+    Deduplicator,
+    MemoryDedupStore,
+    S3DedupStore,
+)
+from log_pipeline.events import normalize
+from log_pipeline.sinks import Sink, SinkDeliveryError
+from log_pipeline.sqs import LocalQueue
+
+
+def test_bloom_false_positives_stay_near_the_configured_rate():
+    bloom = BloomFilter(capacity=20_000, fp_rate=1e-3)
+    for n in range(20_000):
+        bloom.add(f"seen-{n}")
+
+    assert all(f"seen-{n}" in bloom for n in range(20_000))
+    probes = 100_000
+    false_positives = sum(f"new-{n}" in bloom for n in range(probes))
+    assert false_positives / probes <= 2 * 1e-3
+    assert bloom.estimated_fp_rate() == pytest.approx(1e-3, rel=0.5)
+    assert bloom.estimated_count() == pytest.approx(20_000, rel=0.05)
+
+
+def test_bloom_round_trips_and_merges():
+    left, right = BloomFilter(1000, 1e-3), BloomFilter(1000, 1e-3)
+    left.add("a")
+    right.add("b")
+    restored = BloomFilter.from_bytes(left.to_bytes())
+    assert restored.bits == left.bits and restored.count == 1
+
+    restored.merge(right)
+    assert "a" in restored and "b" in restored
+    with pytest.raises(ValueError):
+        restored.merge(BloomFilter(5000, 1e-3))
+    with pytest.raises(ValueError):
+        BloomFilter.from_bytes(b"JSON")
+
+
+class Conflict(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeS3:
+    """One object with an ETag; ``before_put`` runs ahead of each conditional put."""
+
+    def __init__(self):
+        self.data = None
+        self.etag = 0
+        self.puts = []
+        self.before_put = None
+
+    def get_object(self, Bucket, Key):
+        if self.data is None:
+            raise Conflict("NoSuchKey")
+        return {"Body": Body(self.data), "ETag": f'"{self.etag}"'}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None):
+        if self.before_put is not None:
+            before, self.before_put = self.before_put, None
+            before()
+        self.puts.append(IfMatch or IfNoneMatch)
+        current = f'"{self.etag}"' if self.data is not None else None
+        if (IfNoneMatch == "*" and current is not None) or (IfMatch and IfMatch != current):
+            raise Conflict("PreconditionFailed")
+        self.data = Body
+        self.etag += 1
+
+
+def _record(key):
+    return normalize({"requestId": key})
+
+
+def _commit(deduplicator, keys):
+    for key in keys:
+        assert not deduplicator.is_duplicate(_record(key))
+    deduplicator.commit()
+
+
+def test_publish_retries_an_etag_conflict_and_keeps_both_writers_keys():
+    s3 = FakeS3()
+    store = S3DedupStore(s3, "bucket", "dedup.bloom")
+    first = Deduplicator(capacity=1000, fp_rate=1e-3, store=store)
+    second = Deduplicator(capacity=1000, fp_rate=1e-3, store=store)
+    _commit(first, ["a"])
+
+    # Another container rewrites the object between this one's GET and PUT
+    s3.before_put = lambda: _commit(first, ["b"])
+    _commit(second, ["c"])
+
+    assert s3.puts == ["*", '"1"', '"1"', '"2"']
+    shared = BloomFilter.from_bytes(s3.data)
+    assert all(f"req:{key}" in shared for key in "abc")
+
+    # A third container sees every key once it syncs
+    third = Deduplicator(capacity=1000, fp_rate=1e-3, store=store)
+    third.start()
+    assert all(third.is_duplicate(_record(key)) for key in "abc")
+
+
+def test_publish_gives_up_after_its_attempts(capsys):
+    class Contended(MemoryDedupStore):
+        def put(self, data, version):
+            return False
+
+    _commit(Deduplicator(capacity=1000, fp_rate=1e-3, store=Contended()), ["a"])
+    assert "kept changing" in capsys.readouterr().out
+
+
+def test_oversized_shared_filters_are_refused():
+    capacity = 10_000_000
+    assert BloomFilter(capacity, 1e-4).nbytes > MAX_SHARED_BYTES
+    with pytest.raises(ValueError):
+        Deduplicator(capacity=capacity, store=MemoryDedupStore())
+    # Kept in memory only, the same filter is allowed
+    Deduplicator(capacity=capacity, lru_size=0)
+
+
+def test_pending_keys_are_duplicates_within_an_invocation_until_discarded():
+    deduplicator = Deduplicator(capacity=1000, fp_rate=1e-3)
+    assert not deduplicator.is_duplicate(_record("a"))
+    assert deduplicator.is_duplicate(_record("a"))
+    deduplicator.discard()
+    assert not deduplicator.is_duplicate(_record("a"))
+    deduplicator.commit()
+    assert deduplicator.is_duplicate(_record("a"))
+    assert deduplicator.snapshot()["duplicates"] == 2
+
+
+class FlakySink(Sink):
+    name = "flaky"
+    fields = ("path",)
+
+    def __init__(self):
+        super().__init__(batch_size=1000)
+        self.fail = True
+        self.delivered_ids = []
+
+    def convert(self, event):
+        return event.event_id
+
+    def deliver(self, batch):
+        if self.fail:
+            raise SinkDeliveryError("down")
+        self.delivered_ids.extend(batch)
+
+
+class S3Objects:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def download_file(self, bucket, key, path):
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+
+def _object(count):
+    events = [
+        {"id": f"e{i}", "timestamp": 1_767_225_600_000 + i, "message": json.dumps({"path": "/"})}
+        for i in range(count)
+    ]
+    message = {"messageType": "DATA_MESSAGE", "logGroup": "g", "logStream": "s"}
+    return json.dumps({**message, "logEvents": events}).encode()
+
+
+def test_a_redelivered_object_is_not_dropped_after_a_sink_failed(monkeypatch):
+    for name in ("INGEST_QUEUE_URL", "CHECKPOINT_STORE", "SPILL_URL", "DEDUP_STORE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    monkeypatch.setenv("DEDUP_CAPACITY", "1000")
+    monkeypatch.setattr(dedup, "_deduplicator", None)
+    monkeypatch.setattr(health, "_registry", {})
+    sink = FlakySink()
+    monkeypatch.setattr(ingest, "get_s3_client", lambda: S3Objects({"a.json": _object(3)}))
+    monkeypatch.setattr(ingest, "build_sinks", lambda names: [sink])
+    handler = ingest.make_s3_handler()
+
+    def deliver():
+        queue = LocalQueue()
+        queue.send_s3_notification("bucket", "a.json")
+        return handler(queue.receive_event(), None)
+
+    deliver()
+    assert sink.delivered_ids == []
+    assert dedup._deduplicator.snapshot()["duplicates"] == 0
+
+    # The redelivery after the failure goes through in full
+    sink.fail = False
+    deliver()
+    assert sink.delivered_ids == ["e0", "e1", "e2"]
+
+    # Once delivered, the same object is skipped
+    deliver()
+    assert sink.delivered_ids == ["e0", "e1", "e2"]
+    assert dedup._deduplicator.snapshot()["duplicates"] == 3
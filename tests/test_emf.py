@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from log_pipeline.emf import MAX_METRICS, MAX_VALUES, MetricsLogger, function_dimensions
+
+
+def _printed(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_documents_carry_the_cloudwatch_envelope(capsys):
+    metrics = MetricsLogger("ApiMonitor", {"Function": "ingest"})
+    metrics.put("Events", 10)
+    metrics.put("Latency", 5.5, "Milliseconds")
+    assert metrics.flush() == 1
+
+    (document,) = _printed(capsys)
+    envelope = document["_aws"]
+    assert isinstance(envelope["Timestamp"], int)
+    (directive,) = envelope["CloudWatchMetrics"]
+    assert directive == {
+        "Namespace": "ApiMonitor",
+        "Dimensions": [["Function"]],
+        "Metrics": [
+            {"Name": "Events", "Unit": "Count"},
+            {"Name": "Latency", "Unit": "Milliseconds"},
+        ],
+    }
+    assert (document["Function"], document["Events"], document["Latency"]) == ("ingest", 10, 5.5)
+    # Flushing clears the pending metrics
+    assert metrics.flush() == 0 and len(metrics) == 0
+
+
+def test_each_dimension_value_set_gets_its_document_and_the_sets_it_covers(capsys):
+    metrics = MetricsLogger(
+        "ApiMonitor",
+        {"Function": "f"},
+        dimension_sets=[["Function"], ["Function", "Path"], ["Function", "Path", "ClientIP"]],
+    )
+    for _ in range(3):
+        metrics.put("Requests", 1, dimensions={"Path": "/a", "ClientIP": "1.1.1.1"})
+    metrics.put("Requests", 1, dimensions={"Path": "/b"})
+    metrics.put("Requests", 1)
+    metrics.flush()
+
+    documents = {(doc.get("Path"), doc.get("ClientIP")): doc for doc in _printed(capsys)}
+    assert set(documents) == {("/a", "1.1.1.1"), ("/b", None), (None, None)}
+    dimensions = {
+        key: doc["_aws"]["CloudWatchMetrics"][0]["Dimensions"] for key, doc in documents.items()
+    }
+    assert dimensions[("/a", "1.1.1.1")] == [
+        ["Function"],
+        ["Function", "Path"],
+        ["Function", "Path", "ClientIP"],
+    ]
+    assert dimensions[("/b", None)] == [["Function"], ["Function", "Path"]]
+    assert dimensions[(None, None)] == [["Function"]]
+    # A value put several times is one histogram entry
+    assert documents[("/a", "1.1.1.1")]["Requests"] == {"Values": [1], "Counts": [3]}
+    assert all(doc["Function"] == "f" for doc in documents.values())
+
+
+def test_documents_hold_at_most_100_metrics(capsys):
+    metrics = MetricsLogger("ApiMonitor")
+    for n in range(2 * MAX_METRICS + 50):
+        metrics.put(f"M{n:03d}", n)
+    assert metrics.flush() == 3
+
+    documents = _printed(capsys)
+    names = []
+    for document in documents:
+        listed = [m["Name"] for m in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+        assert len(listed) <= MAX_METRICS
+        assert set(document) == {"_aws", *listed}
+        names += listed
+    assert [len(doc) - 1 for doc in documents] == [100, 100, 50]
+    assert names == [f"M{n:03d}" for n in range(250)]
+
+
+def test_many_distinct_values_continue_in_later_documents(capsys):
+    metrics = MetricsLogger("ApiMonitor")
+    for n in range(MAX_VALUES + 20):
+        metrics.put("Latency", float(n), "Milliseconds")
+    metrics.put("Events", 1)
+    metrics.flush()
+
+    first, second = _printed(capsys)
+    assert len(first["Latency"]["Values"]) == MAX_VALUES and first["Events"] == 1
+    assert second["Latency"]["Values"] == [float(n) for n in range(MAX_VALUES, MAX_VALUES + 20)]
+    assert "Events" not in second
+
+
+def test_lines_match_the_documents():
+    metrics = MetricsLogger("ApiMonitor", {"Function": "f"}, write=lambda line: None)
+    metrics.put("A", 1, dimensions={"Path": "/x"})
+    metrics.put("A", 2, dimensions={"Path": "/x"})
+    metrics.put("B", 3, "Bytes")
+    lines = metrics.lines(timestamp_ms=123)
+    assert [json.loads(line) for line in lines] == metrics.documents(timestamp_ms=123)
+
+
+def test_bad_units_and_dimension_sets_are_rejected(monkeypatch):
+    metrics = MetricsLogger("ApiMonitor")
+    with pytest.raises(ValueError):
+        metrics.put("A", 1, "Furlongs")
+    metrics.put("A", 1, "Count")
+    with pytest.raises(ValueError):
+        metrics.put("A", 1, "Seconds")
+    with pytest.raises(ValueError):
+        MetricsLogger("ApiMonitor", dimension_sets=[[f"D{n}" for n in range(31)]])
+
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "s3_ingest")
+    assert function_dimensions() == {"Function": "s3_ingest"}
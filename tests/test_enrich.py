@@ -0,0 +1,277 @@
+import ipaddress
+import struct
+
+import pytest
+
+from log_pipeline.enrich import UNKNOWN_GEO, UNKNOWN_UA, Enricher, GeoIP, classify_user_agent
+from log_pipeline.mmdb import METADATA_MARKER, InvalidDatabaseError, Reader
+
+
+class Pointer:
+    """Data-section pointer to ``offset`` (``wide``: the 4-byte form)."""
+
+    def __init__(self, offset, wide=False):
+        self.offset = offset
+        self.wide = wide
+
+
+class Int32(int):
+    pass
+
+
+def _control(kind, size):
+    head = (kind << 5) if kind <= 7 else 0
+    extended = b"" if kind <= 7 else bytes([kind - 7])
+    if size < 29:
+        return bytes([head | size]) + extended
+    if size < 285:
+        return bytes([head | 29]) + extended + bytes([size - 29])
+    if size < 65821:
+        return bytes([head | 30]) + extended + (size - 285).to_bytes(2, "big")
+    return bytes([head | 31]) + extended + (size - 65821).to_bytes(3, "big")
+
+
+def encode(value):
+    """MaxMind DB data-section encoding of ``value``."""
+    if isinstance(value, Pointer):
+        if value.wide:
+            return bytes([0x38]) + value.offset.to_bytes(4, "big")
+        assert value.offset < 2048
+        return bytes([0x20 | value.offset >> 8, value.offset & 0xFF])
+    if isinstance(value, dict):
+        return _control(7, len(value)) + b"".join(encode(k) + encode(v) for k, v in value.items())
+    if isinstance(value, list):
+        return _control(11, len(value)) + b"".join(encode(item) for item in value)
+    if isinstance(value, str):
+        raw = value.encode("utf-8")
+        return _control(2, len(raw)) + raw
+    if isinstance(value, bytes):
+        return _control(4, len(value)) + value
+    if isinstance(value, bool):
+        return _control(14, int(value))
+    if isinstance(value, Int32):
+        return _control(8, 4) + struct.pack(">i", value)
+    if isinstance(value, int):
+        raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+        return _control(6 if value < 2**32 else 9, len(raw)) + raw
+    if isinstance(value, float):
+        return _control(3, 8) + struct.pack(">d", value)
+    raise TypeError(value)
+
+
+def build_mmdb(path, networks, record_size=24, ip_version=6, padding=0):
+    """
+    Write a MaxMind DB with ``networks`` (``(cidr, record)``; records may be
+    ``Pointer``s into the data section). IPv4 networks go under ::/96 in IPv6
+    trees. ``padding`` bytes of unreferenced data come first, to push the
+    records' offsets up.
+    """
+    data = bytearray()
+    if padding:
+        data += encode("x" * padding)
+    offsets = []
+    for _, record in networks:
+        offsets.append(len(data))
+        data += encode(record)
+
+    nodes = [[None, None]]
+    bits = 32 if ip_version == 4 else 128
+    for (cidr, _), offset in zip(networks, offsets):
+        network = ipaddress.ip_network(cidr)
+        value, length = int(network.network_address), network.prefixlen
+        if network.version == 4 and bits == 128:
+            length += 96
+        node = 0
+        for depth in range(length):
+            bit = (value >> (bits - 1 - depth)) & 1
+            if depth == length - 1:
+                nodes[node][bit] = ("data", offset)
+            else:
+                if nodes[node][bit] is None:
+                    nodes.append([None, None])
+                    nodes[node][bit] = ("node", len(nodes) - 1)
+                node = nodes[node][bit][1]
+
+    count = len(nodes)
+
+    def record(entry):
+        if entry is None:
+            return count
+        kind, value = entry
+        return value if kind == "node" else count + 16 + value
+
+    tree = bytearray()
+    for left, right in map(lambda n: (record(n[0]), record(n[1])), nodes):
+        if record_size == 24:
+            tree += left.to_bytes(3, "big") + right.to_bytes(3, "big")
+        elif record_size == 28:
+            middle = ((left >> 24) << 4) | (right >> 24)
+            tree += (left & 0xFFFFFF).to_bytes(3, "big") + bytes([middle])
+            tree += (right & 0xFFFFFF).to_bytes(3, "big")
+        else:
+            tree += left.to_bytes(4, "big") + right.to_bytes(4, "big")
+
+    metadata = {
+        "node_count": count,
+        "record_size": record_size,
+        "ip_version": ip_version,
+        "database_type": "Test",
+        "binary_format_major_version": 2,
+    }
+    with open(path, "wb") as f:
+        f.write(bytes(tree) + bytes(16) + bytes(data) + METADATA_MARKER + encode(metadata))
+    return str(path)
+
+
+RECORD = {
+    "country": {"iso_code": "CO", "names": {"es": "Colombia"}},
+    "ok": True,
+    "score": 0.25,
+    "offset": Int32(-5),
+    "big": 2**40,
+    "tags": ["a", "b"],
+    "raw": b"\x00\x01",
+}
+
+
+@pytest.mark.parametrize("record_size", [24, 28, 32])
+def test_lookups_for_each_record_size(tmp_path, record_size):
+    path = build_mmdb(
+        tmp_path / "test.mmdb",
+        [("1.2.3.0/24", RECORD), ("2001:db8::/32", {"country": {"iso_code": "DE"}})],
+        record_size=record_size,
+    )
+    reader = Reader(path)
+
+    assert reader.record_size == record_size
+    assert reader.get("1.2.3.200") == {**RECORD, "offset": -5}
+    assert reader.get("2001:db8:1::7")["country"]["iso_code"] == "DE"
+    assert reader.get("1.2.4.1") is None
+    assert reader.get("2001:db9::1") is None
+    assert reader.get("::1") is None
+    reader.close()
+
+
+def test_ipv4_only_databases(tmp_path):
+    path = build_mmdb(tmp_path / "v4.mmdb", [("10.0.0.0/8", {"n": 1})], ip_version=4)
+    reader = Reader(path)
+    assert reader.get("10.9.8.7") == {"n": 1}
+    assert reader.get("11.0.0.1") is None
+    assert reader.get("2001:db8::1") is None
+
+
+def test_28_bit_records_use_the_shared_nibble(tmp_path):
+    # Data past 16 MiB needs the high nibble of 28-bit records
+    path = build_mmdb(
+        tmp_path / "big.mmdb", [("1.2.3.0/24", {"n": 1})], record_size=28, padding=1 << 24
+    )
+    assert Reader(path).get("1.2.3.4") == {"n": 1}
+
+
+def test_pointers_resolve_into_the_data_section(tmp_path):
+    # The second record reuses the first one's map through pointers
+    shared = {"iso_code": "CO"}
+    first = {"country": shared}
+    # first = map header, "country", then the shared map
+    second = {"country": Pointer(1 + len(encode("country"))), "same": Pointer(0, wide=True)}
+    path = build_mmdb(tmp_path / "p.mmdb", [("1.0.0.0/8", first), ("2.0.0.0/8", second)])
+    reader = Reader(path)
+    assert reader.get("2.2.2.2") == {"country": shared, "same": first}
+
+
+def test_files_without_metadata_are_rejected(tmp_path):
+    path = tmp_path / "bad.mmdb"
+    path.write_bytes(b"\x00" * 64)
+    with pytest.raises(InvalidDatabaseError):
+        Reader(str(path))
+
+
+@pytest.mark.parametrize(
+    "user_agent, expected",
+    [
+        (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/120.0 Safari/537.36",
+            ("Chrome", "Windows", "desktop"),
+        ),
+        (
+            "Mozilla/5.0 (Windows NT 10.0) AppleWebKit/537.36 Chrome/120.0 Safari/537.36 "
+            "Edg/120.0",
+            ("Edge", "Windows", "desktop"),
+        ),
+        (
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_1) AppleWebKit/605.1.15 (KHTML, like "
+            "Gecko) Version/17.1 Safari/605.1.15",
+            ("Safari", "macOS", "desktop"),
+        ),
+        (
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 "
+            "(KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1",
+            ("Safari", "iOS", "mobile"),
+        ),
+        (
+            "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Chrome/120.0 "
+            "Mobile Safari/537.36",
+            ("Chrome", "Android", "mobile"),
+        ),
+        (
+            "Mozilla/5.0 (Linux; Android 13; SM-X200) AppleWebKit/537.36 Chrome/120.0 "
+            "Safari/537.36",
+            ("Chrome", "Android", "tablet"),
+        ),
+        (
+            "Mozilla/5.0 (iPad; CPU OS 17_1 like Mac OS X) AppleWebKit/605.1.15 Version/17.1 "
+            "Safari/604.1",
+            ("Safari", "iOS", "tablet"),
+        ),
+        (
+            "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+            ("Other", "Other", "bot"),
+        ),
+        (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 HeadlessChrome/120.0 "
+            "Safari/537.36",
+            ("Chrome", "Linux", "bot"),
+        ),
+        ("curl/8.4.0", ("curl", "Other", "client")),
+        ("python-requests/2.31.0", ("python-requests", "Other", "client")),
+        ("okhttp/4.12.0", ("okhttp", "Other", "client")),
+        ("SomethingElse/1.0", ("Other", "Other", "desktop")),
+        ("", UNKNOWN_UA),
+        ("-", UNKNOWN_UA),
+    ],
+)
+def test_user_agent_classes(user_agent, expected):
+    assert classify_user_agent(user_agent) == expected
+
+
+def test_enricher_adds_ua_and_geo_columns(tmp_path):
+    country = build_mmdb(
+        tmp_path / "country.mmdb",
+        [
+            ("1.2.3.0/24", {"country": {"iso_code": "CO"}}),
+            ("2001:db8::/32", {"registered_country": {"iso_code": "US"}}),
+        ],
+    )
+    asn = build_mmdb(tmp_path / "asn.mmdb", [("1.2.0.0/16", {"autonomous_system_number": 64500})])
+    enricher = Enricher(GeoIP(country, asn))
+
+    fields = enricher({"ip": "1.2.3.4", "userAgent": "curl/8.4.0"})
+    assert fields["geoCountry"] == "CO" and fields["geoAsn"] == 64500
+    assert (fields["uaBrowser"], fields["uaOS"], fields["uaDevice"]) == ("curl", "Other", "client")
+    assert enricher({"ip": "2001:db8::1"})["geoCountry"] == "US"
+    assert enricher({"ip": "9.9.9.9"})["geoCountry"] == ""
+    assert enricher({"ip": "not-an-ip"})["geoAsn"] == 0
+    assert enricher({}) == {}
+
+    enricher({"ip": "1.2.3.4", "userAgent": "curl/8.4.0"})
+    assert enricher.stats()["ip"]["entries"] == 4
+    assert enricher.stats()["userAgent"]["hit_rate"] > 0
+
+
+def test_missing_databases_only_disable_their_columns(tmp_path):
+    geoip = GeoIP(str(tmp_path / "missing.mmdb"), None)
+    assert not geoip
+    assert geoip.lookup("1.2.3.4") == UNKNOWN_GEO
+    fields = Enricher(geoip)({"ip": "1.2.3.4", "userAgent": "-"})
+    assert "geoCountry" not in fields and fields["uaDevice"] == ""
@@ -0,0 +1,182 @@
+import asyncio
+import gzip
+import io
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import analytics
+import export
+
+ROWS = [{"requestId": f"r{n}", "path": f"/user/{n}", "status": 200} for n in range(500)]
+NDJSON = b"".join(json.dumps(row).encode() + b"\n" for row in ROWS)
+
+
+class Stream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+class FakeClient:
+    def __init__(self, data=NDJSON):
+        self.stream = Stream(data)
+        self.queries = []
+
+    async def raw_stream(self, sql, parameters=None, settings=None, fmt=None):
+        self.queries.append((sql, parameters, fmt))
+        return self.stream
+
+
+class FakeS3:
+    """Records multipart calls; ``fail_part`` makes that part number raise."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.parts = []
+        self.calls = []
+
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append("create")
+        return {"UploadId": "u1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        if PartNumber == self.fail_part:
+            raise RuntimeError("part failed")
+        self.parts.append(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.calls.append(("complete", [part["PartNumber"] for part in MultipartUpload["Parts"]]))
+
+    def abort_multipart_upload(self, UploadId, **kwargs):
+        self.calls.append(("abort", UploadId))
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        return f"https://s3.local/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+async def _chunks(*chunks, error=None):
+    for chunk in chunks:
+        yield chunk
+    if error is not None:
+        raise error
+
+
+def test_gzip_blocks_stream_the_rows_in_bounded_reads():
+    stream = Stream(NDJSON)
+    closed = []
+
+    async def collect():
+        blocks = export.gzip_blocks(stream.read, lambda: closed.append(1), chunk_bytes=4096)
+        return [block async for block in blocks]
+
+    blocks = asyncio.run(collect())
+
+    body = gzip.decompress(b"".join(blocks))
+    assert [json.loads(line) for line in body.splitlines()] == ROWS
+    assert set(stream.reads) == {4096}
+    assert len(stream.reads) == len(NDJSON) // 4096 + 2
+    assert closed == [1]
+
+
+@pytest.mark.parametrize(
+    "head, rest, expected",
+    [
+        # Parts are cut once the buffer reaches part_bytes, the rest goes last
+        ([b"abcd"], [b"efghij", b"klm"], [b"abcdefghij", b"klm"]),
+        # Exactly full: no empty trailing part
+        ([], [b"0123456789", b"0123456789"], [b"0123456789", b"0123456789"]),
+        # A chunk larger than a part stays whole
+        ([b"x" * 25], [b"y"], [b"x" * 25, b"y"]),
+        # Nothing at all: S3 still needs one (empty) part
+        ([], [], [b""]),
+    ],
+)
+def test_multipart_parts_split_at_the_part_size(head, rest, expected):
+    s3 = FakeS3()
+    size = asyncio.run(
+        export.upload_multipart(s3, "bucket", "key", list(head), _chunks(*rest), part_bytes=10)
+    )
+    assert s3.parts == expected
+    assert size == sum(map(len, expected))
+    assert s3.calls == ["create", ("complete", list(range(1, len(expected) + 1)))]
+
+
+@pytest.mark.parametrize(
+    "fail_part, error",
+    [(None, ConnectionError("stream broke")), (2, None)],
+)
+def test_multipart_uploads_are_aborted_on_errors(fail_part, error):
+    s3 = FakeS3(fail_part=fail_part)
+    rest = _chunks(b"0123456789", b"0123456789", error=error)
+    with pytest.raises((ConnectionError, RuntimeError)):
+        asyncio.run(export.upload_multipart(s3, "bucket", "key", [], rest, part_bytes=10))
+    assert s3.calls == ["create", ("abort", "u1")]
+
+
+def _lambda_request():
+    return Request({"type": "http", "aws.event": {}, "headers": []})
+
+
+def test_large_exports_under_lambda_redirect_to_a_presigned_url(monkeypatch):
+    monkeypatch.setattr(export, "INLINE_BYTES", 10)
+    monkeypatch.setattr(export, "BUCKET", "exports-bucket")
+    monkeypatch.setattr(export, "PART_BYTES", 5 << 20)
+    s3 = FakeS3()
+
+    chunks = _chunks(b"0123456789", b"abcdef", b"ghij")
+    response = asyncio.run(export.respond(_lambda_request(), chunks, "f.ndjson", lambda: s3))
+
+    assert response.status_code == 303
+    location = response.headers["location"]
+    assert location.startswith("https://s3.local/exports-bucket/exports/")
+    assert location.endswith("/f.ndjson?expires=900")
+    assert json.loads(response.body) == {"url": location, "bytes": 20, "expiresIn": 900}
+    assert s3.parts == [b"0123456789abcdefghij"]
+
+
+def test_small_exports_under_lambda_stay_inline_and_large_ones_need_a_bucket(monkeypatch):
+    monkeypatch.setattr(export, "INLINE_BYTES", 10)
+    monkeypatch.setattr(export, "BUCKET", "")
+
+    response = asyncio.run(export.respond(_lambda_request(), _chunks(b"abc", b"def"), "f"))
+    assert (response.status_code, response.body) == (200, b"abcdef")
+    assert response.headers["content-encoding"] == "gzip"
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(export.respond(_lambda_request(), _chunks(b"0123456789", b"x"), "f"))
+    assert error.value.status_code == 413
+
+
+def test_export_endpoint_streams_gzip_ndjson():
+    client = FakeClient()
+    app = FastAPI()
+    app.include_router(export.router)
+    app.dependency_overrides[analytics.get_client] = lambda: client
+    params = {
+        "company_id": "acme/1",
+        "start": "2026-01-01T00:00:00Z",
+        "end": "2026-01-01T01:00:00Z",
+    }
+
+    response = TestClient(app).get("/logs/export", params=params)
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"] == export.MEDIA_TYPE
+    assert 'filename="logs-acme-1-20260101T000000-20260101T010000.ndjson"' in (
+        response.headers["content-disposition"]
+    )
+    # The client undid the gzip encoding
+    assert [json.loads(line) for line in response.text.splitlines()] == ROWS
+    ((sql, parameters, fmt),) = client.queries
+    assert fmt == "JSONEachRow" and parameters["company_id"] == "acme/1"
+    assert client.stream.closed
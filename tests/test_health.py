@@ -0,0 +1,162 @@
+import pytest
+
+from log_pipeline import health
+from log_pipeline.health import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AIMDLimiter,
+    CircuitBreaker,
+    SinkHealth,
+    health_for,
+)
+from log_pipeline.sinks import Sink, SinkDeliveryError
+from log_pipeline.spill import MemorySpill
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(health, "_registry", {})
+
+
+def test_consecutive_failures_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=Clock())
+    breaker.record_failure()
+    breaker.record_failure()
+    # A success in between starts the count over
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_one_probe_through_after_the_reset_timeout():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+
+    clock.now += 29.9
+    assert breaker.state == OPEN and not breaker.allow()
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed probe re-opens it for another full period
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert all(breaker.allow() for _ in range(3))
+
+
+def test_aimd_grows_additively_and_backs_off_to_its_floor():
+    limiter = AIMDLimiter(maximum=4, minimum=1, initial=1, latency_target_ms=500)
+    for _ in range(10):
+        limiter.on_result(True, 100)
+    assert limiter.limit == 4
+
+    limiter.on_result(False, 100)
+    assert limiter.limit == 2
+    # Slow but successful requests count as congestion too
+    limiter.on_result(True, 800)
+    assert limiter.limit == 1
+    limiter.on_result(False, 100)
+    assert limiter.limit == 1
+
+    limiter.on_result(True, 500)
+    assert limiter.limit == 2
+
+
+def test_aimd_bounds_are_sane():
+    assert AIMDLimiter(maximum=0, minimum=0, initial=5).limit == 1
+    assert AIMDLimiter(maximum=8, minimum=2, initial=20).limit == 8
+    assert AIMDLimiter(maximum=8, minimum=2, initial=0).limit == 2
+    unbounded_latency = AIMDLimiter(maximum=3, initial=3)
+    unbounded_latency.on_result(True, 10_000)
+    assert unbounded_latency.limit == 3
+
+
+def test_a_recovering_sink_gets_one_request_at_a_time():
+    clock = Clock()
+    sink_health = SinkHealth(
+        CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock),
+        AIMDLimiter(maximum=8, initial=8),
+    )
+    assert sink_health.concurrency == 8
+    sink_health.record(False, 5)
+    assert sink_health.snapshot() == {"circuit": OPEN, "concurrency": 4}
+    assert sink_health.concurrency == 1
+    clock.now += 10
+    assert sink_health.allow() and sink_health.concurrency == 1
+
+    sink_health.record(True, 5)
+    assert sink_health.snapshot() == {"circuit": CLOSED, "concurrency": 5}
+
+
+def test_health_is_kept_per_sink_and_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("CIRCUIT_FAILURE_THRESHOLD", "5")
+    monkeypatch.setenv("CIRCUIT_RESET_SECONDS", "2.5")
+    first = health_for("loki", max_concurrency=4)
+    assert health_for("loki") is first
+    assert health_for("clickhouse") is not first
+    assert (first.breaker.failure_threshold, first.breaker.reset_timeout) == (5, 2.5)
+    assert first.limiter.maximum == 4
+
+    health.reset_health()
+    assert health_for("loki") is not first
+
+
+class DownSink(Sink):
+    name = "down"
+    spill_schema = ("n",)
+
+    def __init__(self):
+        super().__init__(batch_size=1)
+        self.up = False
+        self.calls = 0
+
+    def deliver(self, batch):
+        self.calls += 1
+        if not self.up:
+            raise SinkDeliveryError("down")
+
+
+def test_an_open_circuit_spills_without_calling_the_sink_until_the_probe():
+    clock = Clock()
+    sink = DownSink()
+    sink.health = SinkHealth(
+        CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock), AIMDLimiter()
+    )
+    sink.spill = MemorySpill()
+    for n in range(5):
+        sink._buffer.append({"n": n})
+        sink.flush()
+
+    # Two failures open the circuit; the other batches never reach the sink
+    assert sink.calls == 2
+    assert sink.spilled == 5
+
+    clock.now += 30
+    sink.up = True
+    sink._buffer.append({"n": 5})
+    sink.flush()
+    assert (sink.calls, sink.delivered) == (3, 1)
+    assert sink.health.breaker.state == CLOSED
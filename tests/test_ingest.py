@@ -0,0 +1,201 @@
+import json
+
+import pytest
+
+from log_pipeline import health, ingest
+from log_pipeline.sinks import Sink, SinkDeliveryError
+from log_pipeline.sqs import LocalQueue
+
+ENV = (
+    "INGEST_QUEUE_URL",
+    "CHECKPOINT_STORE",
+    "SPILL_URL",
+    "DEDUP_ENABLED",
+    "ASYNC_DELIVERY",
+    "ENRICH_ENABLED",
+    "ROUTING_POLICY",
+    "PARTITION_INCLUDE",
+    "PARTITION_EXCLUDE",
+    "DEADLINE_RESERVE_MS",
+)
+
+
+def _object(count, path="/user"):
+    events = [
+        {"id": str(i), "timestamp": 1_767_225_600_000 + i, "message": json.dumps({"path": path})}
+        for i in range(count)
+    ]
+    message = {"messageType": "DATA_MESSAGE", "logGroup": "g", "logStream": "s"}
+    return json.dumps({**message, "logEvents": events}).encode()
+
+
+class FakeS3:
+    def __init__(self, objects):
+        self.objects = objects
+
+    def download_file(self, bucket, key, path):
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+
+class RecordingSink(Sink):
+    name = "recording"
+    fields = ("path",)
+
+    def __init__(self, fail=False, critical=False):
+        super().__init__(batch_size=1000)
+        self.fail = fail
+        self.critical = critical
+        self.paths = []
+
+    def convert(self, event):
+        return event.path
+
+    def deliver(self, batch):
+        if self.fail:
+            raise SinkDeliveryError("down")
+        self.paths.extend(batch)
+
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    for name in ENV:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(health, "_registry", {})
+    s3 = FakeS3({})
+    monkeypatch.setattr(ingest, "get_s3_client", lambda: s3)
+    sinks = []
+    monkeypatch.setattr(ingest, "build_sinks", lambda names: sinks)
+    return s3, sinks
+
+
+def test_sqs_batches_merge_objects_and_acknowledge_every_message(pipeline):
+    s3, sinks = pipeline
+    sink = RecordingSink()
+    sinks.append(sink)
+    queue = LocalQueue()
+    for n, key in enumerate(("a.json", "b.json", "c.json")):
+        s3.objects[key] = _object(n + 1, f"/{key}")
+        queue.send_s3_notification("bucket", key)
+
+    handler = ingest.make_s3_handler()
+    event = queue.receive_event()
+    response = handler(event, None)
+
+    assert response == {"batchItemFailures": []}
+    assert sorted(sink.paths) == ["/a.json", "/b.json", "/b.json"] + ["/c.json"] * 3
+    queue.complete(event, response)
+    assert len(queue) == 0
+
+
+def test_only_the_message_whose_object_failed_is_retried(pipeline):
+    s3, sinks = pipeline
+    sink = RecordingSink()
+    sinks.append(sink)
+    queue = LocalQueue(max_receive_count=2)
+    s3.objects["good.json"] = _object(2)
+    queue.send_s3_notification("bucket", "good.json")
+    missing = queue.send_s3_notification("bucket", "missing.json")
+
+    handler = ingest.make_s3_handler()
+    event = queue.receive_event()
+    response = handler(event, None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": missing}]}
+    assert sink.paths == ["/user", "/user"]
+    queue.complete(event, response)
+    assert len(queue) == 1
+    # Still missing on the redelivery: dead-lettered after max_receive_count
+    assert queue.drain(handler) == 1
+    assert [message["messageId"] for message in queue.dead_letters] == [missing]
+
+
+def test_a_critical_sink_failure_fails_the_batch(pipeline):
+    s3, sinks = pipeline
+    sinks.append(RecordingSink(fail=True, critical=True))
+    queue = LocalQueue()
+    s3.objects["a.json"] = _object(1)
+    ids = [queue.send_s3_notification("bucket", "a.json") for _ in range(2)]
+
+    response = ingest.make_s3_handler()(queue.receive_event(), None)
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": i} for i in sorted(ids)]}
+
+
+def test_a_non_critical_sink_failure_does_not_retry_the_batch(pipeline):
+    s3, sinks = pipeline
+    healthy = RecordingSink()
+    healthy.name = "healthy"
+    sinks.extend([healthy, RecordingSink(fail=True)])
+    queue = LocalQueue()
+    s3.objects["a.json"] = _object(1)
+    queue.send_s3_notification("bucket", "a.json")
+
+    response = ingest.make_s3_handler()(queue.receive_event(), None)
+
+    assert response == {"batchItemFailures": []}
+    assert healthy.paths == ["/user"]
+
+
+def test_deferred_objects_are_reenqueued(pipeline, monkeypatch):
+    s3, sinks = pipeline
+    sink = RecordingSink()
+    sinks.append(sink)
+    queue = LocalQueue()
+    monkeypatch.setenv("INGEST_QUEUE_URL", "https://sqs.local/ingest")
+    monkeypatch.setenv("DEADLINE_RESERVE_MS", "1000")
+    for key in ("a.json", "b.json"):
+        s3.objects[key] = _object(1, f"/{key}")
+        queue.send_s3_notification("bucket", key)
+
+    handler = ingest.make_s3_handler(sqs_client=queue)
+    event = queue.receive_event()
+    # Out of time before the first object: everything is handed on
+    response = handler(event, Context(remaining_ms=500))
+
+    assert response == {"batchItemFailures": []}
+    assert sink.paths == []
+    queue.complete(event, response)
+    assert len(queue) == 2
+
+    assert queue.drain(lambda e, _: handler(e, Context(remaining_ms=60_000))) == 1
+    assert sorted(sink.paths) == ["/a.json", "/b.json"]
+    assert queue.dead_letters == []
+
+
+def test_deferred_messages_fail_without_a_queue(pipeline, monkeypatch):
+    s3, sinks = pipeline
+    sinks.append(RecordingSink())
+    queue = LocalQueue()
+    monkeypatch.setenv("DEADLINE_RESERVE_MS", "1000")
+    s3.objects["a.json"] = _object(1)
+    message_id = queue.send_s3_notification("bucket", "a.json")
+
+    response = ingest.make_s3_handler(sqs_client=queue)(queue.receive_event(), Context(500))
+
+    assert response == {"batchItemFailures": [{"itemIdentifier": message_id}]}
+    assert len(queue) == 0
+
+
+def test_the_event_is_logged_as_counts_and_keys(pipeline, capsys, monkeypatch):
+    s3, sinks = pipeline
+    sinks.append(RecordingSink())
+    monkeypatch.setattr(ingest, "LOGGED_KEYS", 2)
+    queue = LocalQueue()
+    for key in ("a.json", "b.json", "c.json"):
+        s3.objects[key] = _object(1)
+        queue.send_s3_notification("bucket", key)
+
+    ingest.make_s3_handler()(queue.receive_event(), None)
+
+    out = capsys.readouterr().out
+    assert "Received 3 records, 3 objects: ['a.json', 'b.json'] (+1 more)" in out
+    assert "messageId" not in out and "ObjectCreated" not in out
@@ -0,0 +1,56 @@
+import json
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.lines import LineEncoder
+
+
+def _record(fields):
+    message = {
+        "messageType": "DATA_MESSAGE",
+        "logGroup": "/aws/apigateway/api",
+        "logStream": "stream",
+        "logEvents": [{"id": "1", "timestamp": 1000, "message": json.dumps(fields)}],
+    }
+    return next(iter_log_events([message]))
+
+
+def test_encode_record_keeps_fields_outside_the_schema():
+    fields = {"ip": "1.1.1.1", "customTag": "keepme", "requestId": "r-1", "status": "-"}
+    record = _record(fields)
+
+    assert record.extra == {"customTag": "keepme"}
+    line, metadata = LineEncoder("logfmt").encode_record(record)
+    assert line == "ip=1.1.1.1 customTag=keepme"
+    assert metadata == {"requestId": "r-1"}
+    assert LineEncoder("json").encode_record(record) == LineEncoder("json").encode(
+        json.dumps(fields)
+    )
+
+
+def test_extra_field_as_structured_metadata():
+    record = _record({"ip": "1.1.1.1", "traceId": "t-9"})
+
+    line, metadata = LineEncoder("logfmt", metadata=["traceId"]).encode_record(record)
+    assert line == "ip=1.1.1.1"
+    assert metadata == {"traceId": "t-9"}
+
+
+def test_schema_only_record_has_no_extra():
+    record = _record({"ip": "1.1.1.1", "status": "200"})
+
+    assert record.extra is None
+    assert LineEncoder("logfmt").encode_record(record) == ("status=200 ip=1.1.1.1", {})
+
+
+def test_loki_labels_do_not_change_a_shared_encoder():
+    from log_pipeline.sinks.loki import LokiSink
+
+    encoder = LineEncoder("logfmt")
+    first = LokiSink("http://loki", encoder=encoder, tenant="a", labels=["uaDevice"])
+    second = LokiSink("http://loki", encoder=encoder, tenant="b")
+    record = _record({"ip": "1.1.1.1", "uaDevice": "mobile"})
+
+    assert encoder.omit == frozenset(encoder.metadata)
+    assert "uaDevice" not in first.convert(record)[1][1]
+    assert "uaDevice=mobile" in second.convert(record)[1][1]
+    assert "uaDevice=mobile" in encoder.encode_record(record)[0]
@@ -0,0 +1,39 @@
+import json
+
+from log_pipeline.enrich import ENRICHED_FIELDS
+from log_pipeline.events import normalize
+from log_pipeline.sinks.opensearch import OpenSearchSink
+
+
+def _documents(sink, record):
+    lines = sink.request([record]).body.decode().splitlines()
+    return [json.loads(line) for line in lines[1::2]]
+
+
+def test_documents_keep_their_shape_without_enrichment():
+    record = normalize({"ip": "1.1.1.1", "geoCountry": "CO"}, "{}", 1000, "1", "g", "s")
+
+    (document,) = _documents(OpenSearchSink("http://localhost:9200"), record)
+    assert not set(ENRICHED_FIELDS) & set(document)
+    assert document["ip"] == "1.1.1.1"
+
+
+def test_enriched_documents_carry_the_enriched_fields():
+    record = normalize({"ip": "1.1.1.1", "geoCountry": "CO"}, "{}", 1000, "1", "g", "s")
+    sink = OpenSearchSink("http://localhost:9200", enriched=True)
+
+    (document,) = _documents(sink, record)
+    assert set(ENRICHED_FIELDS) <= set(document)
+    assert document["geoCountry"] == "CO"
+    assert sink.spill_row(record)[sink.spill_schema.index("geoCountry")] == "CO"
+
+
+def test_from_env_follows_enrich_enabled(monkeypatch):
+    from log_pipeline.sinks import opensearch
+
+    monkeypatch.setenv("OPENSEARCH_ENDPOINT", "http://localhost:9200")
+    monkeypatch.setattr(opensearch, "_aws_auth", lambda: None)
+    monkeypatch.setenv("ENRICH_ENABLED", "false")
+    assert "geoCountry" not in opensearch.from_env().spill_schema
+    monkeypatch.setenv("ENRICH_ENABLED", "true")
+    assert "geoCountry" in opensearch.from_env().spill_schema
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from log_pipeline.events import iter_log_events
+from log_pipeline.partitions import MIXED, UNKNOWN, PartitionFilter, partition_keys
+from log_pipeline.projection import make_parser
+
+
+def _message(*versions, timestamp=1_767_225_600_000):
+    events = [
+        {"id": str(n), "timestamp": timestamp + n, "message": json.dumps({"applicationVersion": v})}
+        for n, v in enumerate(versions)
+    ]
+    return {"messageType": "DATA_MESSAGE", "logGroup": "/aws/api gw", "logEvents": events}
+
+
+@pytest.mark.parametrize(
+    "versions, expected",
+    [
+        (("2.1.0", "2.1.0"), "2.1.0"),
+        (("2.1.0", "2.2 beta"), MIXED),
+        (("-",), UNKNOWN),
+        ((), UNKNOWN),
+    ],
+)
+def test_parsed_records_give_the_same_keys_as_the_message(versions, expected):
+    message = _message(*versions)
+    records = list(iter_log_events([message], make_parser(("applicationVersion",))))
+
+    keys = partition_keys(message, records=records)
+
+    assert keys["applicationVersion"] == expected
+    assert keys["logGroup"] == "aws-api-gw"
+    if versions:
+        assert keys == partition_keys(message)
+        hour = (keys["year"], keys["month"], keys["day"], keys["hour"])
+        assert hour == ("2026", "01", "01", "00")
+
+
+def test_partition_filter_matches_prefixes_and_segments():
+    key = "logs/year=2026/month=01/day=08/hour=19/applicationVersion=mixed/logGroup=g/x.gz"
+    assert PartitionFilter(["logs/year=2026/month=01/"])(key)
+    assert PartitionFilter(["day=08/hour=19"])(key)
+    assert not PartitionFilter(["day=08"], ["applicationVersion=mixed"])(key)
+    assert not PartitionFilter(["hour=1"])(key)
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from log_pipeline import policy
+from log_pipeline.events import normalize
+from log_pipeline.policy import RoutingPolicy, sample_bucket
+
+SINKS = ["clickhouse", "loki", "opensearch"]
+EVERY = (True, True, True)
+NONE = (False, False, False)
+
+
+def _record(**fields):
+    return normalize({"requestId": "r-1", **fields}, event_id="e-1")
+
+
+@pytest.mark.parametrize(
+    "field, matcher, value, expected",
+    [
+        ("status", 500, "500", True),
+        ("status", "500", 500, True),
+        ("status", ["4*", "5*"], "503", True),
+        ("status", ["4*", "5*"], "200", False),
+        ("status", ">=1000", "1000", True),
+        ("status", ">=1000", 999.9, False),
+        ("status", ">1000", 1000, False),
+        ("status", "<10", "9", True),
+        ("status", "<=10", "abc", False),
+        ("status", "!=200", "404", True),
+        ("status", "!=200", 200, False),
+        ("path", "/api/v?/user*", "/api/v1/users/7", True),
+        ("path", "/api/v?/user*", "/api/v10/users", False),
+        ("ip", "10.0.0.0/8", "10.1.2.3", True),
+        ("ip", "10.0.0.0/8", "11.0.0.1", False),
+        ("ip", "10.0.0.0/8", "not-an-ip", False),
+        ("ip", ["1.1.1.1", "10.0.0.0/8"], "1.1.1.1", True),
+        ("status", [], "anything", False),
+        ("path", "GET /x", None, False),
+    ],
+)
+def test_match_operators(field, matcher, value, expected):
+    route = RoutingPolicy([{"when": {field: matcher}, "sinks": "*"}], default=[]).compile(SINKS)
+    assert route(_record(**{field: value})) == (EVERY if expected else NONE)
+
+
+def test_first_matching_rule_wins_and_the_rest_fall_through_to_the_default():
+    spec = {
+        "rules": [
+            {"name": "health", "when": {"path": "/health"}, "sinks": []},
+            {"name": "errors", "when": {"status": ["4*", "5*"]}, "sinks": "*"},
+            {
+                "name": "watched",
+                "when": [{"ip": "10.0.0.0/8", "httpMethod": "POST"}, {"routeKey": "GET /pay*"}],
+                "sinks": ["opensearch"],
+            },
+        ],
+        "default": {"clickhouse": 1, "*": 0},
+    }
+    route = RoutingPolicy.from_json(json.dumps(spec)).compile(SINKS)
+
+    # /health matches before its 500 would
+    assert route(_record(path="/health", status=500)) == NONE
+    assert route(_record(path="/user", status=500)) == EVERY
+    assert route(_record(ip="10.0.0.1", httpMethod="POST")) == (False, False, True)
+    # Both conditions of a clause must hold
+    assert route(_record(ip="10.0.0.1", httpMethod="GET")) == (True, False, False)
+    assert route(_record(routeKey="GET /payments")) == (False, False, True)
+    assert route(_record(path="/user", status=200)) == (True, False, False)
+    # Unhashable values cannot be matched and go everywhere
+    assert route(_record(path=["nested"])) == EVERY
+
+    assert RoutingPolicy([]).compile(SINKS)(_record()) == EVERY
+
+
+def test_sampling_is_deterministic_nested_and_close_to_its_rate():
+    route = RoutingPolicy([], default={"clickhouse": 1, "loki": 0.1, "opensearch": 0.05})
+    route = route.compile(SINKS)
+    records = [_record(requestId=f"req-{n}") for n in range(50_000)]
+    decisions = [route(record) for record in records]
+
+    assert decisions == [route(record) for record in records]
+    assert all(keep[0] for keep in decisions)
+    loki = sum(keep[1] for keep in decisions) / len(records)
+    opensearch = sum(keep[2] for keep in decisions) / len(records)
+    assert loki == pytest.approx(0.1, abs=0.005)
+    assert opensearch == pytest.approx(0.05, abs=0.005)
+    # The 5% sample is a subset of the 10% one
+    assert all(keep[1] for keep in decisions if keep[2])
+
+    # Same requestId, same decision; without one the event id is the key
+    assert route(_record(requestId="req-7")) == decisions[7]
+    bare = normalize({"requestId": "-"}, event_id="e-9")
+    assert sample_bucket(bare) == sample_bucket(normalize({}, event_id="e-9"))
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"rules": [{"when": {"nope": 1}}]},
+        {"rules": [{"when": {"status": ">=abc"}}]},
+        {"rules": [{"when": {"status": {"in": [1]}}}]},
+        {"rules": [{"when": {}}]},
+        {"rules": [{"when": {"status": 500}, "sinks": {"loki": 1.5}}]},
+        {"rules": [{"when": {"status": 500}, "sinks": "loki"}]},
+        {"rules": {"when": {"status": 500}}},
+        {"rules": ["errors"]},
+        {"default": {"loki": True}},
+        "rules",
+    ],
+)
+def test_malformed_policies_are_rejected_when_loaded(spec):
+    with pytest.raises(ValueError):
+        RoutingPolicy.from_json(json.dumps(spec))
+
+
+def test_policy_from_env_reads_json_or_a_file(monkeypatch, tmp_path):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"rules": [], "default": ["clickhouse"]}))
+    monkeypatch.setenv("ROUTING_POLICY", str(path))
+    loaded = policy.policy_from_env()
+    assert loaded.compile(SINKS)(_record()) == (True, False, False)
+    assert loaded.fields == ()
+
+    monkeypatch.setenv("ROUTING_POLICY", '{"rules": [], "default": {"loki": 0.5}}')
+    assert policy.policy_from_env().fields == ("requestId",)
+    monkeypatch.setenv("ROUTING_POLICY", "")
+    assert policy.policy_from_env() is None
@@ -0,0 +1,54 @@
+import base64
+import gzip
+import importlib.util
+import json
+
+import pytest
+
+from conftest import LAMBDA_ROOT
+from log_pipeline.projection import FieldProjector
+
+
+@pytest.mark.parametrize(
+    "message",
+    ['{"ip": "1.1.1.1", bad', '{"ip": "1.1.1.1", bad}', "plain text", "[1, 2]"],
+)
+def test_strict_projector_rejects_invalid_json(message):
+    assert FieldProjector(("ip", "resourcePath"), strict=True)(message) is None
+    assert FieldProjector(("ip", "resourcePath"))(message) in ({}, {"ip": "1.1.1.1"})
+
+
+def test_strict_projector_keeps_objects_without_the_fields():
+    project = FieldProjector(("ip", "resourcePath"), strict=True)
+
+    assert project('{"ip": "1.1.1.1", "resourcePath": "/x"}') == {
+        "ip": "1.1.1.1",
+        "resourcePath": "/x",
+    }
+    assert project('{"status": "200"}') == {}
+
+
+def _log_processor():
+    path = LAMBDA_ROOT / "log_processor" / "handler.py"
+    spec = importlib.util.spec_from_file_location("log_processor_handler", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_log_processor_skips_malformed_messages(capsys):
+    module = _log_processor()
+    messages = ['{"ip": "1.1.1.1", bad', '{"ip": "2.2.2.2", "resourcePath": "/x"}', "plain"]
+    payload = {"logEvents": [{"message": message} for message in messages]}
+    data = base64.b64encode(gzip.compress(json.dumps(payload).encode())).decode()
+
+    module.handler({"awslogs": {"data": data}}, None)
+
+    documents = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+    assert [(d["Path"], d["ClientIP"], d["RequestCount"]) for d in documents] == [
+        ("/x", "2.2.2.2", 1)
+    ]
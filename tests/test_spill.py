@@ -0,0 +1,122 @@
+import zlib
+
+import pytest
+
+from log_pipeline import health, replay
+from log_pipeline.sinks import Sink
+from log_pipeline.spill import (
+    CODEC_RAW,
+    CODEC_ZLIB,
+    FileSpill,
+    MemorySpill,
+    _CHUNK_HEADER,
+    decode_rows,
+    encode_chunk,
+    encode_rows,
+    iter_chunks,
+)
+
+SCHEMA = ("path", "status", "latency", "ok", "note")
+ROWS = [
+    ("/user", 200, 12.5, True, None),
+    ("/ñandú", -1, 0.0, False, ""),
+    ("/x", 10**12, 1e-9, None, "a\nb"),
+]
+
+
+def test_columns_round_trip_every_value_type():
+    schema, rows = decode_rows(encode_rows(SCHEMA, ROWS))
+    assert schema == SCHEMA
+    assert rows == ROWS
+    assert [type(v) for v in rows[2]] == [str, int, float, type(None), str]
+
+
+def test_uniform_and_empty_payloads_round_trip():
+    uniform = [(f"/p{n}", str(n)) for n in range(50)]
+    assert decode_rows(encode_rows(("path", "status"), uniform)) == (("path", "status"), uniform)
+    assert decode_rows(encode_rows(SCHEMA, [])) == (SCHEMA, [])
+    with pytest.raises(ValueError):
+        decode_rows(b"JSON{}")
+
+
+def test_chunks_compress_and_concatenate():
+    payloads = [encode_rows(SCHEMA, ROWS[:n]) for n in range(1, 4)]
+    data = b"".join(encode_chunk(payload) for payload in payloads[:2])
+    # Uncompressed chunks are read as they are
+    data += _CHUNK_HEADER.pack(len(payloads[2]), CODEC_RAW) + payloads[2]
+
+    assert list(iter_chunks(data)) == payloads
+    size, codec = _CHUNK_HEADER.unpack_from(data, 0)
+    assert size < len(payloads[0]) + 16
+    if codec == CODEC_ZLIB:
+        assert zlib.decompress(data[_CHUNK_HEADER.size : _CHUNK_HEADER.size + size]) == payloads[0]
+
+
+class PickySink(Sink):
+    """Rejects the items in ``reject`` (by path) and keeps the others."""
+
+    name = "picky"
+    spill_schema = ("path", "status")
+
+    def __init__(self, reject=()):
+        super().__init__(batch_size=10)
+        self.reject = set(reject)
+        self.kept = []
+
+    def deliver(self, batch):
+        self.kept.extend(item for item in batch if item["path"] not in self.reject)
+        return [item for item in batch if item["path"] in self.reject]
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(health, "_registry", {})
+
+
+def _spilled(tmp_path):
+    sink = PickySink(reject={"/b", "/c"})
+    sink.spill = FileSpill(str(tmp_path))
+    for path in ("/a", "/b", "/c"):
+        sink._buffer.append({"path": path, "status": 200})
+    sink.flush()
+    assert (sink.delivered, sink.spilled, sink.failed) == (1, 2, 0)
+    (path,) = tmp_path.glob("picky--*.lps")
+    return path
+
+
+def test_rejected_items_fail_replay_and_keep_the_file(tmp_path, monkeypatch):
+    path = _spilled(tmp_path)
+    sink = PickySink(reject={"/c"})
+    monkeypatch.setattr(replay, "build_sinks", lambda names: [sink])
+
+    summary = replay.drain(f"file://{tmp_path}")
+
+    assert summary["picky"]["error"] == "1 items rejected"
+    assert summary["picky"]["files"] == 0
+    assert path.exists()
+    assert sink.kept == [{"path": "/b", "status": 200}]
+    assert sink.failed == 1
+
+
+def test_replay_deletes_the_file_once_everything_went_through(tmp_path, monkeypatch):
+    path = _spilled(tmp_path)
+    sink = PickySink()
+    monkeypatch.setattr(replay, "build_sinks", lambda names: [sink])
+
+    summary = replay.drain(f"file://{tmp_path}")
+
+    assert summary["picky"] == {"files": 1, "items": 2, "error": None}
+    assert not path.exists()
+    assert [item["path"] for item in sink.kept] == ["/b", "/c"]
+
+
+def test_memory_spill_files_decode_into_items():
+    spill = MemorySpill()
+    spill.write("picky", ("path", "status"), [("/a", 200), ("/b", None)])
+    spill.write("picky", ("path", "status"), [("/c", 503)])
+    items = replay.read_items(PickySink(), bytes(spill.files["picky"]))
+    assert items == [
+        {"path": "/a", "status": 200},
+        {"path": "/b", "status": None},
+        {"path": "/c", "status": 503},
+    ]
@@ -0,0 +1,209 @@
+import json
+import random
+import threading
+
+import pytest
+
+from log_pipeline.sinks.summary import SummarySink
+from log_pipeline.summaries import (
+    OTHER,
+    HourSummary,
+    LatencySketch,
+    MemorySummaryStore,
+    TopCounts,
+    merge_summary,
+    summary_key,
+)
+
+HOUR = 1_767_225_600  # 2026-01-01T00:00:00Z
+
+
+def _partial(events, path="/user", ip="1.1.1.1"):
+    summary = HourSummary(HOUR)
+    for n in range(events):
+        summary.add(path, "200", "v1", 10.0 + n, ip, 100)
+    return summary
+
+
+def _stored(store, hour=HOUR):
+    data, _ = store.get(summary_key(hour))
+    return HourSummary.from_bytes(data)
+
+
+class RacingStore(MemorySummaryStore):
+    """Every writer reads the same (missing) version before anyone writes."""
+
+    def __init__(self, writers):
+        super().__init__()
+        self.barrier = threading.Barrier(writers)
+        self.raced = threading.local()
+        self.racing = True
+        self.conflicts = 0
+
+    def get(self, key):
+        found = super().get(key)
+        if self.racing and not getattr(self.raced, "done", False):
+            self.raced.done = True
+            self.barrier.wait(timeout=5)
+        return found
+
+    def put(self, key, data, version):
+        stored = super().put(key, data, version)
+        self.conflicts += not stored
+        return stored
+
+
+def test_concurrent_writers_retry_conflicts_without_losing_counts():
+    writers = 8
+    store = RacingStore(writers)
+    attempts = [0] * writers
+
+    def write(n):
+        partial = _partial(n + 1, path=f"/p{n % 3}", ip=f"10.0.0.{n}")
+        attempts[n] = merge_summary(store, partial, attempts=writers + 2, sleep=lambda _: None)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.racing = False
+
+    # One writer won the race, every other one retried at least once
+    assert all(attempts)
+    assert sorted(attempts)[:2] == [1, 2]
+    assert store.conflicts == sum(attempts) - writers >= writers - 1
+
+    summary = _stored(store)
+    assert summary.events == sum(range(1, writers + 1))
+    assert summary.merges == writers
+    assert summary.requests() == {"/p0": 1 + 4 + 7, "/p1": 2 + 5 + 8, "/p2": 3 + 6}
+    assert dict(summary.ips.top()) == {f"10.0.0.{n}": n + 1 for n in range(writers)}
+    assert sum(sketch.count for sketch in summary.latency.values()) == summary.events
+
+
+def test_merge_gives_up_after_the_attempts_with_growing_backoff():
+    class Contended(MemorySummaryStore):
+        def put(self, key, data, version):
+            return False
+
+    waits = []
+    random.seed(3)
+    assert merge_summary(Contended(), _partial(1), attempts=4, backoff=1, sleep=waits.append) == 0
+    assert len(waits) == 4
+    assert all(0 <= wait <= 2**n for n, wait in enumerate(waits))
+
+
+def test_sink_hands_back_the_hours_it_could_not_merge():
+    class OneHourContended(MemorySummaryStore):
+        def put(self, key, data, version):
+            return key != summary_key(HOUR + 3600) and super().put(key, data, version)
+
+    store = OneHourContended()
+    sink = SummarySink(store, attempts=2)
+    items = [
+        (HOUR, "/a", "200", "v1", 5.0, "1.1.1.1", 10),
+        (HOUR + 3600, "/b", "500", "v1", None, None, 0),
+    ]
+
+    assert sink.deliver(items) == items[1:]
+    assert _stored(store).requests() == {"/a": 1}
+
+
+def test_trim_folds_the_least_requested_paths_into_other():
+    summary = HourSummary(HOUR, max_paths=3, top_ips=2)
+    for path, count in (("/a", 5), ("/b", 4), ("/c", 3), ("/d", 2), ("/e", 1)):
+        for _ in range(count):
+            summary.add(path, "200", "v1", float(count), f"ip-{path}", 1)
+    summary.add("/e", "500", "v2", None, None)
+
+    summary.trim()
+
+    assert summary.requests() == {"/a": 5, "/b": 4, OTHER: 7}
+    assert summary.requests("status") == {"200": 15, "500": 1}
+    assert summary.counts[(OTHER, "200", "v1")] == [6, 6]
+    assert set(summary.latency) == {"/a", "/b", OTHER}
+    assert summary.latency[OTHER].count == 6
+    assert summary.latency[OTHER].min == 1.0 and summary.latency[OTHER].max == 3.0
+    assert summary.ips.top() == [("ip-/a", 5), ("ip-/b", 4)]
+    assert (summary.ips.other, summary.ips.floor) == (6, 3)
+
+    # Folding again keeps OTHER and stays within max_paths
+    summary.add("/f", "200", "v1", 1.0, None)
+    summary.trim()
+    assert set(summary.requests()) == {"/a", "/b", OTHER}
+    assert summary.events == 17
+
+
+def test_top_counts_round_trip_and_bound_their_error():
+    top = TopCounts(capacity=2)
+    for key, count in (("a", 9), ("b", 7), ("c", 2), ("d", 1)):
+        top.add(key, count)
+    data = json.loads(json.dumps(top.to_json()))
+    restored = TopCounts.from_json(data, capacity=2)
+    assert restored.top() == [("a", 9), ("b", 7)]
+    assert (restored.other, restored.floor) == (3, 2)
+
+
+def test_sketch_round_trips_and_stays_within_its_accuracy():
+    rng = random.Random(5)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)] + [0.0] * 50
+    sketch = LatencySketch(accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    restored = LatencySketch.from_json(json.loads(json.dumps(sketch.to_json())))
+
+    assert restored.bins == sketch.bins
+    assert (restored.count, restored.zero) == (sketch.count, sketch.zero)
+    assert (restored.min, restored.max) == (sketch.min, sketch.max)
+    ordered = sorted(values)
+    for q in (0.005, 0.25, 0.5, 0.9, 0.99, 1.0):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        estimate = restored.quantile(q)
+        assert estimate == sketch.quantile(q)
+        assert estimate == pytest.approx(exact, rel=0.01, abs=1e-9)
+
+
+def test_sketches_merge_like_one_sketch():
+    values = [float(v) for v in range(1, 1001)]
+    whole, left, right = LatencySketch(), LatencySketch(), LatencySketch()
+    for value in values:
+        whole.add(value)
+        (left if value % 2 else right).add(value)
+    left.merge(right)
+    assert left.to_json() == whole.to_json()
+    with pytest.raises(ValueError):
+        left.merge(LatencySketch(accuracy=0.05))
+    assert LatencySketch.from_json(LatencySketch().to_json()).quantile(0.5) is None
+
+
+def test_hour_summary_round_trips_through_bytes():
+    summary = _partial(3)
+    summary.add("/x", "404", "v2", None, None, 7)
+    restored = HourSummary.from_bytes(summary.to_bytes())
+
+    assert restored.hour == HOUR
+    assert restored.events == 4
+    assert restored.counts == {("/user", "200", "v1"): [3, 300], ("/x", "404", "v2"): [1, 7]}
+    assert restored.quantiles("/user") == summary.quantiles("/user")
+    assert restored.quantiles("/x") == [None, None, None]
+    assert restored.ips.top() == [("1.1.1.1", 3)]
+    with pytest.raises(ValueError):
+        HourSummary.from_bytes(b'{"format": 99}')
+
+
+def test_sinks_from_env_share_the_cached_s3_client(monkeypatch):
+    from log_pipeline import ingest
+    from log_pipeline.sinks import summary
+
+    client = object()
+    calls = []
+    monkeypatch.setattr(ingest, "get_s3_client", lambda: calls.append(1) or client)
+    monkeypatch.setenv("SUMMARY_STORE", "s3://bucket/summaries/")
+
+    stores = [summary.from_env().store for _ in range(2)]
+
+    assert all(store.s3_client is client for store in stores)
+    assert stores[0].bucket == "bucket" and stores[0].prefix == "summaries/"
+    assert len(calls) == 2
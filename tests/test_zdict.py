@@ -0,0 +1,62 @@
+import json
+import sys
+
+import pytest
+
+from log_pipeline import zdict
+from log_pipeline.decode import ZSTD_MAGIC, decompress, parse_messages
+
+
+def _messages(count):
+    return [
+        {
+            "messageType": "DATA_MESSAGE",
+            "logGroup": "API-Gateway-Execution-Logs",
+            "logEvents": [{"id": str(n), "message": json.dumps({"path": f"/user/{n % 7}"})}],
+        }
+        for n in range(count)
+    ]
+
+
+def test_split_messages_keeps_each_object_as_written():
+    text = '{"a": 1}\n{"b": [1, 2]}{"c": "}{"}  '
+    assert zdict.split_messages(text) == [b'{"a": 1}', b'{"b": [1, 2]}', b'{"c": "}{"}']
+
+
+def test_a_missing_zstandard_is_reported_clearly(monkeypatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    frame = ZSTD_MAGIC + b"\x00" * 8
+
+    with pytest.raises(ImportError, match="pip install zstandard"):
+        zdict.decompress(frame)
+    with pytest.raises(ValueError, match="zstandard is not installed"):
+        decompress(frame)
+    assert zdict.main(["info", __file__]) == 1
+
+
+def test_dictionary_round_trip(tmp_path, monkeypatch):
+    pytest.importorskip("zstandard")
+    messages = _messages(2000)
+    samples = [json.dumps(message).encode() for message in messages]
+    dictionary = zdict.train(samples, dict_size=4096)
+    (tmp_path / f"api-logs{zdict.DICT_SUFFIX}").write_bytes(dictionary.as_bytes())
+    monkeypatch.setenv("ZSTD_DICTIONARIES", str(tmp_path))
+    zdict.dictionaries.cache_clear()
+    zdict._decompressor.cache_clear()
+
+    # Small objects are where the dictionary pays off
+    data = b"\n".join(samples[:3])
+    plain = zdict.compress(data, level=3)
+    trained = zdict.compress(data, dictionary, level=3)
+
+    assert len(trained) < len(plain)
+    assert parse_messages(plain) == parse_messages(trained) == messages[:3]
+
+    # Frames name their dictionary; one that cannot be found is an error
+    monkeypatch.setenv("ZSTD_DICTIONARIES", str(tmp_path / "missing"))
+    zdict.dictionaries.cache_clear()
+    zdict._decompressor.cache_clear()
+    with pytest.raises(ValueError, match="not found in ZSTD_DICTIONARIES"):
+        zdict.decompress(trained)
+    zdict.dictionaries.cache_clear()
+    zdict._decompressor.cache_clear()